@@ -4,10 +4,11 @@ from firebase_admin import credentials, auth
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from database import get_db
-import models
-from datetime import datetime
+from services.executors import io_executor
+from services.token_cache import token_cache, AUTH_CHECK_REVOKED
+from services.user_activity import user_activity
 from fastapi import Request
 
 load_dotenv()
@@ -29,10 +30,19 @@ if not firebase_admin._apps:
 
 security = HTTPBearer()
 
+def verify_token(id_token: str) -> dict:
+    """Firebase ID token check. Benchmarks swap in services.local_auth.LocalTokenVerifier."""
+    return auth.verify_id_token(id_token, check_revoked=AUTH_CHECK_REVOKED)
+
+async def revoke_user_tokens(uid: str):
+    """Revoke a user's sessions in Firebase and stop accepting their cached tokens here."""
+    await io_executor.run(auth.revoke_refresh_tokens, uid)
+    token_cache.invalidate_user(uid)
+
 async def get_current_user(
     request: Request,
     token: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Verifies the Firebase ID token and returns the decoded token (user info).
@@ -50,22 +60,18 @@ async def get_current_user(
                 detail="Firebase Admin not initialized. Please configure credentials."
             )
 
-        # Verify the ID token
-        decoded_token = auth.verify_id_token(token.credentials)
+        # Verify the ID token (signature check, and sometimes a key refresh over
+        # HTTP) only the first time it is seen; then until it expires, it's cached
+        decoded_token = token_cache.get(token.credentials)
+        if decoded_token is None:
+            decoded_token = await io_executor.run(verify_token, token.credentials)
+            token_cache.put(token.credentials, decoded_token)
         uid = decoded_token.get('uid')
         email = decoded_token.get('email')
 
-        # Sync with Database
-        user = db.query(models.User).filter(models.User.uid == uid).first()
-
-        if not user:
-            user = models.User(uid=uid, email=email)
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        else:
-            user.last_login = datetime.now()
-            db.commit()
+        # Sync with Database: a write only the first time this process sees
+        # the user; last_login is batched by services.user_activity
+        await user_activity.ensure_user(db, uid, email)
 
         return {"uid": uid, "email": email, "decoded_token": decoded_token}
 
@@ -0,0 +1,20 @@
+"""
+Rebuild all mood-improvement rollups from meditation_sessions in one pass.
+
+    python backfill_analytics.py
+
+Migration 4 does this once; run it again after editing sessions outside the
+API (the endpoints keep the rollups up to date themselves).
+"""
+import time
+
+from database import engine
+from migrations import migrate
+from services.analytics import rebuild_rollups
+
+if __name__ == "__main__":
+    migrate(engine)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        written = rebuild_rollups(conn)
+    print(f"Rebuilt {written} rollup rows in {time.perf_counter() - start:.2f}s")
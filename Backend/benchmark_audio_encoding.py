@@ -0,0 +1,34 @@
+"""
+Benchmark: encode time vs. output size for every available audio format.
+
+    python benchmark_audio_encoding.py [path/to/input.wav]
+
+Defaults to test_long_output_chunked.wav (real Gemini TTS output).
+"""
+import os
+import sys
+import tempfile
+import wave
+
+from services.audio_encoding import ENCODERS, available_formats, encode_file
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "test_long_output_chunked.wav"
+    with wave.open(src, "rb") as wav_file:
+        seconds = wav_file.getnframes() / wav_file.getframerate()
+    wav_size = os.path.getsize(src)
+
+    print(f"input: {src} ({seconds:.1f}s, {wav_size / 1024:.0f} KiB)")
+    print(f"{'format':<8} {'encode ms':>10} {'x realtime':>11} {'KiB':>9} {'KiB/min':>9} {'ratio':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in available_formats():
+            encoder = ENCODERS[name]
+            if name == "wav":
+                elapsed, size = 0.0, wav_size
+            else:
+                dst = os.path.join(tmp, f"out.{encoder.extension}")
+                elapsed = encode_file(name, src, dst)
+                size = os.path.getsize(dst)
+            speed = seconds / elapsed if elapsed else float("inf")
+            print(f"{name:<8} {elapsed * 1000:10.1f} {speed:11.0f} {size / 1024:9.0f} {size / 1024 / (seconds / 60):9.0f} {wav_size / size:7.1f}")
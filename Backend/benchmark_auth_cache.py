@@ -0,0 +1,70 @@
+"""
+Benchmark: token verification in get_current_user with and without the
+verified-token cache, using services.local_auth.LocalTokenVerifier instead of
+Firebase (no credentials or network needed).
+
+    python benchmark_auth_cache.py [--clients 50] [--requests 200] [--latency-ms 0]
+
+Each client polls with its own ID token, as the frontend does, all clients
+concurrently. Verification runs on the io executor like in auth.py;
+--latency-ms adds a simulated certificate fetch / revocation lookup to each one.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from services.executors import io_executor, shutdown_executors
+from services.local_auth import LocalTokenVerifier
+from services.token_cache import TokenCache
+
+async def authenticate(cache: TokenCache, verifier: LocalTokenVerifier, id_token: str) -> dict:
+    # The token handling of auth.get_current_user
+    decoded = cache.get(id_token)
+    if decoded is None:
+        decoded = await io_executor.run(verifier.verify_id_token, id_token)
+        cache.put(id_token, decoded)
+    return decoded
+
+async def poll(cache, verifier, id_token, requests: int, timings: list):
+    for _ in range(requests):
+        start = time.perf_counter()
+        await authenticate(cache, verifier, id_token)
+        timings.append(time.perf_counter() - start)
+
+async def measure(cache: TokenCache, verifier: LocalTokenVerifier, tokens: list, requests: int) -> dict:
+    verifier.verifications = 0
+    timings = []
+    start = time.perf_counter()
+    await asyncio.gather(*(poll(cache, verifier, token, requests, timings) for token in tokens))
+    elapsed = time.perf_counter() - start
+    return {
+        "rps": len(timings) / elapsed,
+        "p50_ms": statistics.median(timings) * 1000,
+        "p99_ms": statistics.quantiles(timings, n=100)[98] * 1000,
+        "verifications": verifier.verifications,
+        "hit_rate": cache.stats()["hit_rate"],
+    }
+
+async def main_async(args):
+    verifier = LocalTokenVerifier(latency_seconds=args.latency_ms / 1000)
+    tokens = [verifier.issue(f"bench-user-{n}", f"user{n}@example.com") for n in range(args.clients)]
+    print(f"{args.clients} clients x {args.requests} requests, {args.latency_ms} ms simulated latency")
+    print(f"{'variant':<9} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'verified':>9} {'hit rate':>9}")
+    results = {}
+    for name, cache in (("uncached", TokenCache(max_entries=0)), ("cached", TokenCache(max_entries=args.clients))):
+        results[name] = result = await measure(cache, verifier, tokens, args.requests)
+        print(f"{name:<9} {result['rps']:10.0f} {result['p50_ms']:8.3f} {result['p99_ms']:8.3f} "
+              f"{result['verifications']:9d} {result['hit_rate']:9.2%}")
+    print(f"throughput {results['cached']['rps'] / results['uncached']['rps']:.1f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        shutdown_executors()
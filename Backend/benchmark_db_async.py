@@ -0,0 +1,128 @@
+"""
+Benchmark: GET /api/meditations with a sync Session (the old get_db) vs. the
+AsyncSession endpoint, under concurrent requests.
+
+    python benchmark_db_async.py [--sessions 200] [--requests 1000] [--concurrency 10]
+
+Runs against a throwaway SQLite file (DATABASE_URL is overridden), in process
+through httpx's ASGI transport. "loop stall" is the longest time a 1 ms timer
+on the event loop was kept waiting, i.e. how long other requests were frozen.
+
+Keep --concurrency below the sync pool's 15 connections (pool_size +
+max_overflow): past that the sync variant deadlocks until the pool timeout,
+because a checkout blocks the event loop that would run the teardowns
+returning connections to the pool.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+import httpx
+from fastapi import Depends
+from sqlalchemy.orm import Session
+from typing import List
+
+import main
+import models
+import schemas
+from auth import get_current_user
+from database import SessionLocal, engine, get_sync_db
+from migrations import migrate
+
+USER = {"uid": "bench-user", "email": "bench@example.com"}
+
+@main.app.get("/bench/sync-meditations", response_model=List[schemas.MeditationResponse])
+async def get_meditations_sync(
+    db: Session = Depends(get_sync_db),
+    user: dict = Depends(get_current_user)
+):
+    # The handler as it was before the async engine: blocking queries inside async def
+    return db.query(models.MeditationSession)\
+        .filter(models.MeditationSession.user_id == user['uid'])\
+        .order_by(models.MeditationSession.created_at.desc())\
+        .all()
+
+def seed(count: int):
+    db = SessionLocal()
+    try:
+        paragraph = "Breathe in slowly and let your shoulders soften. " * 40
+        db.add_all(
+            models.MeditationSession(
+                title=f"Session {i}", type="Sleep", duration=10, tone="Calm",
+                script=paragraph, audio_script=paragraph, user_id=USER["uid"]
+            )
+            for i in range(count)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+async def measure_stall(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - start - 0.001)
+    return worst
+
+async def run(path: str, total: int, concurrency: int) -> dict:
+    transport = httpx.ASGITransport(app=main.app)
+    latencies = []
+    remaining = total
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)  # warm up pools and caches
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                start = time.perf_counter()
+                response = await client.get(path)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        stop = asyncio.Event()
+        stall = asyncio.create_task(measure_stall(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        worst_stall = await stall
+
+    latencies.sort()
+    return {
+        "req/s": total / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "loop stall ms": worst_stall * 1000,
+    }
+
+async def main_async(args):
+    print(f"{args.sessions} sessions per user, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'variant':<8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'loop stall ms':>14}")
+    for name, path in (("sync", "/bench/sync-meditations"), ("async", "/api/meditations")):
+        result = await run(path, args.requests, args.concurrency)
+        print(f"{name:<8} {result['req/s']:8.0f} {result['p50 ms']:8.1f} {result['p95 ms']:8.1f} {result['loop stall ms']:14.1f}")
+    await main.async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+    migrate(engine)
+    seed(args.sessions)
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        _tmp.cleanup()
@@ -0,0 +1,52 @@
+"""
+Micro-benchmark: per-call chain setup cost, building chains per request
+(old behaviour) vs. reusing the shared registry.
+
+No network calls are made, only chain construction and prompt rendering.
+
+    python benchmark_llm_chains.py [iterations]
+"""
+import os
+import sys
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+from services import llm_service
+from services.llm_service import (
+    ChatGoogleGenerativeAI, JsonOutputParser, PromptTemplate,
+    MeditationScripts, SCRIPT_TEMPLATE, SCRIPT_PROMPT_VERSION, MODEL_NAME,
+    build_script_inputs, get_chain,
+)
+
+INPUTS = build_script_inputs("sleep", 10, "Body scan", "Calm", ["Insomnia", "Anxiety"], "Restless")
+
+def per_call_setup():
+    llm = ChatGoogleGenerativeAI(model=MODEL_NAME, google_api_key=llm_service.api_key)
+    parser = JsonOutputParser(pydantic_object=MeditationScripts)
+    prompt = PromptTemplate(
+        input_variables=list(INPUTS.keys()),
+        template=SCRIPT_TEMPLATE,
+        partial_variables={"format_instructions": parser.get_format_instructions()}
+    )
+    chain = prompt | llm | parser
+    return chain.first.invoke(INPUTS)
+
+def registry_lookup():
+    chain = get_chain("script", SCRIPT_PROMPT_VERSION)
+    return chain.first.invoke(INPUTS)
+
+def bench(label, fn, iterations):
+    fn()  # warm up (imports, first registry build)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call_ms = (time.perf_counter() - start) / iterations * 1000
+    print(f"{label:<24} {per_call_ms:10.3f} ms/call")
+    return per_call_ms
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    before = bench("per-call setup", per_call_setup, iterations)
+    after = bench("shared registry", registry_lookup, iterations)
+    print(f"speedup: {before / after:.1f}x")
@@ -0,0 +1,140 @@
+"""
+Benchmark: /api/meditations/search latency as a user's history grows, the old
+three-column ILIKE scan vs. the full-text index.
+
+    python benchmark_search.py [--sizes 100 1000 5000] [--users 5] [--queries 50] [--page 10]
+
+Runs against a throwaway SQLite file (DATABASE_URL is overridden). Every user
+gets the same number of sessions; queries run for one of them. Ranked search
+scores every session of that user that matches, so it grows with the match
+count (shown), though far more slowly than the ILIKE scan; deep pages cost
+about as much as the first.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+from sqlalchemy import delete, or_, select
+
+import models
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine
+from migrations import migrate
+from services.pagination import PAGE_SIZE
+from services.search import search_page, search_sessions
+
+THEMES = (
+    "breathe shoulders soften ocean waves forest rain night gentle warmth heavy "
+    "release jaw chest belly exhale inhale stillness mountain river candle"
+).split()
+# Filler vocabulary so that, like real scripts, most words are not query terms
+FILLER = [f"{a}{b}{c}" for a in "bdfgklmnprstvz" for b in "aeiou" for c in "lmnrst"]
+TYPES = ["Sleep", "Anxiety", "Focus", "Body Scan"]
+QUERIES = ["ocean", "mountain river", "soften", "candle", "exhale", "warm"]
+
+def bench_uid(n: int) -> str:
+    # Shaped like a Firebase uid: a single opaque token
+    return f"bEnChUsEr{n:04d}x9Qz7LmTq2Wv8Rk"
+
+def seed(users: int, per_user: int):
+    rng = random.Random(0)
+    db = SessionLocal()
+    try:
+        db.execute(delete(models.MeditationSession))
+        for u in range(users):
+            db.add_all(
+                models.MeditationSession(
+                    title=f"Session {i}", type=rng.choice(TYPES), duration=10, tone="Calm",
+                    script=" ".join(rng.choices(FILLER, k=400) + rng.sample(THEMES, 4)),
+                    audio_script=" ".join(rng.choices(FILLER, k=300) + rng.sample(THEMES, 3)),
+                    user_id=bench_uid(u),
+                )
+                for i in range(per_user)
+            )
+        db.commit()
+    finally:
+        db.close()
+
+async def ilike_search(db, user_id: str, query: str):
+    # The endpoint before the index: substring scan of every session the user has
+    pattern = f"%{query}%"
+    return (await db.scalars(
+        select(models.MeditationSession)
+        .where(models.MeditationSession.user_id == user_id)
+        .where(or_(
+            models.MeditationSession.script.ilike(pattern),
+            models.MeditationSession.audio_script.ilike(pattern),
+            models.MeditationSession.type.ilike(pattern),
+        ))
+        .order_by(models.MeditationSession.created_at.desc())
+    )).all()
+
+async def fts_search(db, user_id: str, query: str):
+    # First page, as the endpoint returns it
+    return await search_sessions(db, user_id, query, limit=PAGE_SIZE)
+
+async def deep_cursors(page: int) -> dict:
+    """Cursor of page `page` (50 results each) per query; queries with fewer matches are left out."""
+    cursors = {}
+    async with AsyncSessionLocal() as db:
+        for query in QUERIES:
+            cursor = None
+            for _ in range(page - 1):
+                _, cursor = await search_page(db, bench_uid(0), query, limit=PAGE_SIZE, cursor=cursor)
+                if cursor is None:
+                    break
+            if cursor:
+                cursors[query] = cursor
+    return cursors
+
+async def measure(search, queries: int, terms: list = QUERIES) -> float:
+    latencies = []
+    async with AsyncSessionLocal() as db:
+        await search(db, bench_uid(0), terms[0])  # warm up
+        for i in range(queries):
+            start = time.perf_counter()
+            await search(db, bench_uid(0), terms[i % len(terms)])
+            latencies.append(time.perf_counter() - start)
+            db.expunge_all()
+    return statistics.median(latencies) * 1000
+
+async def median_matches() -> int:
+    async with AsyncSessionLocal() as db:
+        return int(statistics.median([len(await ilike_search(db, bench_uid(0), query)) for query in QUERIES]))
+
+async def main_async(args):
+    print(f"{args.users} users, {args.queries} queries per variant (median ms)")
+    print(f"fts is the first page of {PAGE_SIZE}; 'fts p{args.page}' continues from a cursor")
+    print(f"{'sessions/user':>14} {'matches':>9} {'ilike':>9} {'fts':>9} {f'fts p{args.page}':>9}")
+    for size in args.sizes:
+        seed(args.users, size)
+        ilike_ms = await measure(ilike_search, args.queries)
+        fts_ms = await measure(fts_search, args.queries)
+        cursors = await deep_cursors(args.page)
+        deep = "-"
+        if cursors:
+            async def fts_deep_page(db, user_id, query):
+                return await search_page(db, user_id, query, limit=PAGE_SIZE, cursor=cursors[query])
+            deep = f"{await measure(fts_deep_page, args.queries, list(cursors)):.1f}"
+        print(f"{size:>14} {await median_matches():>9} {ilike_ms:9.1f} {fts_ms:9.1f} {deep:>9}")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 5000])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--page", type=int, default=10)
+    args = parser.parse_args()
+
+    migrate(engine)
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        _tmp.cleanup()
@@ -0,0 +1,103 @@
+"""
+Benchmark: a history page as full MeditationResponse rows (what the list
+endpoints used to return) vs. MeditationSummary rows loaded with
+models.summary_columns().
+
+    python benchmark_summary.py [--sessions 2000] [--page 200] [--runs 20]
+
+Runs against a throwaway SQLite file (DATABASE_URL is overridden) seeded with
+realistically sized scripts and waveforms. Times the query, ORM hydration and
+JSON serialization of one page, and reports the response size.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from typing import List
+
+import models
+import schemas
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+USER_ID = "bEnChUsEr0000x9Qz7LmTq2Wv8Rk"
+SENTENCES = [
+    "Let your breath settle into its own gentle rhythm.",
+    "Notice the weight of your body sinking into the bed.",
+    "With each exhale, release a little more tension from your shoulders.",
+    "Imagine a warm light moving slowly down from the crown of your head.",
+    "There is nothing you need to do right now.",
+]
+
+def seed(count: int):
+    rng = random.Random(0)
+    waveform = json.dumps({"bins": 512, "peaks": [round(rng.random(), 4) for _ in range(512)],
+                           "rms": [round(rng.random(), 4) for _ in range(512)]})
+    db = SessionLocal()
+    try:
+        db.add_all(
+            models.MeditationSession(
+                title=f"Session {i}", type="Sleep", duration=15, tone="Calm", preferences="ocean sounds",
+                script=" ".join(rng.choices(SENTENCES, k=120)),          # ~6 KB
+                audio_script=" ".join(rng.choices(SENTENCES, k=100)),    # ~5 KB
+                waveform=waveform, audio_url=f"/static/audio/{i}.wav", audio_format="wav",
+                audio_duration_ms=900000, health_conditions="insomnia,anxiety",
+                mood_before="restless", user_id=USER_ID,
+            )
+            for i in range(count)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+def page_query(limit: int, summary: bool):
+    query = select(models.MeditationSession).where(models.MeditationSession.user_id == USER_ID)
+    if summary:
+        query = query.options(models.summary_columns())
+    return query.order_by(models.MeditationSession.created_at.desc(), models.MeditationSession.id.desc()).limit(limit)
+
+async def measure(limit: int, runs: int, summary: bool) -> dict:
+    adapter = TypeAdapter(List[schemas.MeditationSummary if summary else schemas.MeditationResponse])
+    timings, size = [], 0
+    for _ in range(runs + 1):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            rows = (await db.scalars(page_query(limit, summary))).all()
+            body = adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+            timings.append(time.perf_counter() - start)
+            size = len(body)
+    return {"ms": statistics.median(timings[1:]) * 1000, "kb": size / 1024}
+
+async def main_async(args):
+    print(f"{args.sessions} sessions, page of {args.page}, median of {args.runs} runs")
+    print(f"{'variant':<8} {'ms':>8} {'KB':>9}")
+    results = {}
+    for name, summary in (("full", False), ("summary", True)):
+        results[name] = await measure(args.page, args.runs, summary)
+        print(f"{name:<8} {results[name]['ms']:8.1f} {results[name]['kb']:9.1f}")
+    print(f"speedup {results['full']['ms'] / results['summary']['ms']:.1f}x, "
+          f"payload {results['full']['kb'] / results['summary']['kb']:.1f}x smaller")
+    await async_engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=engine)
+    seed(args.sessions)
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        _tmp.cleanup()
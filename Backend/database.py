@@ -1,17 +1,205 @@
-from sqlalchemy import create_engine
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from dotenv import load_dotenv
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./meditations.db"
+load_dotenv()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Same database through an asyncio driver, for request handlers and background workers
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+# asyncio-only drivers: kept for the async engine, dropped for the sync one
+ASYNC_DRIVER_NAMES = {"aiosqlite", "asyncpg"}
+
+def _split_scheme(url: str) -> tuple[str, str, str]:
+    """(dialect, driver, rest); `postgres` (Heroku and others) is an alias of `postgresql`."""
+    scheme, rest = url.split("://", 1)
+    dialect, _, driver = scheme.partition("+")
+    if dialect == "postgres":
+        dialect = "postgresql"
+    return dialect, driver, rest
+
+def database_url(url: str) -> str:
+    """`url` for the sync engine, with the dialect name SQLAlchemy expects."""
+    dialect, driver, rest = _split_scheme(url)
+    if driver and driver not in ASYNC_DRIVER_NAMES:
+        return f"{dialect}+{driver}://{rest}"
+    return f"{dialect}://{rest}"
+
+def async_database_url(url: str) -> str:
+    """
+    `url` through an asyncio driver: `postgres://`, `postgresql://` and
+    `postgresql+psycopg2://` all become `postgresql+asyncpg://`.
+    """
+    dialect, driver, rest = _split_scheme(url)
+    if driver in ASYNC_DRIVER_NAMES:
+        return f"{dialect}+{driver}://{rest}"
+    return f"{ASYNC_DRIVERS.get(dialect, dialect)}://{rest}"
+
+SQLALCHEMY_DATABASE_URL = database_url(os.getenv("DATABASE_URL", "sqlite:///./meditations.db"))
+
+def _is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+# SQLite: WAL lets readers run while a write is in progress, synchronous=NORMAL
+# is durable in WAL mode except for the last transactions on power loss, and
+# busy_timeout makes a second writer wait instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(float(os.getenv("SQLITE_MMAP_SIZE_MB", "256")) * 1024 * 1024),
+    # Negative cache_size is in KiB rather than pages
+    "cache_size": -int(float(os.getenv("SQLITE_CACHE_SIZE_MB", "64")) * 1024),
+    "temp_store": "MEMORY",
+}
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+
+class PoolStats:
+    """How long sessions wait for a pooled connection, and how often they have to."""
+
+    WAIT_THRESHOLD = 0.005
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.waited = 0 # checkouts that took longer than WAIT_THRESHOLD
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if seconds > self.WAIT_THRESHOLD:
+                self.waited += 1
+
+    def stats(self, pool) -> dict:
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        return {
+            "pool_size": pool.size(),
+            "max_overflow": pool._max_overflow,
+            "checked_out": pool.checkedout(),
+            "saturation": round(pool.checkedout() / capacity, 4) if capacity else 0.0,
+            "checkouts": self.checkouts,
+            "waited": self.waited,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 3),
+        }
+
+# pool logging name -> stats; keyed by name because dispose() replaces the pool object
+pool_stats = {}
+
+
+class _TimedPoolMixin:
+    def _do_get(self):
+        stats = pool_stats.setdefault(self.logging_name, PoolStats())
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        stats.record(time.perf_counter() - start)
+        return connection
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(url: str, is_async: bool, name: str) -> dict:
+    """create_engine() keyword arguments for `url`, from DB_* / SQLITE_* settings."""
+    sqlite = _is_sqlite(url)
+    options = {
+        # Compiled SQL cache shared by all connections of the engine
+        "query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "1200")),
+        "pool_logging_name": name,
+    }
+    if sqlite and ":memory:" in url:
+        return options
+
+    options.update({
+        "poolclass": TimedAsyncQueuePool if is_async else TimedQueuePool,
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5" if sqlite else "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10" if sqlite else "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+    })
+    if sqlite:
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+    else:
+        options.update({
+            "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+            "pool_pre_ping": True,
+        })
+        if is_async:
+            # asyncpg prepares statements server-side and reuses them per connection
+            options["connect_args"] = {
+                "prepared_statement_cache_size": int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+            }
+    return options
+
+def make_engine(url: str = SQLALCHEMY_DATABASE_URL, is_async: bool = False, name: str = None):
+    name = name or ("async" if is_async else "sync")
+    if is_async:
+        url = async_database_url(url)
+        new_engine = create_async_engine(url, **engine_options(url, True, name))
+        sync_engine = new_engine.sync_engine
+    else:
+        url = database_url(url)
+        new_engine = create_engine(url, **engine_options(url, False, name))
+        sync_engine = new_engine
+
+    if _is_sqlite(url):
+        event.listen(sync_engine, "connect", _apply_sqlite_pragmas)
+    return new_engine
+
+# Sync engine: table creation, maintenance scripts and code already running in a worker thread
+engine = make_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = make_engine(is_async=True)
+# expire_on_commit=False: attributes stay readable after commit without an implicit (sync) reload
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
-def get_db():
+def database_stats() -> dict:
+    return {
+        "dialect": engine.dialect.name,
+        "sync": pool_stats.get("sync", PoolStats()).stats(engine.pool) if isinstance(engine.pool, QueuePool) else {},
+        "async": pool_stats.get("async", PoolStats()).stats(async_engine.pool) if isinstance(async_engine.pool, QueuePool) else {},
+    }
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
@@ -1,25 +1,46 @@
 import os
-from fastapi import FastAPI, HTTPException, Depends
-from fastapi.staticfiles import StaticFiles
+import json
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uuid
 import shutil
 from pathlib import Path
 
 from dotenv import load_dotenv
-from sqlalchemy.orm import Session
-from database import engine, get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import engine, async_engine, get_db, AsyncSessionLocal, database_stats
 import models
 import schemas
-from services.llm_service import generate_meditation_script, analyze_mood
-from services.tts_service import generate_audio
+from services.llm_service import generate_meditation_script, stream_meditation_script, analyze_mood
+from services.tts_service import generate_audio, stream_audio, audio_metadata, audio_cache_stats, encode_stats
+from services.phrase_cache import phrase_cache
+from services.audio_store import apply_generated_audio, apply_audio_metadata, release_audio, remove_audio_files, unreferenced_audio
+from services.jobs import audio_jobs, cancel_jobs_query, client_priority
+from services.audio_encoding import negotiate_format
+from services.audio_mix import available_ambients
+from services.audio_serving import audio_file_response
+from services.executors import io_executor, llm_executor, executor_stats, shutdown_executors
+from services.mood_cache import mood_cache
+from services.mood_index import mood_index
+from services.token_cache import token_cache
+from services.user_activity import user_activity
+from services.single_flight import request_key, generation_flights, audio_flights, single_flight_stats
+from services.idempotency import IdempotencyConflict, validate_key, stored_response, store_response, idempotency_stats
+from services.search import search_page
+from services.analytics import apply_session, current_streak, improvement_score, user_rollups
+from services.conditions import condition_tags, add_session_conditions, remove_session_conditions, with_condition, condition_counts
+from services.pagination import PAGE_SIZE, MAX_PAGE_SIZE, history_page
 from auth import get_current_user
+from migrations import migrate
+from contextlib import asynccontextmanager
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize Database Models
-models.Base.metadata.create_all(bind=engine)
+# Set to 0 when `python migrations.py` runs as a deploy step instead
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") not in ("0", "false", "False", "")
 
 # Initialize Google GenAI Client
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -31,7 +52,20 @@ else:
     from google import genai
     genai_client = genai.Client(api_key=api_key)
 
-app = FastAPI(title="Sleep Meditation Generator API", version="0.1.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if MIGRATE_ON_STARTUP:
+        # Create / upgrade the database schema; serialized between workers
+        await io_executor.run(migrate, engine)
+    await audio_jobs.start()
+    await user_activity.start()
+    yield
+    await audio_jobs.stop()
+    await user_activity.stop()
+    await async_engine.dispose()
+    shutdown_executors()
+
+app = FastAPI(title="Sleep Meditation Generator API", version="0.1.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -45,14 +79,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
-# Mount static files
+# Audio files (served by serve_audio below with Range / ETag support)
 AUDIO_DIR = Path("static/audio")
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
-app.mount("/static/audio", StaticFiles(directory=AUDIO_DIR), name="audio")
-
 @app.get("/")
 async def root():
     return {"message": "Sleep Meditation Generator Backend Running"}
@@ -61,8 +94,35 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.api_route("/static/audio/{filename}", methods=["GET", "HEAD"])
+async def serve_audio(filename: str, request: Request):
+    """
+    Audio files with byte-range (206) support for seeking, strong ETags,
+    conditional GET (304) and day-long caching for content-addressed files.
+    """
+    return await audio_file_response(AUDIO_DIR, filename, request.method, request.headers)
+
+@app.get("/api/metrics")
+async def get_metrics():
+    return {
+        "executors": executor_stats(),
+        "mood_cache": mood_cache.stats(),
+        "mood_index": mood_index.stats(),
+        "token_cache": token_cache.stats(),
+        "users": user_activity.stats(),
+        "single_flight": single_flight_stats(),
+        "idempotency": idempotency_stats,
+        "audio_cache": audio_cache_stats,
+        "audio_encoding": encode_stats,
+        "phrase_cache": phrase_cache.stats(),
+        "audio_jobs": await audio_jobs.stats(),
+        "database": database_stats(),
+    }
+
 from typing import List, Optional
-from sqlalchemy import or_, func
+
+async def fetch_meditation(db: AsyncSession, meditation_id: int, user_id: str):
+    return await db.scalar(models.owned_query(models.MeditationSession, meditation_id, user_id))
 
 @app.post("/api/mood/suggest", response_model=schemas.MoodResponse)
 async def suggest_from_mood(
@@ -70,145 +130,233 @@ async def suggest_from_mood(
     user: dict = Depends(get_current_user)
 ):
     try:
-        suggestion = analyze_mood(request.mood_text)
+        suggestion = await analyze_mood(request.mood_text)
         return suggestion
     except Exception as e:
         print(f"Error analyzing mood: {e}")
         raise HTTPException(status_code=500, detail="Failed to analyze mood")
 
+def build_meditation_session(request: schemas.MeditationRequest, user: dict, generated_content: dict) -> models.MeditationSession:
+    return models.MeditationSession(
+        type=request.type,
+        duration=request.duration,
+        requested_duration=request.duration,
+        preferences=request.preferences,
+        tone=request.tone,
+        voice_gender=request.voice_gender,
+        title=generated_content.get('title', 'Untitled Session'),
+        script=generated_content['visual_script'],
+        audio_script=generated_content['audio_script'],
+        user_id=user['uid'],
+        health_conditions=",".join(request.health_conditions) if request.health_conditions else None,
+        mood_before=request.mood_before
+    )
+
+async def save_meditation(db: AsyncSession, request: schemas.MeditationRequest, user: dict, generated_content: dict) -> models.MeditationSession:
+    """Insert the session and its condition tags in one transaction."""
+    db_session = build_meditation_session(request, user, generated_content)
+    db.add(db_session)
+    await db.flush()
+    await add_session_conditions(db, db_session, request.health_conditions)
+    await db.commit()
+    await db.refresh(db_session)
+    return db_session
+
+async def idempotent_replay(db: AsyncSession, user: dict, scope: str, idempotency_key: Optional[str], request_hash: str):
+    """The stored response when an Idempotency-Key is replayed, else None."""
+    if not idempotency_key:
+        return None
+    try:
+        return await stored_response(db, user['uid'], scope, validate_key(idempotency_key), request_hash)
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        # Don't hold a pooled connection while the request is being computed
+        await db.rollback()
+
+def generation_key(request: schemas.MeditationRequest, user: dict) -> str:
+    return request_key("generate", user['uid'], {
+        "type": request.type,
+        "duration": request.duration,
+        "preferences": request.preferences,
+        "tone": request.tone,
+        "voice_gender": request.voice_gender,
+        "health_conditions": sorted(condition_tags(request.health_conditions)),
+        "mood_before": request.mood_before,
+    })
+
+async def run_generation(request: schemas.MeditationRequest, user: dict) -> dict:
+    """Generate and save one session. Shared by coalesced requests, so it uses its own db session."""
+    generated_content = await generate_meditation_script(
+        type=request.type,
+        duration=request.duration,
+        preferences=request.preferences,
+        tone=request.tone,
+        health_conditions=request.health_conditions,
+        mood_before=request.mood_before
+    )
+    async with AsyncSessionLocal() as db:
+        db_session = await save_meditation(db, request, user, generated_content)
+        return schemas.MeditationResponse.model_validate(db_session).model_dump(mode="json")
+
 @app.post("/api/meditations/generate", response_model=schemas.MeditationResponse)
 async def generate_meditation(
     request: schemas.MeditationRequest, 
-    db: Session = Depends(get_db),
-    user: dict = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    # Identical requests in flight (double-clicks, retries) share one generation
+    request_hash = generation_key(request, user)
+    replay = await idempotent_replay(db, user, "generate", idempotency_key, request_hash)
+    if replay is not None:
+        return replay
     try:
-        # Generate script using LangChain/Gemini
-        generated_content = generate_meditation_script(
-            type=request.type,
-            duration=request.duration,
-            preferences=request.preferences,
-            tone=request.tone,
-            health_conditions=request.health_conditions,
-            mood_before=request.mood_before
-        )
-        
-        # Save to Database
-        db_session = models.MeditationSession(
-            type=request.type,
-            duration=request.duration,
-            preferences=request.preferences,
-            tone=request.tone,
-            voice_gender=request.voice_gender,
-            title=generated_content.get('title', 'Untitled Session'),
-            script=generated_content['visual_script'],
-            audio_script=generated_content['audio_script'],
-            user_id=user['uid'],
-            health_conditions=",".join(request.health_conditions) if request.health_conditions else None,
-            mood_before=request.mood_before
-        )
-        db.add(db_session)
-        db.commit()
-        db.refresh(db_session)
-        
-        return db_session
+        result = await generation_flights.run(request_hash, run_generation, request, user)
+        if idempotency_key:
+            await store_response(db, user['uid'], "generate", idempotency_key, request_hash, result)
+        return result
         
     except Exception as e:
         print(f"Error generation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/api/meditations/generate/stream")
+async def generate_meditation_stream(
+    request: schemas.MeditationRequest,
+    user: dict = Depends(get_current_user)
+):
+    """
+    Server-Sent Events variant of /api/meditations/generate.
+
+    Events: `title` once the title is complete, `visual_script` with text
+    deltas as they arrive, then `done` with the saved session (or `error`).
+    """
+    async def event_stream():
+        title_sent = False
+        visual_sent = ""
+        generated_content = {}
+        try:
+            async for partial in stream_meditation_script(
+                type=request.type,
+                duration=request.duration,
+                preferences=request.preferences,
+                tone=request.tone,
+                health_conditions=request.health_conditions,
+                mood_before=request.mood_before
+            ):
+                if not isinstance(partial, dict):
+                    continue
+                generated_content = partial
+
+                # The title is complete once the model has moved on to the next key
+                if not title_sent and "title" in partial and len(partial) > 1:
+                    title_sent = True
+                    yield sse_event("title", {"title": partial["title"]})
+
+                visual_script = partial.get("visual_script")
+                if visual_script and len(visual_script) > len(visual_sent) and visual_script.startswith(visual_sent):
+                    yield sse_event("visual_script", {"delta": visual_script[len(visual_sent):]})
+                    visual_sent = visual_script
+
+            if not title_sent:
+                yield sse_event("title", {"title": generated_content.get("title", "Untitled Session")})
+            visual_script = generated_content.get("visual_script", "")
+            if len(visual_script) > len(visual_sent):
+                yield sse_event("visual_script", {"delta": visual_script[len(visual_sent):]})
+
+            # Persist once the stream is finished, with our own session since
+            # the request-scoped one is closed by the time the body streams
+            async with AsyncSessionLocal() as db:
+                db_session = await save_meditation(db, request, user, generated_content)
+                saved = schemas.MeditationResponse.model_validate(db_session)
+
+            yield sse_event("done", saved.model_dump(mode="json"))
+
+        except Exception as e:
+            print(f"Error streaming generation: {e}")
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @app.get("/api/meditations/search", response_model=List[schemas.MeditationSearchResponse])
 async def search_meditations(
+    response: Response,
     query: Optional[str] = None,
     type: Optional[str] = None,
-    db: Session = Depends(get_db),
+    condition: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     try:
-        db_query = db.query(models.MeditationSession).filter(models.MeditationSession.user_id == user['uid'])
-        
-        # Apply filters first to narrow down results
-        if query:
-            search_pattern = f"%{query}%"
-            # Search in script, audio_script, and type
-            db_query = db_query.filter(
-                or_(
-                    models.MeditationSession.script.ilike(search_pattern),
-                    models.MeditationSession.audio_script.ilike(search_pattern),
-                    models.MeditationSession.type.ilike(search_pattern)
-                )
-            )
-            
+        # Text queries go through the full-text index, best match first
+        if query and query.strip():
+            results, next_cursor = await search_page(db, user['uid'], query, type=type, limit=limit, cursor=cursor, condition=condition)
+            if next_cursor:
+                response.headers["X-Next-Cursor"] = next_cursor
+            return results
+
+        db_query = (
+            select(models.MeditationSession)
+            .options(models.summary_columns())
+            .where(models.MeditationSession.user_id == user['uid'])
+        )
         if type:
-            db_query = db_query.filter(models.MeditationSession.type == type)
-            
-        results = db_query.order_by(models.MeditationSession.created_at.desc()).all()
-        
-        # Format response with match info
-        formatted_results = []
-        for session in results:
-            match_source = "none"
-            snippet = None
-            
-            if query:
-                lower_query = query.lower()
-                # Check script match
-                if session.script and lower_query in session.script.lower():
-                    match_source = "script"
-                    # Create snippet
-                    try:
-                        idx = session.script.lower().find(lower_query)
-                        start = max(0, idx - 40)
-                        end = min(len(session.script), idx + len(query) + 40)
-                        snippet = "..." + session.script[start:end] + "..."
-                    except:
-                        snippet = session.script[:100] + "..."
-                
-                # Check audio script match (priority lower than visual script)
-                elif session.audio_script and lower_query in session.audio_script.lower():
-                     match_source = "audio_script"
-                     try:
-                        idx = session.audio_script.lower().find(lower_query)
-                        start = max(0, idx - 40)
-                        end = min(len(session.audio_script), idx + len(query) + 40)
-                        snippet = "..." + session.audio_script[start:end] + "..."
-                     except:
-                        pass
-
-                # Check type match
-                elif session.type and lower_query in session.type.lower():
-                    match_source = "type"
-            
-            # If no query but filtering by type (or just listing), we can say match is none or filter
-            if not query and type:
-                 match_source = "filter"
-
-            formatted_results.append({
-                "session": session,
-                "match_info": {
-                    "matched_in": match_source,
-                    "snippet": snippet
-                }
-            })
-            
-        return formatted_results
+            db_query = db_query.where(models.MeditationSession.type == type)
+        if condition:
+            db_query = with_condition(db_query, user['uid'], condition)
+        sessions, next_cursor = await history_page(db, db_query, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+
+        match_source = "filter" if type or condition else "none"
+        return [
+            {"session": session, "match_info": {"matched_in": match_source, "snippet": None}}
+            for session in sessions
+        ]
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error searching meditations: {e}")
         raise HTTPException(status_code=500, detail="Failed to search meditations")
 
-@app.get("/api/meditations", response_model=List[schemas.MeditationResponse])
+@app.get("/api/meditations", response_model=List[schemas.MeditationSummary])
 async def get_meditations(
-    db: Session = Depends(get_db),
+    response: Response,
+    condition: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     try:
-        meditations = db.query(models.MeditationSession)\
-            .filter(models.MeditationSession.user_id == user['uid'])\
-            .order_by(models.MeditationSession.created_at.desc())\
-            .all()
+        db_query = (
+            select(models.MeditationSession)
+            .options(models.summary_columns())
+            .where(models.MeditationSession.user_id == user['uid'])
+        )
+        if condition:
+            db_query = with_condition(db_query, user['uid'], condition)
+        meditations, next_cursor = await history_page(db, db_query, limit, cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return meditations
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         print(f"Error fetching meditations: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch meditation history")
@@ -216,14 +364,11 @@ async def get_meditations(
 @app.get("/api/meditations/{meditation_id}", response_model=schemas.MeditationResponse)
 async def get_meditation_by_id(
     meditation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     try:
-        meditation = db.query(models.MeditationSession)\
-            .filter(models.MeditationSession.id == meditation_id)\
-            .filter(models.MeditationSession.user_id == user['uid'])\
-            .first()
+        meditation = await fetch_meditation(db, meditation_id, user['uid'])
             
         if not meditation:
             raise HTTPException(status_code=404, detail="Meditation session not found")
@@ -237,20 +382,22 @@ async def get_meditation_by_id(
 @app.delete("/api/meditations/{meditation_id}")
 async def delete_meditation(
     meditation_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     try:
-        meditation = db.query(models.MeditationSession)\
-            .filter(models.MeditationSession.id == meditation_id)\
-            .filter(models.MeditationSession.user_id == user['uid'])\
-            .first()
+        meditation = await fetch_meditation(db, meditation_id, user['uid'])
             
         if not meditation:
             raise HTTPException(status_code=404, detail="Meditation session not found or unauthorized")
             
-        db.delete(meditation)
-        db.commit()
+        orphaned = await release_audio(db, meditation.audio_url)
+        await apply_session(db, meditation, -1)
+        await remove_session_conditions(db, meditation.id)
+        await db.execute(cancel_jobs_query(meditation.id))
+        await db.delete(meditation)
+        await db.commit()
+        remove_audio_files(orphaned)
         
         return {"message": "Session deleted successfully"}
     except HTTPException as he:
@@ -268,8 +415,9 @@ async def get_random_quote():
         )
     
     try:
-        response = genai_client.models.generate_content(
-            model='gemini-2.5-flash', 
+        response = await llm_executor.call(
+            genai_client.aio.models.generate_content,
+            model='gemini-2.5-flash',
             contents="Tell me a random inspirational quote"
         )
         
@@ -289,86 +437,288 @@ async def get_random_quote():
 # Audio Generation Integration
 class AudioRequest(schemas.BaseModel):
     voice_gender: str = "Female"
+    format: Optional[str] = None # wav / flac / opus / mp3, else negotiated from Accept
+    ambient: Optional[str] = None # background bed, see GET /api/ambients
+    fit_duration: bool = False # stretch pauses towards the requested duration
+
+def resolve_audio_format(requested: Optional[str], http_request: Request) -> str:
+    try:
+        return negotiate_format(requested, http_request.headers.get("accept"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def resolve_ambient(name: Optional[str]) -> Optional[str]:
+    if name and name not in available_ambients():
+        raise HTTPException(status_code=400, detail=f"Unknown ambient track '{name}'. Available: {', '.join(available_ambients())}")
+    return name or None
+
+def target_seconds_for(session: models.MeditationSession, fit_duration: bool) -> Optional[int]:
+    # `duration` becomes the audio's length once generated; fit to what was asked for
+    minutes = session.requested_duration or session.duration
+    return minutes * 60 if fit_duration and minutes else None
+
+@app.get("/api/ambients")
+async def list_ambients():
+    return {"ambients": available_ambients()}
+
+async def run_audio_generation(meditation_id: int, user_id: str, voice_gender: str, audio_format: str, ambient: Optional[str], fit_duration: bool) -> dict:
+    """
+    Synthesize and attach a session's audio. Shared by coalesced requests, so
+    it uses its own db sessions: one to read the script and one to save the
+    result, with no connection held during synthesis.
+    """
+    async with AsyncSessionLocal() as db:
+        session = await fetch_meditation(db, meditation_id, user_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Meditation not found")
+
+    target_seconds = target_seconds_for(session, fit_duration)
+    audio_url, duration_seconds = await generate_audio(
+        session.audio_script,
+        voice_gender=voice_gender,
+        audio_format=audio_format,
+        ambient=ambient,
+        target_seconds=target_seconds
+    )
+    
+    # Waveform, exact duration and checksum, computed once here rather than by every client
+    metadata = await audio_metadata(audio_url)
+
+    # Update DB
+    async with AsyncSessionLocal() as db:
+        session = await fetch_meditation(db, meditation_id, user_id)
+        if not session:
+            orphaned = await unreferenced_audio(db, audio_url)
+            await db.rollback()
+            remove_audio_files(orphaned)
+            raise HTTPException(status_code=404, detail="Meditation was deleted")
+        orphaned = await apply_generated_audio(db, session, audio_url, duration_seconds, voice_gender, audio_format, metadata)
+        await db.commit()
+    remove_audio_files(orphaned)
+    
+    return {"audio_url": audio_url, "duration_seconds": round(duration_seconds, 2), "target_seconds": target_seconds}
 
 @app.post("/api/meditations/{meditation_id}/audio")
 async def generate_meditation_audio(
     meditation_id: int,
     request: AudioRequest,
-    db: Session = Depends(get_db),
-    user: dict = Depends(get_current_user)
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None)
 ):
+    audio_format = resolve_audio_format(request.format, http_request)
+    ambient = resolve_ambient(request.ambient)
+    request_hash = request_key("audio", user['uid'], meditation_id, request.voice_gender, audio_format, ambient, request.fit_duration)
+    replay = await idempotent_replay(db, user, "audio", idempotency_key, request_hash)
+    if replay is not None:
+        return replay
     try:
         # Fetch meditation
-        session = db.query(models.MeditationSession)\
-            .filter(models.MeditationSession.id == meditation_id)\
-            .filter(models.MeditationSession.user_id == user['uid'])\
-            .first()
+        session = await fetch_meditation(db, meditation_id, user['uid'])
             
         if not session:
             raise HTTPException(status_code=404, detail="Meditation not found")
             
         if not session.audio_script:
             raise HTTPException(status_code=400, detail="No audio script available for this session")
+        # Release the connection: synthesis takes seconds to minutes
+        await db.rollback()
             
-        # Generate Audio
-        audio_url, duration_seconds = await generate_audio(session.audio_script, voice_gender=request.voice_gender)
-        
-        # Calculate minutes (round to nearest minute, min 1)
-        duration_minutes = max(1, round(duration_seconds / 60))
-        
-        # Update DB
-        session.audio_url = audio_url
-        session.duration = duration_minutes # Update to actual generated length
-        session.voice_used = request.voice_gender
-        session.audio_generated_at = func.now()
-        
-        db.commit()
-        db.refresh(session)
+        # Generate Audio, once for concurrent requests for the same session, voice and mix
+        result = await audio_flights.run(
+            request_hash, run_audio_generation,
+            meditation_id, user['uid'], request.voice_gender, audio_format, ambient, request.fit_duration
+        )
+        if idempotency_key:
+            await store_response(db, user['uid'], "audio", idempotency_key, request_hash, result)
         
-        return {"audio_url": audio_url}
+        return result
         
+    except HTTPException as he:
+        raise he
     except Exception as e:
         print(f"Error generating audio: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/meditations/{meditation_id}/audio/stream")
+async def stream_meditation_audio(
+    meditation_id: int,
+    request: AudioRequest,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Progressive variant of /api/meditations/{id}/audio: streams a WAV as
+    chunks finish synthesis. The session is updated exactly like the
+    non-streaming endpoint once the whole file has been written.
+    Pauses are kept at their marked length (fit_duration is ignored).
+    """
+    ambient = resolve_ambient(request.ambient)
+    session = await fetch_meditation(db, meditation_id, user['uid'])
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Meditation not found")
+
+    if not session.audio_script:
+        raise HTTPException(status_code=400, detail="No audio script available for this session")
+    audio_script = session.audio_script
+    # Release the connection: the body streams for as long as synthesis takes
+    await db.rollback()
+
+    async def on_complete(audio_url: str, duration_seconds: float):
+        metadata = await audio_metadata(audio_url)
+        # The request-scoped session is closed once the body starts streaming
+        async with AsyncSessionLocal() as stream_db:
+            stream_session = await stream_db.get(models.MeditationSession, meditation_id)
+            if stream_session:
+                orphaned = await apply_generated_audio(stream_db, stream_session, audio_url, duration_seconds, request.voice_gender, metadata=metadata)
+                await stream_db.commit()
+                remove_audio_files(orphaned)
+
+    return StreamingResponse(
+        stream_audio(audio_script, voice_gender=request.voice_gender, on_complete=on_complete, ambient=ambient),
+        media_type="audio/wav",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/meditations/{meditation_id}/audio/jobs", response_model=schemas.AudioJobResponse, status_code=202)
+async def enqueue_meditation_audio(
+    meditation_id: int,
+    request: schemas.AudioJobRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Queue audio generation in the background and return the job right away.
+    Poll GET /api/jobs/{job_id}; a retried POST returns the job already in flight.
+    """
+    audio_format = resolve_audio_format(request.format, http_request)
+    ambient = resolve_ambient(request.ambient)
+
+    session = await fetch_meditation(db, meditation_id, user['uid'])
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Meditation not found")
+
+    if not session.audio_script:
+        raise HTTPException(status_code=400, detail="No audio script available for this session")
+
+    try:
+        return await audio_jobs.enqueue(
+            db, meditation_id, user['uid'], request.voice_gender, audio_format, client_priority(request.priority),
+            ambient=ambient, target_seconds=target_seconds_for(session, request.fit_duration)
+        )
+    except Exception as e:
+        print(f"Error queueing audio job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue audio generation")
+
+@app.get("/api/jobs/{job_id}", response_model=schemas.AudioJobResponse)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    job = await db.scalar(models.owned_query(models.AudioJob, job_id, user['uid']))
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return job
+
+@app.get("/api/meditations/{meditation_id}/waveform", response_model=schemas.WaveformResponse)
+async def get_meditation_waveform(
+    meditation_id: int,
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    """
+    Peak/RMS envelope plus exact duration, size and checksum of the session's
+    audio, so players can draw a scrubber without downloading the file.
+    """
+    session = await fetch_meditation(db, meditation_id, user['uid'])
+
+    if not session:
+        raise HTTPException(status_code=404, detail="Meditation not found")
+
+    if not session.audio_url:
+        raise HTTPException(status_code=404, detail="No audio generated for this session")
+
+    if not session.waveform:
+        # Audio generated before waveforms were stored: analyse it once now
+        metadata = await audio_metadata(session.audio_url)
+        if not metadata:
+            raise HTTPException(status_code=404, detail="Audio file not found")
+        apply_audio_metadata(session, metadata)
+        await db.commit()
+
+    waveform = json.loads(session.waveform)
+    return {
+        "audio_url": session.audio_url,
+        "audio_format": session.audio_format,
+        "duration_ms": session.audio_duration_ms,
+        "size_bytes": session.audio_size_bytes,
+        "checksum": session.audio_checksum,
+        **waveform
+    }
 
 
 @app.post("/api/meditations/{meditation_id}/mood-after", response_model=schemas.MeditationResponse)
 async def update_mood_after(
     meditation_id: int,
     request: schemas.MoodAfterRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     user: dict = Depends(get_current_user)
 ):
     try:
-        session = db.query(models.MeditationSession)\
-            .filter(models.MeditationSession.id == meditation_id)\
-            .filter(models.MeditationSession.user_id == user['uid'])\
-            .first()
+        session = await fetch_meditation(db, meditation_id, user['uid'])
             
         if not session:
             raise HTTPException(status_code=404, detail="Meditation not found")
             
+        # A re-rating replaces the session's previous contribution to the rollups
+        await apply_session(db, session, -1)
         session.mood_after = request.mood_after
+        session.improvement_score = improvement_score(session.mood_before, session.mood_after)
+        await apply_session(db, session)
         
-        # Calculate improvement score
-        mood_scores = {
-            "Very anxious": 9, "Overthinking": 8, "Burned out": 8,
-            "Sad": 7, "Frustrated": 7, "Restless": 6, "Low energy": 6,
-            "Slightly stressed": 5, "Distracted": 5, "Tired": 4,
-            "Calm": 2, "Peaceful": 1, "Hopeful": 2, "Numb": 3, "Angry": 7
-        }
-        
-        before_score = mood_scores.get(session.mood_before, 5)
-        after_score = mood_scores.get(session.mood_after, 5)
-        
-        session.improvement_score = before_score - after_score
-        
-        db.commit()
-        db.refresh(session)
+        await db.commit()
+        await db.refresh(session)
         
         return session
     except Exception as e:
         print(f"Error updating mood after: {e}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics", response_model=schemas.AnalyticsResponse)
+async def get_analytics(
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    try:
+        rollups = await user_rollups(db, user['uid'])
+        return {
+            "total": rollups["all"][0] if rollups["all"] else None,
+            "by_type": rollups["type"],
+            "by_tone": rollups["tone"],
+            "by_duration": rollups["duration"],
+            "by_week": rollups["week"],
+            "streak": await current_streak(db, user['uid']),
+        }
+    except Exception as e:
+        print(f"Error fetching analytics: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch analytics")
+
+@app.get("/api/conditions", response_model=List[schemas.ConditionCount])
+async def get_condition_counts(
+    db: AsyncSession = Depends(get_db),
+    user: dict = Depends(get_current_user)
+):
+    try:
+        return await condition_counts(db, user['uid'])
+    except Exception as e:
+        print(f"Error fetching condition counts: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch condition counts")
     
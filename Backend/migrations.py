@@ -0,0 +1,288 @@
+"""
+Versioned schema migrations for DATABASE_URL (SQLite or PostgreSQL).
+
+    python migrations.py            apply pending migrations, then ANALYZE
+    python migrations.py status     show applied and pending versions
+    python migrations.py plans      print the plan of every hot query
+    python migrations.py plans --strict
+                                    ... and exit 1 if one scans a whole table
+
+The app applies pending migrations at startup (unless MIGRATE_ON_STARTUP=0,
+for deploys that run `python migrations.py` as a separate step). Workers
+starting together take turns: migrate() holds an advisory lock on PostgreSQL
+or a lock file next to the SQLite database. Applied versions are recorded
+in `schema_migrations`. Every step is idempotent (IF NOT EXISTS, add missing
+columns only): SQLite's driver doesn't wrap DDL in the transaction, so a step
+interrupted halfway must be safe to run again.
+
+To change the schema, update models.py and append a migration here. Fresh
+databases get the current models from the first migration, so later steps
+must skip what already exists.
+"""
+import sys
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from sqlalchemy import (
+    Column, DateTime, Integer, MetaData, String, Table, Text, func, inspect, select, text,
+)
+
+import models
+from database import engine as default_engine
+from services.pagination import encode_cursor, page_query
+from services.analytics import rebuild_rollups, user_rollups_query
+from services.conditions import backfill_conditions, condition_counts_query, with_condition
+from services.jobs import active_job_query, next_job_query, stale_jobs
+from services.search import ensure_search_index, match_expression, search_sql, sessions_by_id_query
+from services.user_activity import user_exists_query
+
+try:
+    import fcntl
+except ImportError: # Windows: run migrations as a deploy step when starting several workers
+    fcntl = None
+
+# pg_advisory_lock key, the same in every process migrating this database
+MIGRATION_LOCK_ID = 720431
+
+MIGRATIONS = [] # (version, description, upgrade(conn))
+
+def migration(version: int, description: str):
+    def register(upgrade):
+        MIGRATIONS.append((version, description, upgrade))
+        return upgrade
+    return register
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String),
+    Column("applied_at", DateTime(timezone=True)),
+)
+
+def add_columns(conn, table: str, columns: list):
+    """ALTER TABLE ADD COLUMN for each (name, SQLAlchemy type) the table lacks."""
+    existing = {column["name"] for column in inspect(conn).get_columns(table)}
+    for name, column_type in columns:
+        if name not in existing:
+            print(f"Adding column {table}.{name}...")
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type.compile(dialect=conn.dialect)}"))
+
+def create_index(conn, name: str, table: str, columns: str):
+    conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+@migration(1, "Tables, and columns added before migrations were versioned")
+def _baseline(conn):
+    models.Base.metadata.create_all(conn)
+    # Formerly migrate_db.py and update_db_schema.py
+    add_columns(conn, "meditation_sessions", [
+        ("title", Text()),
+        ("audio_url", Text()),
+        ("voice_used", Text()),
+        ("audio_generated_at", DateTime(timezone=True)),
+        ("audio_script", Text()),
+        ("voice_gender", Text()),
+        ("health_conditions", Text()),
+        ("mood_before", String()),
+        ("mood_after", String()),
+        ("improvement_score", Integer()),
+        ("audio_format", String()),
+        ("audio_duration_ms", Integer()),
+        ("audio_size_bytes", Integer()),
+        ("audio_checksum", String()),
+        ("waveform", Text()),
+    ])
+    add_columns(conn, "audio_jobs", [
+        ("audio_format", String()),
+        ("ambient", String()),
+        ("target_seconds", Integer()),
+    ])
+
+@migration(2, "Composite indexes for history pages, type filters and the job queue")
+def _composite_indexes(conn):
+    create_index(conn, "ix_meditation_sessions_user_created", "meditation_sessions", "user_id, created_at DESC, id DESC")
+    create_index(conn, "ix_meditation_sessions_user_type", "meditation_sessions", "user_id, type, created_at DESC, id DESC")
+    create_index(conn, "ix_audio_jobs_queue", "audio_jobs", "status, priority DESC, id")
+
+@migration(3, "Full-text search index over scripts and type")
+def _search_index(conn):
+    ensure_search_index(conn)
+
+@migration(4, "Mood-improvement analytics rollups, backfilled from existing ratings")
+def _mood_rollups(conn):
+    models.Base.metadata.create_all(conn, tables=[models.MoodRollup.__table__])
+    # Filled by migration 7: rebuild_rollups reads requested_duration
+
+@migration(5, "Health-condition tags, backfilled from the comma-joined column")
+def _session_conditions(conn):
+    models.Base.metadata.create_all(conn, tables=[models.SessionCondition.__table__])
+    backfill_conditions(conn)
+
+@migration(6, "Stored responses for Idempotency-Key replays")
+def _idempotency_keys(conn):
+    models.Base.metadata.create_all(conn, tables=[models.IdempotencyRecord.__table__])
+
+@migration(7, "Requested duration, kept apart from the audio length that replaces `duration`")
+def _requested_duration(conn):
+    add_columns(conn, "meditation_sessions", [("requested_duration", Integer())])
+    # Best available value: sessions whose audio was generated already lost it
+    conn.execute(text("UPDATE meditation_sessions SET requested_duration = duration WHERE requested_duration IS NULL"))
+    # Rollups were bucketed on `duration`, which may have changed since
+    rebuild_rollups(conn)
+
+
+def applied_versions(conn) -> set:
+    _metadata.create_all(conn)
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+@contextmanager
+def migration_lock(engine=default_engine):
+    """Held by one process at a time, so concurrent startups don't apply the same step twice."""
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+            conn.commit()
+            try:
+                yield
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+                conn.commit()
+        return
+
+    database = engine.url.database
+    if fcntl is None or not database or database == ":memory:":
+        yield
+        return
+    with open(f"{database}.migrate.lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def migrate(engine=default_engine, analyze: bool = True) -> list:
+    """Apply pending migrations in order; returns the versions applied."""
+    applied = []
+    with migration_lock(engine):
+        # Read under the lock: another process may have just applied them
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, description, upgrade in sorted(MIGRATIONS, key=lambda m: m[0]):
+            if version in done:
+                continue
+            print(f"Applying migration {version}: {description}")
+            with engine.begin() as conn:
+                upgrade(conn)
+                conn.execute(schema_migrations.insert().values(
+                    version=version, description=description, applied_at=datetime.now(timezone.utc)
+                ))
+            applied.append(version)
+        if applied and analyze:
+            run_analyze(engine)
+    return applied
+
+def run_analyze(engine=default_engine):
+    """Refresh planner statistics so the new indexes are actually chosen."""
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def primary_key_query(model, *key):
+    """What AsyncSession.get(model, key) emits on an identity-map miss."""
+    columns = inspect(model).primary_key
+    return select(model).where(*[column == value for column, value in zip(columns, key)])
+
+def hot_queries(sql_dialect) -> list:
+    """
+    (name, SQL, params) for every query behind the API, with representative
+    values. Built with the same query functions the endpoints and workers
+    call, so a changed query is checked as it really runs.
+    """
+    Session, Job = models.MeditationSession, models.AudioJob
+    dialect = sql_dialect.name
+    user_id = "plan-user"
+
+    def compiled(statement):
+        return str(statement.compile(dialect=sql_dialect, compile_kwargs={"literal_binds": True}))
+
+    history = select(Session).options(models.summary_columns()).where(Session.user_id == user_id)
+    cursor = encode_cursor({"c": "2025-01-01 00:00:00", "i": 1000})
+    queries = [
+        ("GET /api/meditations", page_query(history, 50, dialect=dialect)),
+        ("GET /api/meditations?cursor", page_query(history, 50, cursor, dialect)),
+        ("GET /api/meditations/search?type", page_query(history.where(Session.type == "Sleep"), 50, dialect=dialect)),
+        ("GET /api/meditations/search?type&cursor", page_query(history.where(Session.type == "Sleep"), 50, cursor, dialect)),
+        ("GET /api/meditations?condition", page_query(with_condition(history, user_id, "insomnia"), 50, dialect=dialect)),
+        ("GET /api/conditions", condition_counts_query(user_id)),
+        ("search results by id", sessions_by_id_query([1, 2, 3])),
+        ("GET/DELETE /api/meditations/{id}", models.owned_query(Session, 1, user_id)),
+        ("GET /api/jobs/{id}", models.owned_query(Job, 1, user_id)),
+        ("audio job dedupe", active_job_query(1, user_id, "Female", "wav")),
+        ("audio job claim", next_job_query()),
+        ("audio job stale requeue", select(Job.id).where(stale_jobs(0))),
+        ("auth user lookup", user_exists_query(user_id)),
+        ("audio file refcount", primary_key_query(models.AudioFile, "key")),
+        ("Idempotency-Key replay", primary_key_query(models.IdempotencyRecord, user_id, "generate", "key")),
+        ("GET /api/analytics", user_rollups_query(user_id)),
+    ]
+    result = [(name, compiled(statement), {}) for name, statement in queries]
+    for name, with_type, with_tag, after in (
+        ("GET /api/meditations/search?query", False, False, False),
+        ("GET /api/meditations/search?query&cursor", False, False, True),
+        ("GET /api/meditations/search?query&type", True, False, False),
+        ("GET /api/meditations/search?query&condition", False, True, False),
+    ):
+        params = {"match": match_expression(dialect, "ocean waves", user_id), "user_id": user_id, "limit": 51,
+                  "type": "Sleep", "condition": "insomnia", "after_rank": -1.5, "after_id": 1000}
+        result.append((name, search_sql(dialect, with_type, with_tag, after), params))
+    return result
+
+def _full_scans(dialect: str, plan: list) -> list:
+    if dialect == "postgresql":
+        return [line for line in plan if "Seq Scan" in line]
+    # "SCAN t" reads every row; "SCAN t USING [COVERING] INDEX" / "VIRTUAL TABLE" don't
+    return [line for line in plan if line.startswith("SCAN ") and " USING " not in line and "VIRTUAL TABLE" not in line]
+
+def query_plans(engine=default_engine) -> list:
+    """[(name, plan lines, full scan lines)] for hot_queries()."""
+    dialect = engine.dialect.name
+    explain = "EXPLAIN" if dialect == "postgresql" else "EXPLAIN QUERY PLAN"
+    plans = []
+    with engine.connect() as conn:
+        for name, sql, params in hot_queries(engine.dialect):
+            rows = conn.execute(text(f"{explain} {sql}"), params).all()
+            plan = [row[0] for row in rows] if dialect == "postgresql" else [row[-1] for row in rows]
+            plans.append((name, plan, _full_scans(dialect, plan)))
+    return plans
+
+def print_query_plans(engine=default_engine) -> int:
+    """Print every plan; returns how many queries scan a whole table."""
+    flagged = 0
+    for name, plan, scans in query_plans(engine):
+        print(f"{'FULL SCAN ' if scans else ''}{name}")
+        for line in plan:
+            print(f"    {line}")
+        flagged += bool(scans)
+    print(f"{flagged} queries with a full table scan")
+    return flagged
+
+def print_status(engine=default_engine):
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    for version, description, _ in sorted(MIGRATIONS, key=lambda m: m[0]):
+        print(f"{version:>4} {'applied' if version in done else 'pending':<8} {description}")
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "upgrade":
+        applied = migrate(analyze=False)
+        run_analyze()
+        print(f"Applied {len(applied)} migrations." if applied else "Database is up to date.")
+    elif command == "status":
+        print_status()
+    elif command == "plans":
+        flagged = print_query_plans()
+        sys.exit(1 if flagged and "--strict" in sys.argv else 0)
+    else:
+        print(__doc__)
+        sys.exit(2)
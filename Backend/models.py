@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import Column, Integer, String, Text, DateTime, Float, Index, func, select
+from sqlalchemy.orm import column_property, load_only
 from database import Base
 
 class User(Base):
@@ -15,7 +16,8 @@ class MeditationSession(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, nullable=True) # New field for AI generated title
     type = Column(String, index=True)
-    duration = Column(Integer)
+    duration = Column(Integer) # minutes; set to the audio's length once it is generated
+    requested_duration = Column(Integer, nullable=True) # minutes asked for, never changes
     preferences = Column(String, nullable=True)
     tone = Column(String, nullable=True)
     script = Column(Text)
@@ -24,12 +26,119 @@ class MeditationSession(Base):
     voice_gender = Column(String, default="female") 
     audio_script = Column(Text, nullable=True)
     audio_url = Column(String, nullable=True)
+    audio_format = Column(String, nullable=True) # wav / flac / opus / mp3
+    audio_duration_ms = Column(Integer, nullable=True) # exact length; `duration` is whole minutes
+    audio_size_bytes = Column(Integer, nullable=True)
+    audio_checksum = Column(String, nullable=True) # sha256 of the served file
+    waveform = Column(Text, nullable=True) # JSON serialized {"bins", "peaks", "rms"}
     voice_used = Column(String, nullable=True)
     audio_generated_at = Column(DateTime(timezone=True), nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # New Fields for Feature 1 & 2
-    health_conditions = Column(Text, nullable=True) # JSON serialized list
+    health_conditions = Column(Text, nullable=True) # comma-joined, for display; queries use session_conditions
     mood_before = Column(String, nullable=True)
     mood_after = Column(String, nullable=True)
     improvement_score = Column(Integer, nullable=True)
+
+    # Start of the script for list cards, cut in SQL so the full text isn't read
+    preview = column_property(func.substr(script, 1, 160), deferred=True)
+
+    # Newest-first history pages for one user (keyset on created_at, id), with
+    # and without a type filter. Existing databases get them from migrations.py.
+    __table_args__ = (
+        Index("ix_meditation_sessions_user_created", user_id, created_at.desc(), id.desc()),
+        Index("ix_meditation_sessions_user_type", user_id, type, created_at.desc(), id.desc()),
+    )
+
+def summary_columns():
+    """
+    load_only() for list views (schemas.MeditationSummary): everything but the
+    multi-KB scripts and waveform. Touching anything else raises instead of
+    lazy-loading it row by row.
+    """
+    return load_only(
+        MeditationSession.id, MeditationSession.title, MeditationSession.type,
+        MeditationSession.duration, MeditationSession.tone, MeditationSession.voice_gender,
+        MeditationSession.audio_url, MeditationSession.audio_format, MeditationSession.audio_duration_ms,
+        MeditationSession.created_at, MeditationSession.health_conditions, MeditationSession.mood_before,
+        MeditationSession.mood_after, MeditationSession.improvement_score, MeditationSession.preview,
+        raiseload=True,
+    )
+
+def owned_query(model, row_id: int, user_id: str):
+    """One row by id, only if it belongs to user_id (sessions, audio jobs)."""
+    return select(model).where(model.id == row_id).where(model.user_id == user_id)
+
+class SessionCondition(Base):
+    """One health condition of a session, as a normalized tag (see services/conditions.py)."""
+    __tablename__ = "session_conditions"
+
+    session_id = Column(Integer, primary_key=True) # meditation_sessions.id
+    tag = Column(String, primary_key=True) # lowercased, whitespace collapsed
+    user_id = Column(String, nullable=False)
+
+    # Filter a user's history by condition, and count conditions per user
+    __table_args__ = (
+        Index("ix_session_conditions_user_tag", user_id, tag, session_id),
+    )
+
+class MoodRollup(Base):
+    """Per-user mood-improvement totals for one bucket of one dimension (see services/analytics.py)."""
+    __tablename__ = "mood_rollups"
+
+    user_id = Column(String, primary_key=True)
+    dimension = Column(String, primary_key=True) # all / type / tone / duration / week
+    bucket = Column(String, primary_key=True)
+    sessions = Column(Integer, default=0, nullable=False) # rated sessions
+    improvement_total = Column(Integer, default=0, nullable=False) # sum of improvement_score
+    improved = Column(Integer, default=0, nullable=False) # sessions with improvement_score > 0
+
+class MoodSuggestionCache(Base):
+    __tablename__ = "mood_suggestion_cache"
+
+    key = Column(String, primary_key=True) # normalized mood text
+    suggestion = Column(Text) # JSON serialized MoodSuggestion
+    expires_at = Column(Float, index=True) # unix timestamp
+
+class IdempotencyRecord(Base):
+    __tablename__ = "idempotency_keys"
+
+    user_id = Column(String, primary_key=True)
+    scope = Column(String, primary_key=True) # endpoint, e.g. "generate" or "audio"
+    key = Column(String, primary_key=True) # client's Idempotency-Key header
+    request_hash = Column(String, nullable=False) # canonical hash of the request parameters
+    response = Column(Text) # JSON serialized response body
+    expires_at = Column(Float, index=True) # unix timestamp
+
+class AudioFile(Base):
+    __tablename__ = "audio_files"
+
+    content_key = Column(String, primary_key=True) # sha256 of script + voice + model + format
+    ref_count = Column(Integer, default=0, nullable=False) # sessions whose audio_url points here
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class AudioJob(Base):
+    __tablename__ = "audio_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    meditation_id = Column(Integer, index=True)
+    user_id = Column(String, index=True)
+    voice_gender = Column(String, default="Female")
+    audio_format = Column(String, default="wav")
+    ambient = Column(String, nullable=True) # background bed mixed under the voice
+    target_seconds = Column(Integer, nullable=True) # pauses are stretched towards this length
+    priority = Column(Integer, default=0) # higher runs first
+    status = Column(String, default="queued", index=True) # queued / running / done / failed
+    progress = Column(Integer, default=0) # percent
+    attempts = Column(Integer, default=0)
+    audio_url = Column(String, nullable=True)
+    error = Column(Text, nullable=True)
+    heartbeat_at = Column(Float, nullable=True) # unix timestamp, renewed while running
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    # Workers claim the highest-priority queued job
+    __table_args__ = (
+        Index("ix_audio_jobs_queue", status, priority.desc(), id),
+    )
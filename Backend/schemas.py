@@ -31,6 +31,10 @@ class MeditationResponse(BaseModel):
     script: str
     audio_script: Optional[str] = None
     audio_url: Optional[str] = None
+    audio_format: Optional[str] = None
+    audio_duration_ms: Optional[int] = None
+    audio_size_bytes: Optional[int] = None
+    audio_checksum: Optional[str] = None
     voice_used: Optional[str] = None
     audio_generated_at: Optional[datetime] = None
     created_at: datetime
@@ -44,14 +48,85 @@ class MeditationResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MeditationSummary(BaseModel):
+    """List entry: no scripts; GET /api/meditations/{id} has the full session."""
+    id: int
+    title: Optional[str] = None
+    type: str
+    duration: int
+    tone: Optional[str] = None
+    voice_gender: Optional[str] = None
+    preview: Optional[str] = None # first 160 characters of the script
+    audio_url: Optional[str] = None
+    audio_format: Optional[str] = None
+    audio_duration_ms: Optional[int] = None
+    created_at: datetime
+    health_conditions: Optional[str] = None
+    mood_before: Optional[str] = None
+    mood_after: Optional[str] = None
+    improvement_score: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+class WaveformResponse(BaseModel):
+    audio_url: str
+    audio_format: Optional[str] = None
+    duration_ms: int
+    size_bytes: int
+    checksum: str
+    bins: int
+    peaks: List[float] # per-bin peak amplitude, 0..1
+    rms: List[float] # per-bin RMS amplitude, 0..1
+
 class SearchMatchInfo(BaseModel):
     matched_in: str
     snippet: Optional[str] = None
 
 class MeditationSearchResponse(BaseModel):
-    session: MeditationResponse
+    session: MeditationSummary
     match_info: SearchMatchInfo
 
+class AnalyticsBucket(BaseModel):
+    bucket: str
+    sessions: int # sessions with a mood-after rating
+    average_improvement: float
+    improved: int # sessions that ended calmer than they started
+
+class AnalyticsResponse(BaseModel):
+    total: Optional[AnalyticsBucket] = None
+    by_type: List[AnalyticsBucket]
+    by_tone: List[AnalyticsBucket]
+    by_duration: List[AnalyticsBucket] # minutes: 0-5, 6-10, 11-20, 21+
+    by_week: List[AnalyticsBucket] # bucket is the Monday of the week
+    streak: int = 0 # consecutive days with a session, ending today or yesterday (UTC)
+
+class ConditionCount(BaseModel):
+    tag: str
+    sessions: int
+
 class MoodAfterRequest(BaseModel):
     mood_after: str
 
+class AudioJobRequest(BaseModel):
+    voice_gender: str = "Female"
+    format: Optional[str] = None # wav / flac / opus / mp3, else negotiated from Accept
+    ambient: Optional[str] = None # background bed, see GET /api/ambients
+    fit_duration: bool = False # stretch pauses towards the requested duration
+    priority: int = 0 # clamped to -10..0: clients can only deprioritize their own jobs
+
+class AudioJobResponse(BaseModel):
+    id: int
+    meditation_id: int
+    status: str
+    progress: int
+    voice_gender: Optional[str] = None
+    audio_format: Optional[str] = None
+    ambient: Optional[str] = None
+    audio_url: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,187 @@
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# Per-user mood-improvement rollups. Each rated session (improvement_score set
+# by /mood-after) counts once in every dimension below plus the "all" total.
+# Rows are adjusted in the same transaction as the rating or the delete, so
+# /api/analytics only ever reads a handful of rows per user.
+
+MOOD_SCORES = {
+    "Very anxious": 9, "Overthinking": 8, "Burned out": 8,
+    "Sad": 7, "Frustrated": 7, "Restless": 6, "Low energy": 6,
+    "Slightly stressed": 5, "Distracted": 5, "Tired": 4,
+    "Calm": 2, "Peaceful": 1, "Hopeful": 2, "Numb": 3, "Angry": 7
+}
+NEUTRAL_SCORE = 5
+
+DIMENSIONS = ("all", "type", "tone", "duration", "week")
+# Upper bounds (minutes, inclusive) of the duration buckets; longer is "21+"
+DURATION_EDGES = (5, 10, 20)
+DURATION_LABELS = ("0-5", "6-10", "11-20", "21+")
+NO_TONE = "unspecified"
+
+def improvement_score(mood_before: str, mood_after: str) -> int:
+    """Positive when the mood after is calmer than before (unknown moods count as neutral)."""
+    return MOOD_SCORES.get(mood_before, NEUTRAL_SCORE) - MOOD_SCORES.get(mood_after, NEUTRAL_SCORE)
+
+def duration_bucket(minutes: int) -> str:
+    return DURATION_LABELS[int(np.searchsorted(DURATION_EDGES, minutes or 0))]
+
+def week_bucket(created_at) -> str:
+    """Monday of the session's week, e.g. 2026-02-09."""
+    day = created_at.date()
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def session_buckets(session) -> dict:
+    return {
+        "all": "all",
+        "type": session.type,
+        "tone": session.tone or NO_TONE,
+        # Not `duration`: generating audio overwrites it with the audio's length
+        "duration": duration_bucket(session.requested_duration),
+        "week": week_bucket(session.created_at),
+    }
+
+def _upsert(dialect: str, rows: list):
+    insert_for = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    statement = insert_for(models.MoodRollup).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "dimension", "bucket"],
+        set_={
+            "sessions": models.MoodRollup.sessions + statement.excluded.sessions,
+            "improvement_total": models.MoodRollup.improvement_total + statement.excluded.improvement_total,
+            "improved": models.MoodRollup.improved + statement.excluded.improved,
+        },
+    )
+
+async def apply_session(db: AsyncSession, session, sign: int = 1):
+    """
+    Add (sign=1) or remove (sign=-1) a rated session's contribution. Call it
+    before commit, alongside the change to the session itself.
+    """
+    score = session.improvement_score
+    if score is None:
+        return
+    rows = [
+        {
+            "user_id": session.user_id,
+            "dimension": dimension,
+            "bucket": bucket,
+            "sessions": sign,
+            "improvement_total": sign * score,
+            "improved": sign * (score > 0),
+        }
+        for dimension, bucket in session_buckets(session).items()
+    ]
+    await db.execute(_upsert(db.get_bind().dialect.name, rows))
+
+def user_rollups_query(user_id: str):
+    return (
+        select(models.MoodRollup)
+        .where(models.MoodRollup.user_id == user_id)
+        .where(models.MoodRollup.sessions > 0)
+        .order_by(models.MoodRollup.dimension, models.MoodRollup.bucket)
+    )
+
+async def user_rollups(db: AsyncSession, user_id: str) -> dict:
+    """{dimension: [bucket stats]} for one user, read from the rollups only."""
+    rollups = await db.scalars(user_rollups_query(user_id))
+    result = {dimension: [] for dimension in DIMENSIONS}
+    for rollup in rollups:
+        result.setdefault(rollup.dimension, []).append({
+            "bucket": rollup.bucket,
+            "sessions": rollup.sessions,
+            "average_improvement": round(rollup.improvement_total / rollup.sessions, 2),
+            "improved": rollup.improved,
+        })
+    result["duration"].sort(key=lambda entry: DURATION_LABELS.index(entry["bucket"]))
+    return result
+
+def session_days_query(user_id: str):
+    """Distinct (UTC) days the user created a session on, newest first."""
+    day = func.date(models.MeditationSession.created_at)
+    return (
+        select(day)
+        .where(models.MeditationSession.user_id == user_id)
+        .group_by(day)
+        .order_by(day.desc())
+    )
+
+async def current_streak(db: AsyncSession, user_id: str, today: date = None) -> int:
+    """
+    Consecutive days with a session, ending today or yesterday (a streak
+    stays alive until a whole day is missed). Counted over the full history.
+    """
+    expected = today or datetime.now(timezone.utc).date()
+    streak = 0
+    for day in await db.scalars(session_days_query(user_id)):
+        # SQLite returns "YYYY-MM-DD" strings, PostgreSQL dates
+        day = date.fromisoformat(str(day)[:10])
+        if day == expected:
+            streak += 1
+        elif streak == 0 and day == expected - timedelta(days=1):
+            streak = 1
+        else:
+            break
+        expected = day - timedelta(days=1)
+    return streak
+
+
+def _aggregate(user_names: np.ndarray, user_codes: np.ndarray, buckets: np.ndarray, scores: np.ndarray, dimension: str) -> list:
+    """Group rows by (user, bucket) and sum them, without a Python loop over sessions."""
+    bucket_names, bucket_codes = np.unique(buckets, return_inverse=True)
+    groups, group_codes = np.unique(user_codes * len(bucket_names) + bucket_codes, return_inverse=True)
+    sessions = np.bincount(group_codes)
+    totals = np.bincount(group_codes, weights=scores).astype(np.int64)
+    improved = np.bincount(group_codes, weights=scores > 0).astype(np.int64)
+    return [
+        {
+            "user_id": str(user_names[group // len(bucket_names)]),
+            "dimension": dimension,
+            "bucket": str(bucket_names[group % len(bucket_names)]),
+            "sessions": int(count),
+            "improvement_total": int(total),
+            "improved": int(better),
+        }
+        for group, count, total, better in zip(groups, sessions, totals, improved)
+    ]
+
+def rebuild_rollups(conn) -> int:
+    """
+    Recompute every rollup from meditation_sessions: one read of the rated
+    sessions, then NumPy group-bys per dimension. Returns the rows written.
+    """
+    Session = models.MeditationSession
+    rows = conn.execute(
+        select(Session.user_id, Session.type, Session.tone, Session.requested_duration, Session.created_at, Session.improvement_score)
+        .where(Session.improvement_score.is_not(None))
+    ).all()
+    conn.execute(delete(models.MoodRollup))
+    if not rows:
+        return 0
+
+    user_ids, types, tones, durations, created, scores = zip(*rows)
+    # Fixed-width strings rather than object arrays: np.unique sorts them far faster
+    user_names, user_codes = np.unique(np.array(user_ids, dtype=str), return_inverse=True)
+    scores = np.array(scores, dtype=np.int64)
+    days = np.array([c.date() for c in created], dtype="datetime64[D]")
+    # 1970-01-01 was a Thursday: step back to the Monday of each week
+    mondays = days - (days.astype(np.int64) + 3) % 7
+    buckets = {
+        "all": np.full(len(rows), "all"),
+        "type": np.array(types, dtype=str),
+        "tone": np.array([tone or NO_TONE for tone in tones], dtype=str),
+        "duration": np.array(DURATION_LABELS)[np.searchsorted(DURATION_EDGES, np.array([d or 0 for d in durations]))],
+        "week": np.datetime_as_string(mondays),
+    }
+
+    rollups = []
+    for dimension in DIMENSIONS:
+        rollups += _aggregate(user_names, user_codes, buckets[dimension], scores, dimension)
+    conn.execute(insert(models.MoodRollup), rollups)
+    return len(rollups)
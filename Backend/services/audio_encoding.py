@@ -0,0 +1,130 @@
+import os
+import time
+import uuid
+
+# Encoders run in worker processes (see executors.encode_executor), so this
+# module must stay importable on its own: no database, FastAPI or GenAI imports.
+
+try:
+    import soundfile
+except ImportError:
+    soundfile = None
+
+
+class WavEncoder:
+    """The synthesized master is already a WAV, nothing to do."""
+    name = "wav"
+    extension = "wav"
+    media_type = "audio/wav"
+    lossless = True
+
+    def available(self) -> bool:
+        return True
+
+
+class SoundFileEncoder:
+    """Encodes through libsndfile (FLAC, Ogg Opus, MP3 depending on the build)."""
+
+    def __init__(self, name: str, extension: str, media_type: str, container: str, subtype: str, lossless: bool, compression_level: float = None):
+        self.name = name
+        self.extension = extension
+        self.media_type = media_type
+        self.container = container
+        self.subtype = subtype
+        self.lossless = lossless
+        self.compression_level = compression_level
+
+    def available(self) -> bool:
+        if soundfile is None:
+            return False
+        return self.subtype in soundfile.available_subtypes(self.container)
+
+    def encode(self, src_path: str, dst_path: str):
+        data, sample_rate = soundfile.read(src_path, dtype="int16")
+        kwargs = {}
+        if self.compression_level is not None:
+            kwargs["compression_level"] = self.compression_level
+        soundfile.write(dst_path, data, sample_rate, format=self.container, subtype=self.subtype, **kwargs)
+
+
+ENCODERS = {}
+
+def register_encoder(encoder):
+    ENCODERS[encoder.name] = encoder
+
+register_encoder(WavEncoder())
+register_encoder(SoundFileEncoder("flac", "flac", "audio/flac", "FLAC", "PCM_16", lossless=True))
+# compression_level 0..1 maps onto the codec bitrate; speech stays clear well below music bitrates
+register_encoder(SoundFileEncoder(
+    "opus", "ogg", "audio/ogg", "OGG", "OPUS", lossless=False,
+    compression_level=float(os.getenv("AUDIO_OPUS_COMPRESSION", "0.7"))
+))
+register_encoder(SoundFileEncoder(
+    "mp3", "mp3", "audio/mpeg", "MP3", "MPEG_LAYER_III", lossless=False,
+    compression_level=float(os.getenv("AUDIO_MP3_COMPRESSION", "0.6"))
+))
+
+MEDIA_TYPES = {encoder.media_type: name for name, encoder in ENCODERS.items()}
+MEDIA_TYPES.update({"audio/x-wav": "wav", "audio/wave": "wav", "audio/x-flac": "flac", "audio/opus": "opus", "audio/mp3": "mp3"})
+
+def available_formats() -> list[str]:
+    return [name for name, encoder in ENCODERS.items() if encoder.available()]
+
+DEFAULT_AUDIO_FORMAT = os.getenv("AUDIO_DEFAULT_FORMAT", "wav")
+
+def negotiate_format(requested: str = None, accept: str = None, default: str = DEFAULT_AUDIO_FORMAT) -> str:
+    """
+    Pick the output format: an explicit `requested` name wins, then the
+    first available audio type in the Accept header (by q-value), then `default`.
+    Raises ValueError for an unknown or unavailable explicit request.
+    """
+    if requested:
+        name = requested.lower()
+        encoder = ENCODERS.get(name)
+        if not encoder or not encoder.available():
+            raise ValueError(f"Unsupported audio format '{requested}'. Available: {', '.join(available_formats())}")
+        return name
+
+    if accept:
+        candidates = []
+        for i, item in enumerate(accept.split(",")):
+            parts = [p.strip() for p in item.split(";")]
+            quality = 1.0
+            for param in parts[1:]:
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            name = MEDIA_TYPES.get(parts[0].lower())
+            if name and quality > 0 and ENCODERS[name].available():
+                candidates.append((-quality, i, name))
+        if candidates:
+            return min(candidates)[2]
+
+    return default
+
+TEMP_DIR_NAME = ".tmp"
+
+def temp_path_for(dst_path) -> str:
+    """
+    Scratch path to write dst_path under before os.replace(). It sits in a
+    `.tmp` directory beside it: same filesystem, so the rename is atomic, but
+    not reachable by the audio route nor matched by the `{key}.*` glob.
+    """
+    tmp_dir = os.path.join(os.path.dirname(dst_path), TEMP_DIR_NAME)
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, f"{os.path.basename(dst_path)}.{uuid.uuid4().hex}.tmp")
+
+def encode_file(format_name: str, src_path: str, dst_path: str) -> float:
+    """Encode a WAV into `format_name` at dst_path. Returns seconds spent. Runs in a worker process."""
+    start = time.perf_counter()
+    encoder = ENCODERS[format_name]
+    tmp_path = temp_path_for(dst_path)
+    try:
+        encoder.encode(src_path, tmp_path)
+        os.replace(tmp_path, dst_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return time.perf_counter() - start
@@ -0,0 +1,248 @@
+import os
+import re
+import threading
+import wave
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Local assembly stage between TTS and the WAV master: silence for [PAUSE]
+# markers, stretching pauses towards the session length, and an optional
+# looping ambient bed. Everything works on whole NumPy buffers, never per sample.
+
+PAUSE_SECONDS = float(os.getenv("AUDIO_PAUSE_SECONDS", "4"))
+MAX_PAUSE_SECONDS = float(os.getenv("AUDIO_MAX_PAUSE_SECONDS", "60"))
+AMBIENT_DIR = Path(os.getenv("AMBIENT_DIR", "static/ambient"))
+AMBIENT_DBFS = float(os.getenv("AMBIENT_DBFS", "-32"))
+AMBIENT_FADE_MS = int(os.getenv("AMBIENT_FADE_MS", "4000"))
+
+# [PAUSE], [PAUSE 5s], [pause: 1500ms], [PAUSE 2 seconds]
+PAUSE_MARKER = re.compile(
+    r"\[\s*pause\s*:?\s*(?:(\d+(?:\.\d+)?)\s*(ms|s|secs?|seconds?)?)?\s*\]",
+    re.IGNORECASE
+)
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+# Generated beds: name -> spectral slope (power ~ 1 / f^slope)
+NOISE_BEDS = {
+    "pink-noise": 1.0,
+    "brown-noise": 2.0,
+}
+NOISE_LOOP_SECONDS = 20
+
+def _marker_seconds(match, default: float) -> float:
+    value, unit = match.group(1), (match.group(2) or "s").lower()
+    if value is None:
+        return default
+    return float(value) / 1000 if unit == "ms" else float(value)
+
+def has_pause_markers(text: str) -> bool:
+    return PAUSE_MARKER.search(text or "") is not None
+
+def parse_pauses(text: str, default_seconds: float = PAUSE_SECONDS, split_paragraphs: bool = False) -> tuple[list[str], list[float]]:
+    """
+    Split a script on [PAUSE] markers into spoken spans and the silence (in
+    seconds) that follows each one. A script without markers is one span,
+    so TTS chunks are packed across paragraphs; with split_paragraphs (when
+    fitting a duration) it is split on paragraph breaks with zero-length
+    pauses, which gives fit_pauses somewhere to add silence.
+    """
+    spans, pauses = [], []
+    if not has_pause_markers(text):
+        if not split_paragraphs:
+            text = (text or "").strip()
+            return ([text], [0.0]) if text else ([], [])
+        for paragraph in _PARAGRAPH_BREAK.split(text or ""):
+            if paragraph.strip():
+                spans.append(paragraph.strip())
+                pauses.append(0.0)
+        return spans, pauses
+
+    pos = 0
+    for match in PAUSE_MARKER.finditer(text):
+        span = text[pos:match.start()].strip()
+        seconds = _marker_seconds(match, default_seconds)
+        if span:
+            spans.append(span)
+            pauses.append(seconds)
+        elif pauses:
+            # Consecutive markers add up; a leading pause is dropped
+            pauses[-1] += seconds
+        pos = match.end()
+
+    tail = text[pos:].strip()
+    if tail:
+        spans.append(tail)
+        pauses.append(0.0)
+    return spans, pauses
+
+def fit_pauses(speech_seconds: float, pauses: list[float], target_seconds: float = None, max_pause_seconds: float = MAX_PAUSE_SECONDS) -> list[float]:
+    """
+    Lengthen the pauses between spans so speech + silence reaches
+    target_seconds. Extra time is shared in proportion to (pause + 1s), so
+    marked pauses grow most, and no gap grows past max_pause_seconds; what
+    the capped gaps can't absorb is added after the last span (silence, or
+    the ambient bed). Audio longer than the target is left alone: speech is
+    never cut.
+    """
+    pauses = np.asarray(pauses, dtype=np.float64)
+    if target_seconds is None or len(pauses) == 0:
+        return pauses.tolist()
+
+    extra = target_seconds - speech_seconds - pauses.sum()
+    if extra <= 0:
+        return pauses.tolist()
+
+    if len(pauses) > 1:
+        # The silence after the last span is not a gap between spans
+        gaps = pauses[:-1]
+        weights = gaps + 1.0
+        grown = gaps + extra * weights / weights.sum()
+        pauses[:-1] = np.minimum(grown, np.maximum(gaps, max_pause_seconds))
+    pauses[-1] += max(target_seconds - speech_seconds - pauses.sum(), 0.0)
+    return pauses.tolist()
+
+def _noise_loop(slope: float, sample_rate: int, seconds: int = NOISE_LOOP_SECONDS) -> np.ndarray:
+    # Shaping white noise in the frequency domain gives a signal that is
+    # periodic over its length, so the loop has no seam. Fixed seed: the bed
+    # must be identical every time, it is part of the content-addressed audio.
+    n = sample_rate * seconds
+    rng = np.random.default_rng(0)
+    spectrum = rng.standard_normal(n // 2 + 1) + 1j * rng.standard_normal(n // 2 + 1)
+    freqs = np.fft.rfftfreq(n, 1 / sample_rate)
+    freqs[0] = freqs[1]
+    spectrum /= freqs ** (slope / 2)
+    spectrum[0] = 0
+    return np.fft.irfft(spectrum, n).astype(np.float32)
+
+def _read_loop(path: Path, sample_rate: int) -> np.ndarray:
+    with wave.open(str(path), "rb") as wav_file:
+        if wav_file.getsampwidth() != 2:
+            raise ValueError(f"Ambient track {path.name} must be 16-bit PCM")
+        channels = wav_file.getnchannels()
+        rate = wav_file.getframerate()
+        frames = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+
+    loop = frames.reshape(-1, channels).astype(np.float32).mean(axis=1)
+    if rate != sample_rate:
+        positions = np.arange(int(len(loop) * sample_rate / rate)) * (rate / sample_rate)
+        loop = np.interp(positions, np.arange(len(loop)), loop).astype(np.float32)
+
+    # Blend the end into the start so the loop point doesn't click
+    fade = min(len(loop) // 4, sample_rate // 2)
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        head = loop[:fade] * ramp + loop[-fade:] * (1.0 - ramp)
+        loop = np.concatenate([head, loop[fade:-fade]])
+    return loop
+
+def available_ambients() -> list[str]:
+    files = sorted(path.stem for path in AMBIENT_DIR.glob("*.wav")) if AMBIENT_DIR.exists() else []
+    return list(NOISE_BEDS) + [name for name in files if name not in NOISE_BEDS]
+
+
+class AmbientBed:
+    """A loop scaled to `dbfs` RMS that can be read at any sample offset."""
+
+    def __init__(self, loop: np.ndarray, dbfs: float = AMBIENT_DBFS):
+        rms = float(np.sqrt(np.mean(np.square(loop, dtype=np.float64)))) or 1.0
+        self.loop = (loop * (10 ** (dbfs / 20) * 32767 / rms)).astype(np.float32)
+
+    def render(self, offset: int, count: int) -> np.ndarray:
+        """`count` samples starting `offset` samples into the endlessly repeated loop (a fresh array)."""
+        start = offset % len(self.loop)
+        head = self.loop[start:start + count]
+        if len(head) == count:
+            return head.copy()
+        # np.resize repeats the loop cyclically to the requested length
+        return np.concatenate([head, np.resize(self.loop, count - len(head))])
+
+
+_beds = {}
+_beds_lock = threading.Lock()
+
+def ambient_bed(name: str, sample_rate: int, dbfs: float = AMBIENT_DBFS) -> AmbientBed:
+    """Loaded once per (name, rate, level). Raises ValueError for unknown names."""
+    cache_key = (name, sample_rate, dbfs)
+    with _beds_lock:
+        bed = _beds.get(cache_key)
+    if bed is not None:
+        return bed
+
+    if name in NOISE_BEDS:
+        loop = _noise_loop(NOISE_BEDS[name], sample_rate)
+    else:
+        path = AMBIENT_DIR / f"{name}.wav"
+        if "/" in name or "\\" in name or name.startswith(".") or not path.exists():
+            raise ValueError(f"Unknown ambient track '{name}'. Available: {', '.join(available_ambients())}")
+        loop = _read_loop(path, sample_rate)
+
+    bed = AmbientBed(loop, dbfs)
+    with _beds_lock:
+        _beds[cache_key] = bed
+    return bed
+
+def mix_signature(text: str, ambient: str = None, target_seconds: float = None) -> str:
+    """Everything the assembly stage adds, for the audio content key. Empty when it is a no-op."""
+    if not ambient and target_seconds is None and not has_pause_markers(text):
+        return ""
+    signature = f"pause{PAUSE_SECONDS}-max{MAX_PAUSE_SECONDS}"
+    if ambient:
+        signature += f"-bed:{ambient}@{AMBIENT_DBFS}dbfs-fade{AMBIENT_FADE_MS}ms"
+    if target_seconds is not None:
+        signature += f"-fit{int(target_seconds)}s-tail"
+    return signature
+
+
+class TimelineMixer:
+    """
+    Lays voice and silence end to end and mixes the ambient bed underneath.
+    Works incrementally, so the same code serves the streaming path (push
+    pieces as they are synthesized) and render() for a whole script.
+    The bed fades in at the start and, in finish(), keeps playing for the
+    fade length after the voice ends while it fades out.
+    """
+
+    def __init__(self, sample_rate: int, bed: AmbientBed = None, fade_ms: int = AMBIENT_FADE_MS):
+        self.sample_rate = sample_rate
+        self.bed = bed
+        self.fade = int(sample_rate * fade_ms / 1000)
+        self.position = 0
+
+    def _mix(self, pcm: np.ndarray) -> np.ndarray:
+        count = len(pcm)
+        if self.bed is None or not count:
+            self.position += count
+            return pcm
+
+        out = self.bed.render(self.position, count)
+        if self.fade and self.position < self.fade:
+            ramp = np.minimum((np.arange(count) + self.position) / self.fade, 1.0).astype(np.float32)
+            out *= ramp
+        out += pcm
+        self.position += count
+        return np.clip(out, -32768, 32767, out=out).astype(np.int16)
+
+    def voice(self, pcm: np.ndarray) -> np.ndarray:
+        return self._mix(np.asarray(pcm, dtype=np.int16))
+
+    def silence(self, seconds: float) -> np.ndarray:
+        return self._mix(np.zeros(int(round(seconds * self.sample_rate)), dtype=np.int16))
+
+    def finish(self) -> np.ndarray:
+        if self.bed is None or not self.fade:
+            return np.zeros(0, dtype=np.int16)
+        tail = self.bed.render(self.position, self.fade)
+        tail *= np.linspace(1.0, 0.0, self.fade, dtype=np.float32)
+        self.position += self.fade
+        return np.clip(tail, -32768, 32767).astype(np.int16)
+
+    def render(self, voices: list[np.ndarray], pauses: list[float]) -> np.ndarray:
+        parts = []
+        for pcm, seconds in zip(voices, pauses):
+            parts.append(self.voice(pcm))
+            parts.append(self.silence(seconds))
+        parts.append(self.finish())
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int16)
@@ -0,0 +1,200 @@
+import hashlib
+import mimetypes
+import os
+import threading
+from email.utils import formatdate
+from pathlib import Path
+from fastapi import HTTPException
+from starlette.responses import Response
+from starlette.concurrency import run_in_threadpool
+
+from services.audio_encoding import ENCODERS
+from services.executors import io_executor
+from services.tts_service import audio_key_from_url
+
+READ_CHUNK = 256 * 1024
+# Content-addressed names hash the script, voice and format, not the bytes:
+# once unreferenced the file is deleted, and a later synthesis writes a new
+# rendering of the same audio under the same name. A cached copy is still the
+# right audio for a while, but it's never `immutable`, and validators come
+# from the file itself so a resumed download can't splice two renderings.
+CONTENT_ADDRESSED_CACHE_CONTROL = "public, max-age=86400"
+# Legacy uuid files can in principle be rewritten, so make clients revalidate
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+
+MEDIA_TYPES_BY_EXTENSION = {encoder.extension: encoder.media_type for encoder in ENCODERS.values()}
+
+# path -> (size, mtime_ns, etag); content hashes of non content-addressed files
+_etag_cache = {}
+_etag_lock = threading.Lock()
+
+def _content_etag(path: Path, size: int, mtime_ns: int) -> str:
+    with _etag_lock:
+        cached = _etag_cache.get(str(path))
+    if cached and cached[0] == size and cached[1] == mtime_ns:
+        return cached[2]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    etag = f'"{digest.hexdigest()}"'
+    with _etag_lock:
+        _etag_cache[str(path)] = (size, mtime_ns, etag)
+    return etag
+
+def parse_range(header: str, size: int):
+    """
+    Parse a single `bytes=` range into an inclusive (start, end).
+    Returns None when the header should be ignored (absent, malformed or
+    multi-range, which RFC 9110 lets us answer with the full body) and
+    raises ValueError when the range is unsatisfiable.
+    """
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+
+    first, last = spec.split("-", 1)
+    first, last = first.strip(), last.strip()
+    if (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+        return None
+
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            raise ValueError("Range not satisfiable")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        raise ValueError("Range not satisfiable")
+    end = min(int(last), size - 1) if last else size - 1
+    return start, end
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = [tag.strip() for tag in header.split(",")]
+    # If-None-Match uses weak comparison
+    return any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+class AudioFileResponse(Response):
+    """
+    Streams [start, end] of a file. Uses the ASGI zero-copy send extension
+    (sendfile) when the server offers it, `pathsend` for whole files, and
+    plain chunked reads otherwise.
+    """
+
+    def __init__(self, path: Path, start: int, end: int, status_code: int, headers: dict, media_type: str, send_body: bool = True):
+        super().__init__(status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.start = start
+        self.end = end
+        self.send_body = send_body
+        self.headers["content-length"] = str(end - start + 1 if end >= start else 0)
+
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        count = self.end - self.start + 1
+        if not self.send_body or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        extensions = scope.get("extensions") or {}
+        if "http.response.zerocopysend" in extensions:
+            f = await run_in_threadpool(open, self.path, "rb")
+            try:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f,
+                    "offset": self.start,
+                    "count": count,
+                    "more_body": False,
+                })
+            finally:
+                f.close()
+            return
+
+        if "http.response.pathsend" in extensions and self.start == 0 and self.status_code == 200:
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+
+        f = await run_in_threadpool(open, self.path, "rb")
+        try:
+            await run_in_threadpool(f.seek, self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await run_in_threadpool(f.read, min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            f.close()
+
+
+async def audio_file_response(audio_dir: Path, filename: str, method: str, headers) -> Response:
+    """Build the response for GET/HEAD /static/audio/{filename}."""
+    # Plain file names only; dot-files are in-progress temp files
+    if "/" in filename or "\\" in filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    path = audio_dir / filename
+    try:
+        stat = await io_executor.run(os.stat, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Audio file not found")
+
+    size = stat.st_size
+    content_addressed = audio_key_from_url(filename) is not None
+    if content_addressed:
+        # Files are only ever replaced whole (written aside, then renamed), so
+        # size and mtime change with the bytes; no need to hash large files
+        etag = f'"{Path(filename).stem[:16]}-{size:x}-{stat.st_mtime_ns:x}"'
+        cache_control = CONTENT_ADDRESSED_CACHE_CONTROL
+    else:
+        etag = await io_executor.run(_content_etag, path, size, stat.st_mtime_ns)
+        cache_control = REVALIDATE_CACHE_CONTROL
+
+    extension = Path(filename).suffix.lstrip(".").lower()
+    media_type = MEDIA_TYPES_BY_EXTENSION.get(extension) or mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+    response_headers = {
+        "accept-ranges": "bytes",
+        "etag": etag,
+        "cache-control": cache_control,
+        "last-modified": formatdate(stat.st_mtime, usegmt=True),
+    }
+
+    if _etag_matches(headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=response_headers)
+
+    range_header = headers.get("range")
+    if_range = headers.get("if-range")
+    # A stale If-Range means the client's partial copy is outdated: send it all
+    if range_header and if_range and if_range.strip() != etag:
+        range_header = None
+
+    try:
+        byte_range = parse_range(range_header, size)
+    except ValueError:
+        return Response(status_code=416, headers={**response_headers, "content-range": f"bytes */{size}"})
+
+    send_body = method != "HEAD"
+    if byte_range is None:
+        return AudioFileResponse(path, 0, size - 1, 200, response_headers, media_type, send_body)
+
+    start, end = byte_range
+    response_headers["content-range"] = f"bytes {start}-{end}/{size}"
+    return AudioFileResponse(path, start, end, 206, response_headers, media_type, send_body)
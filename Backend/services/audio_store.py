@@ -0,0 +1,82 @@
+import json
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from services.tts_service import audio_key_from_url, audio_paths_for_key
+
+# Reference counting for content-addressed audio files. Several sessions can
+# point at the same file, so a file is only removed when the last one lets go.
+# Legacy uuid-named files are not tracked and are left alone.
+
+async def retain_audio(db: AsyncSession, audio_url: str):
+    key = audio_key_from_url(audio_url)
+    if not key:
+        return
+    audio_file = await db.get(models.AudioFile, key)
+    if audio_file is None:
+        audio_file = models.AudioFile(content_key=key, ref_count=0)
+        db.add(audio_file)
+    audio_file.ref_count = (audio_file.ref_count or 0) + 1
+
+async def release_audio(db: AsyncSession, audio_url: str) -> list:
+    """
+    Drop one reference. Returns the paths that became unreferenced; delete
+    them with remove_audio_files() only after the transaction commits.
+    """
+    key = audio_key_from_url(audio_url)
+    if not key:
+        return []
+    audio_file = await db.get(models.AudioFile, key)
+    if audio_file is None:
+        return []
+    audio_file.ref_count = (audio_file.ref_count or 0) - 1
+    if audio_file.ref_count > 0:
+        return []
+    await db.delete(audio_file)
+    return audio_paths_for_key(key)
+
+async def unreferenced_audio(db: AsyncSession, audio_url: str) -> list:
+    """Files of audio that no session references (e.g. generated for a session deleted meanwhile)."""
+    key = audio_key_from_url(audio_url)
+    if not key or await db.get(models.AudioFile, key) is not None:
+        return []
+    return audio_paths_for_key(key)
+
+async def swap_audio(db: AsyncSession, old_url: str, new_url: str) -> list:
+    if old_url == new_url:
+        return []
+    await retain_audio(db, new_url)
+    return await release_audio(db, old_url)
+
+def remove_audio_files(paths: list):
+    for path in paths:
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"Failed to remove audio file {path}: {e}")
+
+def apply_audio_metadata(session: models.MeditationSession, metadata: dict = None):
+    """Store the output of tts_service.audio_metadata (None clears stale values)."""
+    metadata = metadata or {}
+    session.audio_duration_ms = metadata.get("duration_ms")
+    session.audio_size_bytes = metadata.get("size_bytes")
+    session.audio_checksum = metadata.get("checksum")
+    if "peaks" in metadata:
+        session.waveform = json.dumps({"bins": metadata["bins"], "peaks": metadata["peaks"], "rms": metadata["rms"]})
+    else:
+        session.waveform = None
+
+async def apply_generated_audio(db: AsyncSession, session: models.MeditationSession, audio_url: str, duration_seconds: float, voice_gender: str, audio_format: str = "wav", metadata: dict = None) -> list:
+    """Point the session at its new audio. Returns orphaned files to remove after commit."""
+    # Calculate minutes (round to nearest minute, min 1)
+    duration_minutes = max(1, round(duration_seconds / 60))
+
+    orphaned = await swap_audio(db, session.audio_url, audio_url)
+    session.audio_url = audio_url
+    session.duration = duration_minutes # Update to actual generated length
+    session.voice_used = voice_gender
+    session.audio_format = audio_format
+    session.audio_generated_at = func.now()
+    apply_audio_metadata(session, metadata)
+    return orphaned
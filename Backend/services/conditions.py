@@ -0,0 +1,71 @@
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+# Health conditions as one indexed row per (session, tag) in session_conditions.
+# meditation_sessions.health_conditions keeps the comma-joined text for
+# display; filters and counts go through the tag table and its
+# (user_id, tag) index instead of scanning that text.
+
+def normalize_tag(condition: str) -> str:
+    return " ".join(condition.split()).lower()
+
+def condition_tags(conditions) -> list:
+    """Distinct normalized tags, in the order given."""
+    tags = []
+    for condition in conditions or []:
+        tag = normalize_tag(condition)
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags
+
+async def add_session_conditions(db: AsyncSession, session: models.MeditationSession, conditions):
+    """Write the session's tags; call after a flush has assigned session.id, before commit."""
+    tags = condition_tags(conditions)
+    if tags:
+        await db.execute(insert(models.SessionCondition), [
+            {"session_id": session.id, "user_id": session.user_id, "tag": tag} for tag in tags
+        ])
+
+async def remove_session_conditions(db: AsyncSession, session_id: int):
+    await db.execute(delete(models.SessionCondition).where(models.SessionCondition.session_id == session_id))
+
+def with_condition(query, user_id: str, condition: str):
+    """Restrict a MeditationSession select to sessions tagged with `condition`."""
+    tagged = (
+        select(models.SessionCondition.session_id)
+        .where(models.SessionCondition.user_id == user_id)
+        .where(models.SessionCondition.tag == normalize_tag(condition))
+    )
+    return query.where(models.MeditationSession.id.in_(tagged))
+
+def condition_counts_query(user_id: str):
+    return (
+        select(models.SessionCondition.tag, func.count().label("sessions"))
+        .where(models.SessionCondition.user_id == user_id)
+        .group_by(models.SessionCondition.tag)
+        .order_by(func.count().desc(), models.SessionCondition.tag)
+    )
+
+async def condition_counts(db: AsyncSession, user_id: str) -> list:
+    """[{"tag", "sessions"}], most frequent first; answered from the index alone."""
+    rows = await db.execute(condition_counts_query(user_id))
+    return [{"tag": tag, "sessions": sessions} for tag, sessions in rows]
+
+def backfill_conditions(conn) -> int:
+    """Rebuild session_conditions from the comma-joined column. Returns the rows written."""
+    Session = models.MeditationSession
+    sessions = conn.execute(
+        select(Session.id, Session.user_id, Session.health_conditions)
+        .where(Session.health_conditions.is_not(None))
+    ).all()
+    conn.execute(delete(models.SessionCondition))
+    rows = [
+        {"session_id": session_id, "user_id": user_id, "tag": tag}
+        for session_id, user_id, text in sessions
+        for tag in condition_tags(text.split(","))
+    ]
+    if rows:
+        conn.execute(insert(models.SessionCondition), rows)
+    return len(rows)
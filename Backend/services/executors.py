@@ -0,0 +1,134 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class BoundedExecutor:
+    """
+    Runs LLM / TTS work off the event loop.
+
+    Native async calls (langchain `ainvoke`, `client.aio`) go through `call`,
+    blocking calls go through `run` on a dedicated thread pool. Both share the
+    same concurrency limit so one slow workload can't starve the other.
+    """
+
+    def __init__(self, name: str, max_workers: int, processes: bool = False):
+        self.name = name
+        self.max_workers = max_workers
+        self.processes = processes
+        self._pool = self._create_pool()
+        self._slots = asyncio.Semaphore(max_workers)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _create_pool(self):
+        if self.processes:
+            # CPU-bound work; spawn so children don't inherit the server's threads
+            return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"{self.name}-worker")
+
+    async def _enter(self):
+        self.queued += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.queued -= 1
+        self.running += 1
+
+    def _exit(self, ok: bool):
+        self.running -= 1
+        if ok:
+            self.completed += 1
+        else:
+            self.failed += 1
+        self._slots.release()
+
+    async def call(self, coro_fn, *args, **kwargs):
+        """Await a native async function under this executor's concurrency limit."""
+        await self._enter()
+        ok = False
+        try:
+            result = await coro_fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            self._exit(ok)
+
+    async def stream(self, agen_fn, *args, **kwargs):
+        """Iterate a native async generator, holding one slot until it is exhausted."""
+        await self._enter()
+        ok = False
+        try:
+            async for item in agen_fn(*args, **kwargs):
+                yield item
+            ok = True
+        finally:
+            self._exit(ok)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on this executor's pool (module-level functions only for process pools)."""
+        await self._enter()
+        ok = False
+        try:
+            loop = asyncio.get_running_loop()
+            pool = self._pool
+            try:
+                result = await loop.run_in_executor(pool, partial(fn, *args, **kwargs))
+            except BrokenProcessPool:
+                # A crashed child poisons the whole pool; replace it so later calls work
+                if self._pool is pool:
+                    self._pool = self._create_pool()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                raise
+            ok = True
+            return result
+        finally:
+            self._exit(ok)
+
+    def stats(self) -> dict:
+        return {
+            "max_workers": self.max_workers,
+            "queued": self.queued,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+    def shutdown(self):
+        # Pools start their workers on first use, so keeping a fresh one costs
+        # nothing and lets the app start again in the same process (tests)
+        pool, self._pool = self._pool, self._create_pool()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# LLM calls are short and mostly network bound, TTS calls hold a slot for 20-60s
+llm_executor = BoundedExecutor("llm", int(os.getenv("LLM_MAX_WORKERS", "32")))
+tts_executor = BoundedExecutor("tts", int(os.getenv("TTS_MAX_WORKERS", "8")))
+# Disk work (writing audio files) gets its own pool so it never waits behind a TTS call
+io_executor = BoundedExecutor("io", int(os.getenv("IO_MAX_WORKERS", "8")))
+# Audio encoding is CPU bound, so it runs in separate processes
+encode_executor = BoundedExecutor("encode", int(os.getenv("ENCODE_MAX_WORKERS", "2")), processes=True)
+
+
+def executor_stats() -> dict:
+    return {
+        "llm": llm_executor.stats(),
+        "tts": tts_executor.stats(),
+        "io": io_executor.stats(),
+        "encode": encode_executor.stats(),
+    }
+
+
+def shutdown_executors():
+    llm_executor.shutdown()
+    tts_executor.shutdown()
+    io_executor.shutdown()
+    encode_executor.shutdown()
@@ -0,0 +1,63 @@
+import json
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+load_dotenv()
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+MAX_KEY_LENGTH = 255
+
+# Responses of successful requests sent with an Idempotency-Key header, per
+# user and endpoint. Replaying the key returns the stored body without
+# recomputing it; reusing it with different parameters is refused. Failures
+# are not stored, so a retry after an error runs again.
+idempotency_stats = {"stored": 0, "replays": 0, "conflicts": 0}
+
+
+class IdempotencyConflict(ValueError):
+    pass
+
+
+def validate_key(key: str) -> str:
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters")
+    return key
+
+async def stored_response(db: AsyncSession, user_id: str, scope: str, key: str, request_hash: str):
+    """The stored body for this key, or None. Raises IdempotencyConflict if it was used for other parameters."""
+    record = await db.get(models.IdempotencyRecord, (user_id, scope, key))
+    if record is None or record.expires_at < time.time():
+        return None
+    if record.request_hash != request_hash:
+        idempotency_stats["conflicts"] += 1
+        raise IdempotencyConflict("Idempotency-Key was already used with different parameters")
+    idempotency_stats["replays"] += 1
+    return json.loads(record.response)
+
+async def store_response(db: AsyncSession, user_id: str, scope: str, key: str, request_hash: str, response: dict):
+    insert_for = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    statement = insert_for(models.IdempotencyRecord).values(
+        user_id=user_id, scope=scope, key=key, request_hash=request_hash,
+        response=json.dumps(response), expires_at=time.time() + IDEMPOTENCY_TTL_SECONDS,
+    )
+    # A concurrent request with the same key stored the same result already;
+    # an expired record is replaced
+    await db.execute(statement.on_conflict_do_update(
+        index_elements=["user_id", "scope", "key"],
+        set_={
+            "request_hash": statement.excluded.request_hash,
+            "response": statement.excluded.response,
+            "expires_at": statement.excluded.expires_at,
+        },
+        where=models.IdempotencyRecord.expires_at < time.time(),
+    ))
+    # Opportunistically drop expired records so the table stays bounded
+    await db.execute(delete(models.IdempotencyRecord).where(models.IdempotencyRecord.expires_at < time.time()))
+    await db.commit()
+    idempotency_stats["stored"] += 1
@@ -0,0 +1,336 @@
+import asyncio
+import os
+import time
+from dotenv import load_dotenv
+from sqlalchemy import and_, case, false, func, select, update
+
+from database import AsyncSessionLocal
+import models
+from services.tts_service import generate_audio, audio_metadata
+from services.audio_store import apply_generated_audio, remove_audio_files, unreferenced_audio
+
+load_dotenv()
+
+ACTIVE_STATUSES = ("queued", "running")
+# Clients may lower their own job's priority (e.g. prefetching) but not jump
+# ahead of other users in the shared queue
+MIN_CLIENT_PRIORITY = -10
+MAX_CLIENT_PRIORITY = 0
+SESSION_DELETED = "Meditation was deleted"
+
+def active_job_query(meditation_id: int, user_id: str, voice_gender: str, audio_format: str, ambient: str = None, target_seconds: int = None):
+    """The queued/running job for the same session, voice, format and mix, if any."""
+    return (
+        select(models.AudioJob)
+        .where(models.AudioJob.meditation_id == meditation_id)
+        .where(models.AudioJob.user_id == user_id)
+        .where(models.AudioJob.voice_gender == voice_gender)
+        .where(models.AudioJob.audio_format == audio_format)
+        .where(models.AudioJob.ambient.is_(None) if ambient is None else models.AudioJob.ambient == ambient)
+        .where(models.AudioJob.target_seconds.is_(None) if target_seconds is None else models.AudioJob.target_seconds == target_seconds)
+        .where(models.AudioJob.status.in_(ACTIVE_STATUSES))
+        .limit(1)
+    )
+
+def next_job_query():
+    return (
+        select(models.AudioJob.id)
+        .where(models.AudioJob.status == "queued")
+        .order_by(models.AudioJob.priority.desc(), models.AudioJob.id)
+        .limit(1)
+    )
+
+def stale_jobs(stale_before: float):
+    """Running jobs whose worker stopped heartbeating before stale_before."""
+    return and_(models.AudioJob.status == "running", models.AudioJob.heartbeat_at < stale_before)
+
+def cancel_jobs_query(meditation_id: int):
+    """
+    Fail the session's queued/running jobs; run it in the transaction that
+    deletes the session, so no job outlives it (SQLite reuses the ids of
+    deleted rows, so a leftover job could otherwise render a newer session).
+    """
+    return (
+        update(models.AudioJob)
+        .where(models.AudioJob.meditation_id == meditation_id)
+        .where(models.AudioJob.status.in_(ACTIVE_STATUSES))
+        .values(status="failed", error=SESSION_DELETED, finished_at=func.now())
+    )
+
+def client_priority(priority: int) -> int:
+    return max(MIN_CLIENT_PRIORITY, min(priority, MAX_CLIENT_PRIORITY))
+
+
+class AudioJobQueue:
+    """
+    Durable audio generation queue.
+
+    Jobs live in the `audio_jobs` table, so queued work survives restarts.
+    Workers claim the highest-priority queued job with a conditional UPDATE
+    (safe across processes) and renew a heartbeat while running; a running
+    job whose heartbeat is older than `lease_seconds` is assumed orphaned by
+    a dead worker and put back in the queue.
+    """
+
+    def __init__(self, workers: int = 2, lease_seconds: float = 120, poll_seconds: float = 1.0, max_attempts: int = 3, stop_seconds: float = 5):
+        self.workers = workers
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.max_attempts = max_attempts
+        self.stop_seconds = stop_seconds
+        self._tasks = []
+        self._wakeup = None
+        self._stopping = False
+        self.active = 0
+
+    async def enqueue(self, db, meditation_id: int, user_id: str, voice_gender: str, audio_format: str = "wav", priority: int = 0, ambient: str = None, target_seconds: int = None) -> models.AudioJob:
+        """Queue a job, or return the one already queued/running for the same session, voice, format and mix."""
+        existing = await db.scalar(
+            active_job_query(meditation_id, user_id, voice_gender, audio_format, ambient, target_seconds)
+        )
+        if existing:
+            return existing
+
+        job = models.AudioJob(
+            meditation_id=meditation_id,
+            user_id=user_id,
+            voice_gender=voice_gender,
+            audio_format=audio_format,
+            ambient=ambient,
+            target_seconds=target_seconds,
+            priority=priority,
+            status="queued",
+            progress=0
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def start(self):
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self):
+        """
+        Idle workers exit between database calls (cancelling one mid-query
+        leaves its connection to be reset from a dying task). A job still
+        running after stop_seconds is cancelled and requeued once its lease
+        expires.
+        """
+        self._stopping = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        if self._tasks:
+            _, running = await asyncio.wait(self._tasks, timeout=self.stop_seconds)
+            for task in running:
+                task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _requeue_stale(self, db):
+        stale_before = time.time() - self.lease_seconds
+        stale = (await db.scalars(select(models.AudioJob.id).where(stale_jobs(stale_before)))).all()
+        await db.commit()
+        # A job that keeps killing its worker counts each lease as an attempt
+        for job_id in stale:
+            await self._fail(job_id, "Worker stopped renewing its lease", stale_before=stale_before)
+
+    async def _claim(self):
+        async with AsyncSessionLocal() as db:
+            await self._requeue_stale(db)
+            for _ in range(5):
+                candidate = await db.scalar(next_job_query())
+                if candidate is None:
+                    return None
+                # Only one worker (in any process) can flip queued -> running
+                claimed = await db.execute(
+                    update(models.AudioJob)
+                    .where(models.AudioJob.id == candidate)
+                    .where(models.AudioJob.status == "queued")
+                    .values(status="running", heartbeat_at=time.time(), attempts=models.AudioJob.attempts + 1)
+                )
+                await db.commit()
+                if claimed.rowcount:
+                    return candidate
+            return None
+
+    async def _update(self, job_id: int, **values):
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(models.AudioJob).where(models.AudioJob.id == job_id).values(**values))
+            await db.commit()
+
+    async def _heartbeat(self, job_id: int):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await self._update(job_id, heartbeat_at=time.time())
+            except Exception as e:
+                # Keep trying: the lease only runs out after several misses
+                print(f"Failed to renew heartbeat for audio job {job_id}: {e}")
+
+    async def _worker(self, n: int):
+        while not self._stopping:
+            try:
+                job_id = await self._claim()
+            except Exception as e:
+                print(f"Audio job worker {n} failed to claim a job: {e}")
+                job_id = None
+
+            if job_id is None:
+                if self._stopping:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.active += 1
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Audio job {job_id} failed: {e}")
+                try:
+                    await self._fail(job_id, str(e))
+                except Exception as e:
+                    # Left running; requeued once its lease expires
+                    print(f"Failed to record failure of audio job {job_id}: {e}")
+            finally:
+                heartbeat.cancel()
+                self.active -= 1
+
+    async def _fail(self, job_id: int, error: str, retry: bool = True, stale_before: float = None):
+        """
+        Requeue the job, or mark it failed once it has used up its attempts.
+        With stale_before, only if its lease is still expired (a single
+        statement, so a worker renewing it meanwhile wins).
+        """
+        Job = models.AudioJob
+        retryable = Job.attempts < self.max_attempts if retry else false()
+        statement = update(Job).where(Job.id == job_id)
+        if stale_before is not None:
+            statement = statement.where(stale_jobs(stale_before))
+        async with AsyncSessionLocal() as db:
+            await db.execute(statement.values(
+                status=case((retryable, "queued"), else_="failed"),
+                finished_at=case((retryable, None), else_=func.now()),
+                error=error,
+            ))
+            await db.commit()
+
+    async def _run(self, job_id: int):
+        # No session is held during synthesis: read what it needs, then write
+        # the result in a second, short transaction
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.AudioJob, job_id)
+            audio_script = await db.scalar(
+                select(models.MeditationSession.audio_script)
+                .where(models.MeditationSession.id == job.meditation_id)
+                .where(models.MeditationSession.user_id == job.user_id)
+            )
+        if not audio_script:
+            await self._fail(job_id, "Meditation not found or has no audio script", retry=False)
+            return
+
+        last_progress = -1
+        progress_write = None
+
+        def on_progress(done: int, total: int):
+            nonlocal last_progress, progress_write
+            # Synthesis is most of the work; the last 5% is writing and saving
+            progress = int(done / total * 95)
+            if progress != last_progress:
+                last_progress = progress
+                progress_write = asyncio.create_task(self._write_progress(progress_write, job_id, progress))
+
+        try:
+            audio_url, duration_seconds = await generate_audio(
+                audio_script,
+                voice_gender=job.voice_gender,
+                on_progress=on_progress,
+                audio_format=job.audio_format or "wav",
+                ambient=job.ambient,
+                target_seconds=job.target_seconds
+            )
+            metadata = await audio_metadata(audio_url)
+        finally:
+            if progress_write:
+                await progress_write
+
+        try:
+            async with AsyncSessionLocal() as db:
+                # Only a job still running may finish: deleting the session
+                # fails its jobs, and a newer session may reuse the id
+                finished = await db.execute(
+                    update(models.AudioJob)
+                    .where(models.AudioJob.id == job_id)
+                    .where(models.AudioJob.status == "running")
+                    .values(status="done", progress=100, audio_url=audio_url, error=None, finished_at=func.now())
+                )
+                session = await db.scalar(
+                    select(models.MeditationSession)
+                    .where(models.MeditationSession.id == job.meditation_id)
+                    .where(models.MeditationSession.user_id == job.user_id)
+                ) if finished.rowcount else None
+                if session:
+                    orphaned = await apply_generated_audio(db, session, audio_url, duration_seconds, job.voice_gender, job.audio_format or "wav", metadata)
+                    await db.commit()
+        except Exception:
+            # A retry reuses the file; after the last attempt nothing will
+            if job.attempts >= self.max_attempts:
+                await self._drop_unreferenced(audio_url)
+            raise
+
+        if not session:
+            await self._drop_unreferenced(audio_url)
+            await self._fail(job_id, SESSION_DELETED, retry=False)
+            return
+        remove_audio_files(orphaned)
+
+    async def _drop_unreferenced(self, audio_url: str):
+        """Remove audio no session took a reference to, unless another session uses it."""
+        try:
+            async with AsyncSessionLocal() as db:
+                orphaned = await unreferenced_audio(db, audio_url)
+            remove_audio_files(orphaned)
+        except Exception as e:
+            print(f"Failed to remove unreferenced audio {audio_url}: {e}")
+
+    async def _write_progress(self, previous, job_id: int, progress: int):
+        # Chained on the previous write so progress never goes backwards
+        if previous:
+            await previous
+        try:
+            await self._update(job_id, progress=progress, heartbeat_at=time.time())
+        except Exception as e:
+            print(f"Failed to record progress for audio job {job_id}: {e}")
+
+    async def stats(self) -> dict:
+        async with AsyncSessionLocal() as db:
+            counts = dict((await db.execute(
+                select(models.AudioJob.status, func.count(models.AudioJob.id))
+                .group_by(models.AudioJob.status)
+            )).all())
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "queued": counts.get("queued", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "failed": counts.get("failed", 0),
+        }
+
+
+audio_jobs = AudioJobQueue(
+    workers=int(os.getenv("AUDIO_JOB_WORKERS", "2")),
+    lease_seconds=float(os.getenv("AUDIO_JOB_LEASE_SECONDS", "120")),
+    poll_seconds=float(os.getenv("AUDIO_JOB_POLL_SECONDS", "1")),
+    max_attempts=int(os.getenv("AUDIO_JOB_MAX_ATTEMPTS", "3")),
+    stop_seconds=float(os.getenv("AUDIO_JOB_STOP_SECONDS", "5")),
+)
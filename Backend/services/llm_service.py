@@ -1,15 +1,21 @@
 import json
+import threading
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 import os
 from dotenv import load_dotenv
+from services.executors import io_executor, llm_executor
+from services.mood_cache import mood_cache
+from services.mood_index import mood_index
 
 load_dotenv()
 
 api_key = os.getenv("GOOGLE_API_KEY")
 
+MODEL_NAME = "gemini-2.5-flash"
+
 class MeditationScripts(BaseModel):
     title: str = Field(description="A short, poetic title for the meditation (max 6 words)")
     visual_script: str = Field(description="The markdown formatted script for reading")
@@ -21,84 +27,26 @@ class MoodSuggestion(BaseModel):
     suggested_tone: str = Field(description="Recommended voice tone (e.g., Calm, Reassuring, Gentle)")
     suggested_focus_areas: str = Field(description="A concise string of specific focus areas based on the mood (e.g., 'Soothe anxiety, relax chest tension, grounding breath')")
 
-def analyze_mood(mood_text: str):
-    if not api_key:
-        raise Exception("Google API Key not found")
-        
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key)
-    parser = JsonOutputParser(pydantic_object=MoodSuggestion)
-    
-    template = """
+MOOD_TEMPLATE = """
     You are an emotional wellness assistant.
     Based on the user’s described emotional state: "{mood_text}"
-    
+
     Suggest:
     1. Meditation type (stress relief, sleep, focus, anxiety reduction, etc.)
     2. Ideal duration (5, 10, or 15 minutes) - choose what fits the urgency/severity.
     3. Voice tone (choose from: Calm, Reassuring, Gentle, Warm, Grounding, Uplifting)
-    4. Specific Focus Areas: Elaborate on 2-3 specific things to focus on during the meditation to help with this mood. 
+    4. Specific Focus Areas: Elaborate on 2-3 specific things to focus on during the meditation to help with this mood.
        Do NOT just copy the mood. For example, if mood is "Anxious", suggest "Release chest tightness, slow rhythmic breathing, grounding techniques".
-    
+
     Return JSON only.
     {format_instructions}
     """
-    
-    prompt = PromptTemplate(
-        input_variables=["mood_text"],
-        template=template,
-        partial_variables={"format_instructions": parser.get_format_instructions()}
-    )
-    
-    chain = prompt | llm | parser
-    
-    try:
-        result = chain.invoke({"mood_text": mood_text})
-        return result
-    except Exception as e:
-        print(f"Mood analysis failed: {e}")
-        # Fallback
-        return {
-            "suggested_type": "Stress Relief",
-            "suggested_duration": 10,
-            "suggested_tone": "Calm",
-            "suggested_focus_areas": "General relaxation"
-        }
-
-def generate_meditation_script(type: str, duration: int, preferences: str, tone: str, health_conditions: list = None, mood_before: str = None):
-    if not api_key:
-        raise Exception("Google API Key not found")
-
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", google_api_key=api_key)
-
-    parser = JsonOutputParser(pydantic_object=MeditationScripts)
-
-    # Build health context string
-    health_context = ""
-    if health_conditions:
-        health_context = "\nThe user has the following health conditions/considerations:\n- " + "\n- ".join(health_conditions)
-        health_context += """
-        
-        GUARDRAILS FOR HEALTH CONDITIONS:
-        - Do NOT give medical advice or clinical claims.
-        - Avoid breathing instructions that may be unsafe for people with hypertension or respiratory issues.
-        - Avoid intense body scans for chronic pain; keep them gentle and soft.
-        - Use compassionate, non-judgmental language.
-        - If 'Insomnia' is present: Avoid stimulating language, use soft pacing and slow cues.
-        - If 'Anxiety' is present: Focus on grounding, sensory awareness, and avoid overwhelming metaphors.
-        - If 'Depression' is present: Avoid toxic positivity or "fix yourself" language; use gentle acceptance.
-        - If 'Burnout' is present: Avoid productivity language; emphasize permission to rest.
-        """
-
-    mood_context = f"\nThe user's current mood is: {mood_before}" if mood_before else ""
 
-    # Calculate approximate target (simpler guidance)
-    approx_words = duration * 130
-    
-    template = """
+SCRIPT_TEMPLATE = """
     You are an expert meditation instructor.
-    
+
     GOAL: Create a sleep meditation script that fits EXACTLY into {duration} minutes.
-    
+
     Data:
     - Type: {type}
     - User Mood: {mood_context}
@@ -127,15 +75,135 @@ def generate_meditation_script(type: str, duration: int, preferences: str, tone:
     {format_instructions}
     """
 
+# v2: pauses are kept in the audio script as markers and rendered as silence
+# locally (services.audio_mix) instead of being dropped
+SCRIPT_TEMPLATE_V2 = SCRIPT_TEMPLATE.replace(
+    '"audio_script": "Plain text for TTS. NO bolding. NO instructions like [PAUSE]. Just the spoken words."',
+    '"audio_script": "Plain text for TTS. NO bolding. The spoken words, with a [PAUSE] marker (optionally with a length, e.g. [PAUSE 10s]) wherever the listener should rest in silence. No other instructions."'
+)
+
+HEALTH_GUARDRAILS = """
+
+        GUARDRAILS FOR HEALTH CONDITIONS:
+        - Do NOT give medical advice or clinical claims.
+        - Avoid breathing instructions that may be unsafe for people with hypertension or respiratory issues.
+        - Avoid intense body scans for chronic pain; keep them gentle and soft.
+        - Use compassionate, non-judgmental language.
+        - If 'Insomnia' is present: Avoid stimulating language, use soft pacing and slow cues.
+        - If 'Anxiety' is present: Focus on grounding, sensory awareness, and avoid overwhelming metaphors.
+        - If 'Depression' is present: Avoid toxic positivity or "fix yourself" language; use gentle acceptance.
+        - If 'Burnout' is present: Avoid productivity language; emphasize permission to rest.
+        """
+
+# Prompt registry: (prompt name, version) -> (template, input variables, output model).
+# Bump the version when a template changes so old and new chains can coexist.
+PROMPTS = {
+    ("mood", "v1"): (MOOD_TEMPLATE, ["mood_text"], MoodSuggestion),
+    ("script", "v1"): (
+        SCRIPT_TEMPLATE,
+        ["type", "duration", "preferences", "tone", "health_context", "mood_context", "approx_words"],
+        MeditationScripts,
+    ),
+    ("script", "v2"): (
+        SCRIPT_TEMPLATE_V2,
+        ["type", "duration", "preferences", "tone", "health_context", "mood_context", "approx_words"],
+        MeditationScripts,
+    ),
+}
+MOOD_PROMPT_VERSION = "v1"
+SCRIPT_PROMPT_VERSION = "v2"
+
+# Returned when the LLM call fails. Never cached, so the next request retries.
+FALLBACK_MOOD_SUGGESTION = {
+    "suggested_type": "Stress Relief",
+    "suggested_duration": 10,
+    "suggested_tone": "Calm",
+    "suggested_focus_areas": "General relaxation"
+}
+
+# Format instructions only depend on the output model, compute them once
+FORMAT_INSTRUCTIONS = {
+    model: JsonOutputParser(pydantic_object=model).get_format_instructions()
+    for model in (MoodSuggestion, MeditationScripts)
+}
+
+_llms = {}
+_chains = {}
+_chains_lock = threading.Lock()
+
+def build_chain(prompt_name: str, version: str, model_name: str = MODEL_NAME, llm=None):
+    """Compile prompt | llm | parser for a registered prompt (uncached)."""
+    template, input_variables, output_model = PROMPTS[(prompt_name, version)]
+    if llm is None:
+        llm = ChatGoogleGenerativeAI(model=model_name, google_api_key=api_key)
+    parser = JsonOutputParser(pydantic_object=output_model)
     prompt = PromptTemplate(
-        input_variables=["type", "duration", "preferences", "tone", "health_context", "mood_context", "approx_words"],
+        input_variables=input_variables,
         template=template,
-        partial_variables={"format_instructions": parser.get_format_instructions()}
+        partial_variables={"format_instructions": FORMAT_INSTRUCTIONS[output_model]}
     )
+    return prompt | llm | parser
+
+def get_chain(prompt_name: str, version: str, model_name: str = MODEL_NAME):
+    """Return the shared chain for (model, prompt, version), compiling it on first use."""
+    key = (model_name, prompt_name, version)
+    chain = _chains.get(key)
+    if chain is not None:
+        return chain
+
+    with _chains_lock:
+        chain = _chains.get(key)
+        if chain is None:
+            llm = _llms.get(model_name)
+            if llm is None:
+                llm = ChatGoogleGenerativeAI(model=model_name, google_api_key=api_key)
+                _llms[model_name] = llm
+            chain = build_chain(prompt_name, version, model_name, llm=llm)
+            _chains[key] = chain
+    return chain
+
+def build_health_context(health_conditions: list = None) -> str:
+    if not health_conditions:
+        return ""
+    return "\nThe user has the following health conditions/considerations:\n- " + "\n- ".join(health_conditions) + HEALTH_GUARDRAILS
+
+async def analyze_mood(mood_text: str):
+    if not api_key:
+        raise Exception("Google API Key not found")
+
+    cached = await mood_cache.get(mood_text)
+    if cached is not None:
+        return cached
 
-    chain = prompt | llm | parser
+    # Close enough to a mood we've already answered? Reuse that suggestion.
+    similar, _ = await io_executor.run(mood_index.search, mood_text)
+    if similar is not None:
+        await mood_cache.set(mood_text, similar)
+        return similar
+
+    chain = get_chain("mood", MOOD_PROMPT_VERSION)
+
+    try:
+        result = await llm_executor.call(chain.ainvoke, {"mood_text": mood_text})
+    except Exception as e:
+        print(f"Mood analysis failed: {e}")
+        # Fallback
+        return dict(FALLBACK_MOOD_SUGGESTION)
+
+    await mood_cache.set(mood_text, result)
+    await io_executor.run(mood_index.add, mood_text, result)
+    return result
+
+def build_script_inputs(type: str, duration: int, preferences: str, tone: str, health_conditions: list = None, mood_before: str = None) -> dict:
+    # Build health context string
+    health_context = build_health_context(health_conditions)
 
-    result = chain.invoke({
+    mood_context = f"\nThe user's current mood is: {mood_before}" if mood_before else ""
+
+    # Calculate approximate target (simpler guidance)
+    approx_words = duration * 130
+
+    return {
         "type": type,
         "duration": duration,
         "preferences": preferences if preferences else "General relaxation",
@@ -143,6 +211,35 @@ def generate_meditation_script(type: str, duration: int, preferences: str, tone:
         "health_context": health_context if health_context else "None provided.",
         "mood_context": mood_context if mood_context else "Neutral",
         "approx_words": approx_words
-    })
+    }
+
+async def generate_meditation_script(type: str, duration: int, preferences: str, tone: str, health_conditions: list = None, mood_before: str = None):
+    if not api_key:
+        raise Exception("Google API Key not found")
+
+    chain = get_chain("script", SCRIPT_PROMPT_VERSION)
+
+    result = await llm_executor.call(
+        chain.ainvoke,
+        build_script_inputs(type, duration, preferences, tone, health_conditions, mood_before)
+    )
 
     return result
+
+async def stream_meditation_script(type: str, duration: int, preferences: str, tone: str, health_conditions: list = None, mood_before: str = None):
+    """
+    Streaming variant of generate_meditation_script.
+
+    Yields the partially parsed MeditationScripts dict each time the model
+    sends more tokens; the last item is the complete result.
+    """
+    if not api_key:
+        raise Exception("Google API Key not found")
+
+    chain = get_chain("script", SCRIPT_PROMPT_VERSION)
+
+    async for partial in llm_executor.stream(
+        chain.astream,
+        build_script_inputs(type, duration, preferences, tone, health_conditions, mood_before)
+    ):
+        yield partial
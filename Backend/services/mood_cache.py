@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+from database import SessionLocal
+from services.executors import io_executor
+import models
+
+load_dotenv()
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_mood_text(mood_text: str) -> str:
+    """Fold case, punctuation and whitespace so "Can't sleep!!" == "cant  sleep"."""
+    text = _PUNCTUATION.sub("", mood_text.lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class SQLMoodCacheStore:
+    """Shared store backed by the `mood_suggestion_cache` table, survives restarts."""
+
+    def get(self, key: str):
+        db = SessionLocal()
+        try:
+            row = db.get(models.MoodSuggestionCache, key)
+            if not row:
+                return None
+            return json.loads(row.suggestion), row.expires_at
+        finally:
+            db.close()
+
+    def set(self, key: str, value: dict, expires_at: float):
+        db = SessionLocal()
+        try:
+            db.merge(models.MoodSuggestionCache(
+                key=key,
+                suggestion=json.dumps(value),
+                expires_at=expires_at
+            ))
+            # Opportunistically drop expired rows so the table stays bounded
+            db.query(models.MoodSuggestionCache)\
+                .filter(models.MoodSuggestionCache.expires_at < time.time())\
+                .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def delete(self, key: str):
+        db = SessionLocal()
+        try:
+            db.query(models.MoodSuggestionCache)\
+                .filter(models.MoodSuggestionCache.key == key)\
+                .delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+    def clear(self):
+        db = SessionLocal()
+        try:
+            db.query(models.MoodSuggestionCache).delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+class MoodCache:
+    """
+    Exact-match cache for mood suggestions.
+
+    The bounded in-process LRU is the default store. When a shared `store`
+    is configured the LRU sits in front of it, so hot keys never touch the
+    database; the store's blocking calls run on the io executor. Entries
+    expire after `ttl_seconds`.
+    """
+
+    def __init__(self, store=None, max_entries: int = 1024, ttl_seconds: float = 86400):
+        self.store = store
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _remember(self, key: str, value: dict, expires_at: float):
+        with self._lock:
+            self._lru[key] = (value, expires_at)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self.evictions += 1
+
+    async def get(self, mood_text: str):
+        key = normalize_mood_text(mood_text)
+        now = time.time()
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[1] > now:
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return dict(entry[0])
+            if entry:
+                del self._lru[key]
+
+        if self.store is not None:
+            entry = await io_executor.run(self.store.get, key)
+            if entry and entry[1] > now:
+                self._remember(key, entry[0], entry[1])
+                self.hits += 1
+                return dict(entry[0])
+
+        self.misses += 1
+        return None
+
+    async def set(self, mood_text: str, suggestion: dict):
+        key = normalize_mood_text(mood_text)
+        expires_at = time.time() + self.ttl_seconds
+        value = dict(suggestion)
+        self._remember(key, value, expires_at)
+        if self.store is not None:
+            await io_executor.run(self.store.set, key, value, expires_at)
+
+    async def invalidate(self, mood_text: str):
+        key = normalize_mood_text(mood_text)
+        with self._lock:
+            self._lru.pop(key, None)
+        if self.store is not None:
+            await io_executor.run(self.store.delete, key)
+
+    async def clear(self):
+        with self._lock:
+            self._lru.clear()
+        if self.store is not None:
+            await io_executor.run(self.store.clear)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.store).__name__ if self.store is not None else "memory",
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def _build_store(backend: str):
+    if backend == "sqlite":
+        return SQLMoodCacheStore()
+    if backend == "memory":
+        return None
+    raise ValueError(f"Unknown MOOD_CACHE_BACKEND: {backend}")
+
+
+mood_cache = MoodCache(
+    store=_build_store(os.getenv("MOOD_CACHE_BACKEND", "memory")),
+    max_entries=int(os.getenv("MOOD_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("MOOD_CACHE_TTL_SECONDS", "86400")),
+)
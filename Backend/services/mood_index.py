@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+from services.mood_cache import normalize_mood_text
+
+try:
+    import fcntl
+except ImportError: # Windows: no cross-process lock, run a single worker per index directory
+    fcntl = None
+
+load_dotenv()
+
+EMBEDDING_DIM = 1024
+NGRAM_SIZES = (3, 4)
+HISTOGRAM_BINS = 10
+
+def embed_mood_text(mood_text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """
+    Hashed character n-gram embedding, L2-normalized.
+
+    crc32 is used instead of hash() so vectors are stable across processes
+    and restarts (hash() is salted per interpreter).
+    """
+    text = f" {normalize_mood_text(mood_text)} "
+    grams = [text[i:i + n] for n in NGRAM_SIZES for i in range(len(text) - n + 1)]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not grams:
+        return vector
+
+    buckets = np.fromiter((zlib.crc32(g.encode("utf-8")) % dim for g in grams), dtype=np.int64, count=len(grams))
+    vector += np.bincount(buckets, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector /= norm
+    return vector
+
+
+class MoodIndex:
+    """
+    Nearest-neighbour index of past mood_text -> MoodSuggestion results.
+
+    Vectors live in a memory-mapped `vectors.npy` (capacity doubles as it
+    fills) and suggestions in an append-only `entries.jsonl`, so a restart
+    just reopens the files.
+
+    Several worker processes can share a directory: appends and rebuilds
+    take an exclusive lock on `index.lock`, and each process picks up the
+    others' new lines (and a regrown vectors file) before searching or
+    appending. A hit is also checked against its entry's own key, so a row
+    that doesn't belong to its line is never returned.
+    """
+
+    def __init__(self, index_dir, threshold: float = 0.9, dim: int = EMBEDDING_DIM, initial_capacity: int = 1024):
+        self.index_dir = Path(index_dir)
+        self.threshold = threshold
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._entries = []
+        self._keys = set()
+        self._entries_offset = 0 # bytes of entries.jsonl read so far
+        self._vectors_inode = None
+        self.hits = 0
+        self.misses = 0
+        self.mismatches = 0
+        self.similarity_histogram = np.zeros(HISTOGRAM_BINS, dtype=np.int64)
+        self._load()
+
+    @property
+    def _vectors_path(self) -> Path:
+        return self.index_dir / "vectors.npy"
+
+    @property
+    def _entries_path(self) -> Path:
+        return self.index_dir / "entries.jsonl"
+
+    @contextmanager
+    def _file_lock(self):
+        """Exclusive across processes sharing index_dir (hold self._lock too)."""
+        if fcntl is None:
+            yield
+            return
+        with open(self.index_dir / "index.lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self):
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock():
+            self._read_new_entries()
+            if self._vectors_path.exists():
+                self._open_vectors()
+                if self._vectors.shape[1] != self.dim or self._vectors.shape[0] < len(self._entries):
+                    print(f"Mood index at {self.index_dir} is inconsistent, rebuilding vectors.")
+                    self._rebuild_vectors()
+            else:
+                self._rebuild_vectors()
+
+    def _read_new_entries(self):
+        """Append lines written since the last read (by any process); partial lines wait."""
+        if not self._entries_path.exists():
+            return
+        with open(self._entries_path, "rb") as f:
+            f.seek(self._entries_offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        for line in complete.decode("utf-8").splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._entries.append(entry)
+                self._keys.add(entry["key"])
+        self._entries_offset += len(complete)
+
+    def _open_vectors(self):
+        self._vectors = np.load(self._vectors_path, mmap_mode="r+")
+        self._vectors_inode = os.stat(self._vectors_path).st_ino
+
+    def _refresh(self):
+        """Catch up with other processes: new entries, and a vectors file they regrew."""
+        try:
+            entries_size = os.stat(self._entries_path).st_size
+            vectors_inode = os.stat(self._vectors_path).st_ino
+        except FileNotFoundError:
+            return
+        if entries_size > self._entries_offset:
+            self._read_new_entries()
+        if vectors_inode != self._vectors_inode:
+            self._open_vectors()
+
+    def _allocate(self, capacity: int):
+        tmp_path = self._vectors_path.with_suffix(".tmp.npy")
+        vectors = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(capacity, self.dim))
+        return vectors, tmp_path
+
+    def _swap_in(self, vectors, tmp_path: Path):
+        vectors.flush()
+        del vectors
+        self._vectors = None
+        os.replace(tmp_path, self._vectors_path)
+        self._open_vectors()
+
+    def _rebuild_vectors(self):
+        capacity = max(self.initial_capacity, len(self._entries) * 2)
+        vectors, tmp_path = self._allocate(capacity)
+        for i, entry in enumerate(self._entries):
+            vectors[i] = embed_mood_text(entry["key"], self.dim)
+        self._swap_in(vectors, tmp_path)
+
+    def _grow(self):
+        count = len(self._entries)
+        vectors, tmp_path = self._allocate(self._vectors.shape[0] * 2)
+        vectors[:count] = self._vectors[:count]
+        self._swap_in(vectors, tmp_path)
+
+    def search(self, mood_text: str):
+        """Return (suggestion, similarity) for the nearest neighbour above threshold, else (None, best)."""
+        query = embed_mood_text(mood_text, self.dim)
+        with self._lock:
+            self._refresh()
+            count = min(len(self._entries), self._vectors.shape[0])
+            if count == 0:
+                self.misses += 1
+                return None, 0.0
+
+            similarities = self._vectors[:count] @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+
+            bucket = min(int(max(similarity, 0.0) * HISTOGRAM_BINS), HISTOGRAM_BINS - 1)
+            self.similarity_histogram[bucket] += 1
+
+            entry = self._entries[best]
+            if similarity >= self.threshold:
+                # The row must be the vector of this entry's own key
+                if abs(float(embed_mood_text(entry["key"], self.dim) @ query) - similarity) > 1e-4:
+                    self.mismatches += 1
+                    self.misses += 1
+                    return None, 0.0
+                self.hits += 1
+                return dict(entry["suggestion"]), similarity
+
+            self.misses += 1
+            return None, similarity
+
+    def add(self, mood_text: str, suggestion: dict):
+        key = normalize_mood_text(mood_text)
+        if not key:
+            return
+        vector = embed_mood_text(key, self.dim)
+
+        with self._lock, self._file_lock():
+            # Another process may have appended (or grown the file) since
+            self._refresh()
+            if key in self._keys:
+                return
+            if len(self._entries) >= self._vectors.shape[0]:
+                self._grow()
+
+            entry = {"key": key, "suggestion": dict(suggestion)}
+            # Vector first, so every persisted entry line has its vector
+            self._vectors[len(self._entries)] = vector
+            self._vectors.flush()
+            line = (json.dumps(entry) + "\n").encode("utf-8")
+            with open(self._entries_path, "ab") as f:
+                f.write(line)
+            self._entries.append(entry)
+            self._keys.add(key)
+            self._entries_offset += len(line)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        edges = np.linspace(0.0, 1.0, HISTOGRAM_BINS + 1)
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "mismatches": self.mismatches,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "similarity_histogram": {
+                f"{edges[i]:.1f}-{edges[i + 1]:.1f}": int(self.similarity_histogram[i])
+                for i in range(HISTOGRAM_BINS)
+            },
+        }
+
+
+mood_index = MoodIndex(
+    index_dir=os.getenv("MOOD_INDEX_DIR", "data/mood_index"),
+    threshold=float(os.getenv("MOOD_INDEX_THRESHOLD", "0.9")),
+)
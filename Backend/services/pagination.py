@@ -0,0 +1,72 @@
+import base64
+import json
+import os
+from datetime import datetime
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from dotenv import load_dotenv
+
+import models
+
+load_dotenv()
+
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "200"))
+
+# Opaque to clients: urlsafe base64 of a small JSON object.
+#   {"c": created_at, "i": id} - keyset position in newest-first history
+#   {"r": rank, "i": id}       - keyset position in best-match-first search results
+
+def encode_cursor(position: dict) -> str:
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    """Raises ValueError for anything encode_cursor did not produce."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(position, dict):
+        raise ValueError("Invalid cursor")
+    return position
+
+def _history_cursor(session) -> str:
+    return encode_cursor({"c": session.created_at.isoformat(), "i": session.id})
+
+def _after(cursor: str, dialect: str):
+    """WHERE clause for rows strictly older than the cursor position."""
+    position = decode_cursor(cursor)
+    try:
+        created_at = datetime.fromisoformat(position["c"])
+        session_id = int(position["i"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+    Session = models.MeditationSession
+    # Compare against the stored created_at of the cursor row rather than a
+    # bound datetime: SQLite keeps CURRENT_TIMESTAMP text, which a bound value
+    # (with microseconds) doesn't compare equal to. The cursor's own copy is
+    # only used if that row has been deleted since, as text in the stored form.
+    anchor = select(Session.created_at).where(Session.id == session_id).scalar_subquery()
+    fallback = str(created_at) if dialect == "sqlite" else created_at
+    return tuple_(Session.created_at, Session.id) < tuple_(func.coalesce(anchor, fallback), session_id)
+
+def page_query(query, limit: int, cursor: str = None, dialect: str = "sqlite"):
+    """The select history_page runs: newest first, limit + 1 rows to detect a next page."""
+    Session = models.MeditationSession
+    if cursor:
+        query = query.where(_after(cursor, dialect))
+    return query.order_by(Session.created_at.desc(), Session.id.desc()).limit(limit + 1)
+
+async def history_page(db: AsyncSession, query, limit: int = PAGE_SIZE, cursor: str = None):
+    """
+    One newest-first page of a MeditationSession select, by keyset on
+    (created_at, id) so that deep pages cost the same as the first one.
+    Returns (sessions, next_cursor); next_cursor is None on the last page.
+    """
+    rows = (await db.scalars(page_query(query, limit, cursor, db.get_bind().dialect.name))).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, _history_cursor(rows[-1])
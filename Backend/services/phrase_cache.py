@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+def normalize_phrase(text: str) -> str:
+    # Case and punctuation change prosody, so only whitespace is folded
+    return " ".join(text.split())
+
+
+class PhraseCache:
+    """
+    Persistent cache of synthesized sentences.
+
+    Each clip is a raw int16 `.npy` file loaded with mmap_mode="r", so hits
+    cost a page-in instead of a TTS call. Total size is bounded by
+    `max_bytes`; least recently used clips are evicted first. Recency is
+    persisted through file mtimes, so the LRU order survives restarts.
+
+    Only sentences that recur are worth a TTS call of their own: `note()`
+    counts the distinct scripts each sentence appeared in (for up to
+    `max_tracked` sentences), so re-synthesizing one script counts once.
+    A sentence whose clip is already on disk always recurs, so clips are
+    reused after a restart and by every worker sharing `cache_dir`.
+    get() and put() touch the disk, so call them through the io executor.
+    """
+
+    def __init__(self, cache_dir, max_bytes: int, min_repeats: int = 2, max_tracked: int = 100000):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.min_repeats = min_repeats
+        self.max_tracked = max_tracked
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._seen = OrderedDict()  # sentence digest -> (scripts seen in, last script), least recent first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.chars_saved = 0
+        self.chars_synthesized = 0
+        self._load()
+
+    def _load(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.cache_dir.glob("*.npy"):
+            if path.name.startswith("."):
+                continue  # a put() that never finished
+            stat = path.stat()
+            files.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self.total_bytes += size
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.npy"
+
+    @staticmethod
+    def key(text: str, voice: str, model: str) -> str:
+        payload = json.dumps([normalize_phrase(text), (voice or "").lower(), model])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _digest(text: str) -> bytes:
+        return hashlib.sha256(normalize_phrase(text).encode("utf-8")).digest()[:16]
+
+    def _stored(self, text: str, voice: str, model: str) -> bool:
+        # Other workers add clips this process hasn't seen, so ask the disk
+        key = self.key(text, voice, model)
+        return key in self._entries or self._path(key).exists()
+
+    def note(self, sentences: list[str], script: str, voice: str, model: str) -> set[str]:
+        """
+        Record the sentences of one script (identified by `script`) and return
+        those that recur: seen in min_repeats scripts, repeated within it, or
+        already stored for this voice and model.
+        """
+        occurrences = Counter(sentences)
+        recurring = {sentence for sentence in occurrences if self._stored(sentence, voice, model)}
+        with self._lock:
+            for sentence, times in occurrences.items():
+                digest = self._digest(sentence)
+                count, last_script = self._seen.pop(digest, (0, None))
+                if last_script != script:
+                    count += 1
+                if times > 1:
+                    count = max(count, self.min_repeats)
+                self._seen[digest] = (count, script)
+                if count >= self.min_repeats:
+                    recurring.add(sentence)
+            while len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+        return recurring
+
+    def recurring(self, text: str, voice: str, model: str) -> bool:
+        with self._lock:
+            if self._seen.get(self._digest(text), (0, None))[0] >= self.min_repeats:
+                return True
+        return self._stored(text, voice, model)
+
+    def get(self, text: str, voice: str, model: str):
+        """Memory-mapped int16 clip, or None on a miss."""
+        key = self.key(text, voice, model)
+        path = self._path(key)
+        # Not only known entries: another worker may have stored it
+        try:
+            clip = np.load(path, mmap_mode="r")
+            os.utime(path)
+            size = path.stat().st_size
+        except (FileNotFoundError, ValueError):
+            clip = None
+
+        with self._lock:
+            if clip is None:
+                self.total_bytes -= self._entries.pop(key, 0)
+                self.misses += 1
+            else:
+                self.total_bytes += size - self._entries.pop(key, 0)
+                self._entries[key] = size
+                self.hits += 1
+                self.chars_saved += len(normalize_phrase(text))
+        return clip
+
+    def put(self, text: str, voice: str, model: str, pcm: np.ndarray):
+        key = self.key(text, voice, model)
+        path = self._path(key)
+        # Not *.npy, so a crash mid-write never leaves a file _load() picks up
+        tmp_path = path.with_name(f".{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(pcm, dtype=np.int16))
+        os.replace(tmp_path, path)
+        size = path.stat().st_size
+
+        with self._lock:
+            self.chars_synthesized += len(normalize_phrase(text))
+            self.total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_size = self._entries.popitem(last=False)
+                self.total_bytes -= old_size
+                self.evictions += 1
+                self._path(old_key).unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        chars = self.chars_saved + self.chars_synthesized
+        return {
+            "entries": len(self._entries),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "tracked_phrases": len(self._seen),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tts_chars_saved": self.chars_saved,
+            "tts_chars_synthesized": self.chars_synthesized,
+            "tts_chars_saved_ratio": round(self.chars_saved / chars, 4) if chars else 0.0,
+        }
+
+
+PHRASE_CACHE_ENABLED = os.getenv("TTS_PHRASE_CACHE", "1") not in ("0", "false", "False", "")
+
+phrase_cache = PhraseCache(
+    cache_dir=os.getenv("PHRASE_CACHE_DIR", "data/phrase_cache"),
+    max_bytes=int(float(os.getenv("PHRASE_CACHE_MAX_MB", "512")) * 1024 * 1024),
+    min_repeats=int(os.getenv("PHRASE_CACHE_MIN_REPEATS", "2")),
+    max_tracked=int(os.getenv("PHRASE_CACHE_TRACKED", "100000")),
+)
@@ -0,0 +1,226 @@
+import re
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+from services.conditions import normalize_tag
+from services.pagination import PAGE_SIZE, decode_cursor, encode_cursor
+
+# Full-text search over meditation_sessions (script, audio_script, type).
+#
+# SQLite: an external-content FTS5 table kept in sync by triggers, ranked with
+# bm25() and excerpted with snippet(). PostgreSQL: a generated, weighted
+# tsvector column with a GIN index, ranked with ts_rank_cd() and excerpted
+# with ts_headline(). Either way writes through any code path stay indexed.
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+SNIPPET_TOKENS = 16
+# Relative weight of a hit in script / audio_script / type; user_id is only a filter
+BM25_WEIGHTS = (10.0, 4.0, 2.0, 0.0)
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS meditation_search USING fts5(
+        script, audio_script, type, user_id,
+        content='meditation_sessions', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS meditation_search_ai AFTER INSERT ON meditation_sessions BEGIN
+        INSERT INTO meditation_search(rowid, script, audio_script, type, user_id)
+        VALUES (new.id, new.script, new.audio_script, new.type, new.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS meditation_search_ad AFTER DELETE ON meditation_sessions BEGIN
+        INSERT INTO meditation_search(meditation_search, rowid, script, audio_script, type, user_id)
+        VALUES ('delete', old.id, old.script, old.audio_script, old.type, old.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS meditation_search_au AFTER UPDATE OF script, audio_script, type, user_id ON meditation_sessions BEGIN
+        INSERT INTO meditation_search(meditation_search, rowid, script, audio_script, type, user_id)
+        VALUES ('delete', old.id, old.script, old.audio_script, old.type, old.user_id);
+        INSERT INTO meditation_search(rowid, script, audio_script, type, user_id)
+        VALUES (new.id, new.script, new.audio_script, new.type, new.user_id);
+    END
+    """,
+]
+
+POSTGRES_DDL = [
+    """
+    ALTER TABLE meditation_sessions ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(script, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(audio_script, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(type, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_meditation_sessions_search ON meditation_sessions USING GIN (search_vector)",
+]
+
+def ensure_search_index(conn):
+    """Create the index (idempotent). A new SQLite index is filled from existing rows."""
+    if conn.dialect.name == "postgresql":
+        for statement in POSTGRES_DDL:
+            conn.execute(text(statement))
+        return
+
+    existed = conn.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meditation_search'"
+    )).first()
+    for statement in SQLITE_DDL:
+        conn.execute(text(statement))
+    if not existed:
+        conn.execute(text("INSERT INTO meditation_search(meditation_search) VALUES ('rebuild')"))
+
+def search_terms(query: str) -> list[str]:
+    return _TERM.findall(query or "")
+
+def _fts5_query(terms: list[str], user_id: str) -> str:
+    # Every term quoted (no FTS syntax from user input), last one as a prefix
+    # for search-as-you-type. The user_id filter lets FTS5 intersect doclists
+    # instead of ranking every user's matches; the SQL filter stays authoritative.
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    user = user_id.replace('"', '""')
+    return f'user_id : "{user}" AND {{script audio_script type}} : ({" ".join(quoted)})'
+
+def _tsquery(terms: list[str]) -> str:
+    return " & ".join(terms[:-1] + [f"{terms[-1]}:*"])
+
+def _filters(with_type: bool, with_condition: bool) -> str:
+    filters = "AND s.type = :type" if with_type else ""
+    if with_condition:
+        filters += " AND s.id IN (SELECT session_id FROM session_conditions WHERE user_id = :user_id AND tag = :condition)"
+    return filters
+
+def _sqlite_sql(with_type: bool, with_condition: bool = False, after: bool = False) -> str:
+    # The page is picked by bm25 rank (with this query's weights) and id in a
+    # subquery; snippet() then runs only for the LIMIT rows. `after` continues
+    # past a (rank, id) cursor: bm25 is lower for better matches.
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    snippet = f"'{HIGHLIGHT_START}', '{HIGHLIGHT_END}', '...', {SNIPPET_TOKENS}"
+    keyset = "AND (rank > :after_rank OR (rank = :after_rank AND s.id > :after_id))" if after else ""
+    return f"""
+        SELECT page.id, page.score,
+               snippet(meditation_search, 0, {snippet}) AS script_snippet,
+               snippet(meditation_search, 1, {snippet}) AS audio_snippet
+        FROM (
+            SELECT s.id, rank AS score
+            FROM meditation_search
+            JOIN meditation_sessions s ON s.id = meditation_search.rowid
+            WHERE meditation_search MATCH :match
+              AND rank MATCH 'bm25({weights})'
+              AND s.user_id = :user_id
+              {_filters(with_type, with_condition)}
+              {keyset}
+            ORDER BY rank, s.id
+            LIMIT :limit
+        ) page
+        JOIN meditation_search ON meditation_search.rowid = page.id
+        WHERE meditation_search MATCH :match
+        ORDER BY page.score, page.id
+    """
+
+def _postgres_sql(with_type: bool, with_condition: bool = False, after: bool = False) -> str:
+    options = f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_END}, MaxFragments=1, MaxWords={SNIPPET_TOKENS}, MinWords=6"
+    # ts_rank_cd is a real; the cursor's rank is compared at that precision
+    keyset = """AND (ts_rank_cd(s.search_vector, q) < CAST(:after_rank AS real)
+               OR (ts_rank_cd(s.search_vector, q) = CAST(:after_rank AS real) AND s.id > :after_id))""" if after else ""
+    return f"""
+        SELECT s.id, ts_rank_cd(s.search_vector, q) AS score,
+               ts_headline('english', coalesce(s.script, ''), q, '{options}') AS script_snippet,
+               ts_headline('english', coalesce(s.audio_script, ''), q, '{options}') AS audio_snippet
+        FROM meditation_sessions s, to_tsquery('english', :match) q
+        WHERE s.search_vector @@ q
+          AND s.user_id = :user_id
+          {_filters(with_type, with_condition)}
+          {keyset}
+        ORDER BY ts_rank_cd(s.search_vector, q) DESC, s.id
+        LIMIT :limit
+    """
+
+def search_sql(dialect: str, with_type: bool = False, with_condition: bool = False, after: bool = False) -> str:
+    build = _postgres_sql if dialect == "postgresql" else _sqlite_sql
+    return build(with_type, with_condition, after)
+
+def match_expression(dialect: str, query: str, user_id: str) -> str:
+    terms = search_terms(query)
+    return _tsquery(terms) if dialect == "postgresql" else _fts5_query(terms, user_id)
+
+def sessions_by_id_query(ids: list[int]):
+    """Summary rows for the ranked hits."""
+    return select(models.MeditationSession).options(models.summary_columns()).where(models.MeditationSession.id.in_(ids))
+
+def _rank_position(cursor: str) -> dict:
+    """Query parameters for rows after a search cursor."""
+    position = decode_cursor(cursor)
+    try:
+        return {"after_rank": float(position["r"]), "after_id": int(position["i"])}
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+
+async def search_page(db: AsyncSession, user_id: str, query: str, type: str = None, limit: int = PAGE_SIZE, cursor: str = None, condition: str = None):
+    """
+    One best-match-first page as [{"session", "match_info"}], like the search
+    endpoint returns, by keyset on (rank, id): a deep page scores the user's
+    matches but excerpts and sorts only its own rows. Returns (results,
+    next_cursor); next_cursor is None on the last page. matched_in is the
+    highest-priority column with a hit (script, then audio_script, then type).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return [], None
+
+    dialect = db.get_bind().dialect.name
+    params = {
+        "match": match_expression(dialect, query, user_id),
+        "user_id": user_id,
+        "limit": limit + 1,
+    }
+    if cursor:
+        params.update(_rank_position(cursor))
+    if type:
+        params["type"] = type
+    if condition:
+        params["condition"] = normalize_tag(condition)
+    sql = search_sql(dialect, bool(type), bool(condition), after=bool(cursor))
+    hits = (await db.execute(text(sql), params)).all()
+    if not hits:
+        return [], None
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor({"r": hits[-1].score, "i": hits[-1].id})
+
+    sessions = {
+        session.id: session
+        for session in await db.scalars(
+            sessions_by_id_query([hit.id for hit in hits])
+        )
+    }
+
+    results = []
+    for hit in hits:
+        if HIGHLIGHT_START in (hit.script_snippet or ""):
+            matched_in, snippet = "script", hit.script_snippet
+        elif HIGHLIGHT_START in (hit.audio_snippet or ""):
+            matched_in, snippet = "audio_script", hit.audio_snippet
+        else:
+            matched_in, snippet = "type", None
+        results.append({
+            "session": sessions[hit.id],
+            "match_info": {"matched_in": matched_in, "snippet": snippet},
+        })
+    return results, next_cursor
+
+async def search_sessions(db: AsyncSession, user_id: str, query: str, type: str = None, limit: int = 100, condition: str = None) -> list[dict]:
+    """The first `limit` results of search_page."""
+    results, _ = await search_page(db, user_id, query, type=type, limit=limit, condition=condition)
+    return results
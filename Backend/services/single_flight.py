@@ -0,0 +1,52 @@
+import asyncio
+import hashlib
+import json
+
+
+def request_key(*parts) -> str:
+    """Canonical hash of JSON-serializable request parameters (dict key order doesn't matter)."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """
+    At most one call per key in flight: concurrent callers with the same key
+    await the running task instead of starting their own. Results are not
+    kept once the task is done (see services.idempotency for replays).
+
+    The call runs as its own task, shielded from callers, so the first
+    client disconnecting doesn't cancel the work the others are waiting on.
+    It must therefore not use the request's database session.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, coro_fn, *args, **kwargs):
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.create_task(coro_fn(*args, **kwargs))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._inflight),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+generation_flights = SingleFlight("generate")
+audio_flights = SingleFlight("audio")
+
+def single_flight_stats() -> dict:
+    return {flights.name: flights.stats() for flights in (generation_flights, audio_flights)}
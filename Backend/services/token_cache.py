@@ -0,0 +1,140 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def token_digest(id_token: str) -> str:
+    # Raw tokens are bearer credentials: only their digest is kept in memory
+    return hashlib.sha256(id_token.encode()).hexdigest()
+
+
+class TokenCache:
+    """
+    Decoded Firebase ID tokens, so a client polling with the same token pays
+    for signature verification once rather than on every request.
+
+    Bounded LRU keyed by the token's SHA-256. An entry lives until the token's
+    `exp` (less `skew_seconds`), or at most `max_ttl_seconds` when set, which
+    bounds how long a revoked token can stay accepted when revocation is only
+    visible to Firebase. `invalidate_user` is the hook for revocations made by
+    this server: it drops the user's tokens and refuses any issued before it,
+    including ones whose verification was already in flight.
+    """
+
+    def __init__(self, max_entries: int = 4096, skew_seconds: float = 30, max_ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.skew_seconds = skew_seconds
+        self.max_ttl_seconds = max_ttl_seconds
+        self._lru = OrderedDict()  # digest -> (decoded token, expires_at)
+        self._by_user = {}         # uid -> {digest}
+        self._revoked_before = {}  # uid -> time; tokens issued earlier are refused
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _drop(self, key: str):
+        decoded, _ = self._lru.pop(key)
+        keys = self._by_user.get(decoded.get("uid"))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_user[decoded.get("uid")]
+
+    def _revoked(self, decoded: dict) -> bool:
+        revoked_before = self._revoked_before.get(decoded.get("uid"))
+        return revoked_before is not None and decoded.get("iat", 0) < revoked_before
+
+    def get(self, id_token: str):
+        key = token_digest(id_token)
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry and entry[1] > time.time():
+                self._lru.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                self._drop(key)
+                self.expirations += 1
+            self.misses += 1
+            return None
+
+    def put(self, id_token: str, decoded: dict):
+        """Remember a token that was just verified. Tokens without an `exp` are not cached."""
+        exp = decoded.get("exp")
+        if self.max_entries <= 0 or not isinstance(exp, (int, float)) or not decoded.get("uid"):
+            return
+        expires_at = exp - self.skew_seconds
+        if self.max_ttl_seconds is not None:
+            expires_at = min(expires_at, time.time() + self.max_ttl_seconds)
+        if expires_at <= time.time():
+            return
+
+        key = token_digest(id_token)
+        with self._lock:
+            if self._revoked(decoded):
+                return
+            if key in self._lru:
+                self._drop(key)
+            self._lru[key] = (decoded, expires_at)
+            self._by_user.setdefault(decoded["uid"], set()).add(key)
+            while len(self._lru) > self.max_entries:
+                self._drop(next(iter(self._lru)))
+                self.evictions += 1
+
+    def invalidate_token(self, id_token: str):
+        key = token_digest(id_token)
+        with self._lock:
+            if key in self._lru:
+                self._drop(key)
+                self.invalidations += 1
+
+    def invalidate_user(self, uid: str):
+        """Forget every cached token of `uid`, e.g. after its refresh tokens were revoked."""
+        with self._lock:
+            # Firebase compares whole seconds (iat) against the revocation time
+            self._revoked_before[uid] = int(time.time())
+            for key in list(self._by_user.get(uid, ())):
+                self._drop(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+            self._by_user.clear()
+            self._revoked_before.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "users": len(self._by_user),
+            "max_entries": self.max_entries,
+            "max_ttl_seconds": self.max_ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+# With AUTH_CHECK_REVOKED=1 verification also asks Firebase whether the user's
+# tokens were revoked. Cached tokens are then re-verified every
+# TOKEN_CACHE_MAX_TTL_SECONDS, so a revocation made elsewhere applies within that.
+AUTH_CHECK_REVOKED = os.getenv("AUTH_CHECK_REVOKED", "0") == "1"
+_max_ttl = os.getenv("TOKEN_CACHE_MAX_TTL_SECONDS", "300" if AUTH_CHECK_REVOKED else "")
+
+token_cache = TokenCache(
+    max_entries=int(os.getenv("TOKEN_CACHE_SIZE", "4096")),
+    skew_seconds=float(os.getenv("TOKEN_CACHE_SKEW_SECONDS", "30")),
+    max_ttl_seconds=float(_max_ttl) if _max_ttl else None,
+)
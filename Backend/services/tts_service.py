@@ -1,8 +1,19 @@
 from google import genai
 from google.genai import types
+import asyncio
+import hashlib
+import json
 import os
-import uuid
+import re
+import struct
+import wave
+import numpy as np
 from dotenv import load_dotenv
+from services.executors import tts_executor, io_executor, encode_executor
+from services.audio_encoding import ENCODERS, encode_file, temp_path_for
+from services.phrase_cache import phrase_cache, PHRASE_CACHE_ENABLED
+from services.audio_mix import TimelineMixer, ambient_bed, fit_pauses, mix_signature, parse_pauses
+from services.waveform import analyze_audio
 
 load_dotenv()
 api_key = os.getenv("GOOGLE_API_KEY")
@@ -27,49 +38,557 @@ from pathlib import Path
 AUDIO_DIR = Path("static/audio")
 AUDIO_DIR.mkdir(parents=True, exist_ok=True)
 
-async def generate_audio(text: str, voice_gender: str = "Female") -> tuple[str, float]:
+TTS_MODEL = "gemini-2.5-flash-preview-tts"
+
+# Gemini TTS returns 16-bit mono PCM at 24 kHz
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+MAX_CHUNK_CHARS = int(os.getenv("TTS_MAX_CHUNK_CHARS", "1200"))
+CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", "4"))
+CHUNK_RETRIES = int(os.getenv("TTS_CHUNK_RETRIES", "2"))
+CROSSFADE_MS = int(os.getenv("TTS_CROSSFADE_MS", "0"))
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+")
+
+def _pack(pieces: list[str], max_chars: int, joiner: str) -> list[str]:
+    chunks = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{joiner}{piece}" if current else piece
+        if len(candidate) <= max_chars or not current:
+            current = candidate
+        else:
+            chunks.append(current)
+            current = piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def split_sentences(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """Sentences in order (oversized sentences split at word boundaries)."""
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            if len(sentence) <= max_chars:
+                pieces.append(sentence)
+            else:
+                pieces.extend(_pack(sentence.split(" "), max_chars, " "))
+    return pieces
+
+def split_script(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[str]:
+    """
+    Split a script into TTS-sized chunks.
+
+    Whole paragraphs are packed together while they fit; oversized paragraphs
+    are split at sentence ends, and oversized sentences at word boundaries.
+    """
+    pieces = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+        else:
+            pieces.extend(split_sentences(paragraph, max_chars))
+    return _pack(pieces, max_chars, " ")
+
+def plan_segments(text: str, recurring: set[str] = frozenset()) -> list[str]:
+    """
+    Units sent to TTS: sentences packed into large chunks to minimise
+    requests. Sentences in `recurring` are cut out as units of their own so
+    the phrase cache can store and reuse them; the ones between are still
+    packed.
+    """
+    if not recurring:
+        return split_script(text)
+
+    segments, pending = [], []
+    for sentence in split_sentences(text):
+        if sentence in recurring:
+            segments.extend(_pack(pending, MAX_CHUNK_CHARS, " "))
+            segments.append(sentence)
+            pending = []
+        else:
+            pending.append(sentence)
+    segments.extend(_pack(pending, MAX_CHUNK_CHARS, " "))
+    return segments
+
+async def synthesize_chunk(text: str) -> np.ndarray:
+    """One TTS request. Returns int16 PCM samples."""
+    response = await tts_executor.call(
+        client.aio.models.generate_content,
+        model=TTS_MODEL,
+        contents=types.Content(
+            parts=[types.Part(text=text)]
+        ),
+        config=types.GenerateContentConfig(
+            response_modalities=["AUDIO"]
+        )
+    )
+
+    audio_data = None
+    if response.candidates and response.candidates[0].content.parts:
+        for part in response.candidates[0].content.parts:
+            if part.inline_data:
+                audio_data = part.inline_data.data
+                break
+
+    if not audio_data:
+        raise Exception("No audio data returned from Gemini")
+
+    # Drop a trailing odd byte rather than fail the whole chunk
+    usable = len(audio_data) - (len(audio_data) % SAMPLE_WIDTH)
+    return np.frombuffer(audio_data[:usable], dtype="<i2")
+
+async def _synthesize_with_retry(index: int, text: str, semaphore: asyncio.Semaphore, retries: int) -> np.ndarray:
+    async with semaphore:
+        for attempt in range(retries + 1):
+            try:
+                return await synthesize_chunk(text)
+            except Exception as e:
+                if attempt == retries:
+                    raise Exception(f"TTS chunk {index} failed after {retries + 1} attempts: {e}")
+                print(f"TTS chunk {index} failed (attempt {attempt + 1}), retrying: {e}")
+                await asyncio.sleep(2 ** attempt)
+
+async def _synthesize_segment(index: int, text: str, voice_gender: str, semaphore: asyncio.Semaphore, retries: int) -> np.ndarray:
+    if not PHRASE_CACHE_ENABLED or not phrase_cache.recurring(text, voice_gender, TTS_MODEL):
+        return await _synthesize_with_retry(index, text, semaphore, retries)
+
+    clip = await io_executor.run(phrase_cache.get, text, voice_gender, TTS_MODEL)
+    if clip is not None:
+        return clip
+    pcm = await _synthesize_with_retry(index, text, semaphore, retries)
+    await io_executor.run(phrase_cache.put, text, voice_gender, TTS_MODEL, pcm)
+    return pcm
+
+async def synthesize_chunks_in_order(chunks: list[str], voice_gender: str = "Female", concurrency: int = CHUNK_CONCURRENCY, retries: int = CHUNK_RETRIES):
+    """
+    Synthesize chunks concurrently but yield them strictly in order, each as
+    soon as it and every chunk before it is done.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    tasks = [
+        asyncio.create_task(_synthesize_segment(i, chunk, voice_gender, semaphore, retries))
+        for i, chunk in enumerate(chunks)
+    ]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+async def synthesize_chunks(chunks: list[str], voice_gender: str = "Female", concurrency: int = CHUNK_CONCURRENCY, retries: int = CHUNK_RETRIES, on_progress=None) -> list[np.ndarray]:
+    """
+    Synthesize chunks concurrently; results come back in chunk order.
+    on_progress(done, total) is called as each chunk finishes.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    done = 0
+
+    async def tracked(i: int, chunk: str) -> np.ndarray:
+        nonlocal done
+        pcm = await _synthesize_segment(i, chunk, voice_gender, semaphore, retries)
+        done += 1
+        if on_progress:
+            on_progress(done, len(chunks))
+        return pcm
+
+    return await asyncio.gather(*[tracked(i, chunk) for i, chunk in enumerate(chunks)])
+
+def assemble_pcm(segments: list[np.ndarray], crossfade_ms: int = CROSSFADE_MS) -> np.ndarray:
+    """
+    Concatenate int16 segments into one preallocated buffer, optionally
+    overlapping neighbours with a linear crossfade of `crossfade_ms`.
+    """
+    segments = [s for s in segments if len(s)]
+    if not segments:
+        return np.zeros(0, dtype=np.int16)
+
+    fade = int(SAMPLE_RATE * crossfade_ms / 1000)
+    if len(segments) > 1:
+        fade = min(fade, min(len(s) for s in segments) // 2)
+    else:
+        fade = 0
+
+    total = sum(len(s) for s in segments) - fade * (len(segments) - 1)
+    out = np.empty(total, dtype=np.int16)
+
+    if fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+
+    pos = 0
+    for i, segment in enumerate(segments):
+        if fade and i > 0:
+            # Blend the head of this segment into the tail already written
+            start = pos - fade
+            tail = out[start:pos].astype(np.float32)
+            head = segment[:fade].astype(np.float32)
+            out[start:pos] = np.clip(tail * (1.0 - ramp) + head * ramp, -32768, 32767).astype(np.int16)
+            segment = segment[fade:]
+        out[pos:pos + len(segment)] = segment
+        pos += len(segment)
+
+    return out
+
+class PCMStitcher:
+    """
+    Incremental counterpart of assemble_pcm for streaming: push segments in
+    order and get back the samples that are final. The last few ms of each
+    segment are held back until the next one arrives so they can be crossfaded.
+    """
+
+    def __init__(self, crossfade_ms: int = CROSSFADE_MS):
+        self.fade = int(SAMPLE_RATE * crossfade_ms / 1000)
+        self._tail = np.zeros(0, dtype=np.int16)
+
+    def push(self, segment: np.ndarray) -> np.ndarray:
+        segment = np.asarray(segment, dtype=np.int16)
+        if not len(segment):
+            return np.zeros(0, dtype=np.int16)
+
+        overlap = min(len(self._tail), len(segment) // 2)
+        lead = self._tail[:len(self._tail) - overlap]
+        if overlap:
+            ramp = np.linspace(0.0, 1.0, overlap, dtype=np.float32)
+            tail = self._tail[len(self._tail) - overlap:].astype(np.float32)
+            head = segment[:overlap].astype(np.float32)
+            blended = np.clip(tail * (1.0 - ramp) + head * ramp, -32768, 32767).astype(np.int16)
+        else:
+            blended = np.zeros(0, dtype=np.int16)
+
+        body = segment[overlap:]
+        hold = min(self.fade, len(segment) // 2)
+        self._tail = body[len(body) - hold:].copy() if hold else np.zeros(0, dtype=np.int16)
+        return np.concatenate([lead, blended, body[:len(body) - hold]])
+
+    def finish(self) -> np.ndarray:
+        tail, self._tail = self._tail, np.zeros(0, dtype=np.int16)
+        return tail
+
+def plan_timeline(text: str, voice_gender: str = "Female", fit_duration: bool = False) -> tuple[list[list[str]], list[float]]:
+    """
+    TTS units for each spoken span between [PAUSE] markers, and the pause
+    after each span. Paragraphs only become spans of their own when the
+    pauses are going to be stretched.
+    """
+    spans, pauses = parse_pauses(text, split_paragraphs=fit_duration)
+    recurring = set()
+    if PHRASE_CACHE_ENABLED:
+        sentences = [sentence for span in spans for sentence in split_sentences(span)]
+        recurring = phrase_cache.note(sentences, hashlib.sha256(text.encode("utf-8")).hexdigest(), voice_gender, TTS_MODEL)
+    return [plan_segments(span, recurring) for span in spans], pauses
+
+def _mixer(ambient: str = None) -> TimelineMixer:
+    return TimelineMixer(SAMPLE_RATE, ambient_bed(ambient, SAMPLE_RATE) if ambient else None)
+
+async def synthesize_script(text: str, voice_gender: str = "Female", on_progress=None, ambient: str = None, target_seconds: float = None) -> np.ndarray:
+    """
+    Split, synthesize in parallel and reassemble a full script. Pause markers
+    become silence, stretched towards target_seconds when given, and the
+    `ambient` bed is mixed underneath.
+    """
+    plans, pauses = plan_timeline(text, voice_gender, fit_duration=target_seconds is not None)
+    chunks = [chunk for plan in plans for chunk in plan]
+    if not chunks:
+        raise Exception("Audio script is empty")
+    segments = await synthesize_chunks(chunks, voice_gender, on_progress=on_progress)
+
+    voices, start = [], 0
+    for plan in plans:
+        voices.append(assemble_pcm(segments[start:start + len(plan)]))
+        start += len(plan)
+
+    mixer = _mixer(ambient)
+    # The bed's fade-out tail counts towards the target as well
+    fixed_samples = sum(len(v) for v in voices) + (mixer.fade if mixer.bed else 0)
+    pauses = fit_pauses(fixed_samples / SAMPLE_RATE, pauses, target_seconds)
+    return mixer.render(voices, pauses)
+
+def _write_wav(filepath: Path, audio_data: bytes):
+    with wave.open(str(filepath), "wb") as wav_file:
+        wav_file.setnchannels(CHANNELS)
+        wav_file.setsampwidth(SAMPLE_WIDTH)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes(audio_data)
+
+def wav_header(num_samples: int = None) -> bytes:
+    """
+    44-byte PCM WAV header. With num_samples=None the sizes are set to the
+    maximum, the usual convention for a WAV of unknown length being streamed.
+    """
+    if num_samples is None:
+        data_size = 0xFFFFFFFF - 36
+    else:
+        data_size = num_samples * SAMPLE_WIDTH * CHANNELS
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, CHANNELS, SAMPLE_RATE,
+        SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH, CHANNELS * SAMPLE_WIDTH, SAMPLE_WIDTH * 8,
+        b"data", data_size
+    )
+
+def _finalize_wav(f, num_samples: int):
+    # Replace the streaming header with the real sizes
+    f.seek(0)
+    f.write(wav_header(num_samples))
+    f.flush()
+
+# Part of the cache key: anything that changes the bytes we write
+SAMPLE_FORMAT = f"s16le-{SAMPLE_RATE}hz-{CHANNELS}ch-xf{CROSSFADE_MS}ms"
+_CONTENT_KEY = re.compile(r"^[0-9a-f]{64}$")
+AUDIO_READ_BLOCK = 256 * 1024
+
+# content key -> task synthesizing it, so identical concurrent requests share one call
+_inflight = {}
+audio_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0}
+# format -> files encoded and total encode seconds
+encode_stats = {}
+
+def normalize_audio_script(text: str) -> str:
+    paragraphs = (" ".join(p.split()) for p in _PARAGRAPH_BREAK.split(text))
+    return "\n\n".join(p for p in paragraphs if p)
+
+def audio_content_key(text: str, voice_gender: str, model: str = TTS_MODEL, sample_format: str = SAMPLE_FORMAT, mix: str = "") -> str:
+    fields = [normalize_audio_script(text), (voice_gender or "").lower(), model, sample_format]
+    if mix:
+        # Only present when the assembly stage changes the audio, so plain
+        # scripts keep the keys they already had
+        fields.append(mix)
+    payload = json.dumps(fields)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def audio_path_for_key(key: str, extension: str = "wav") -> Path:
+    return AUDIO_DIR / f"{key}.{extension}"
+
+def audio_url_for_key(key: str, extension: str = "wav") -> str:
+    return f"/static/audio/{key}.{extension}"
+
+def audio_paths_for_key(key: str) -> list[Path]:
+    """The WAV master plus every encoded rendition of it."""
+    return list(AUDIO_DIR.glob(f"{key}.*"))
+
+def audio_key_from_url(audio_url: str):
+    """Content key for a content-addressed audio URL, None for legacy uuid files."""
+    if not audio_url:
+        return None
+    stem = Path(audio_url).stem
+    return stem if _CONTENT_KEY.match(stem) else None
+
+def _wav_duration(filepath: Path):
+    try:
+        with wave.open(str(filepath), "rb") as wav_file:
+            return wav_file.getnframes() / wav_file.getframerate()
+    except FileNotFoundError:
+        return None
+
+def _temp_path(filepath: Path) -> Path:
+    return Path(temp_path_for(filepath))
+
+async def stream_audio(text: str, voice_gender: str = "Female", on_complete=None, ambient: str = None):
+    """
+    Progressive variant of generate_audio.
+
+    Yields a WAV header immediately, then PCM bytes as each chunk (in order)
+    finishes synthesis, while writing the same bytes to the final file.
+    Once everything is written, awaits on_complete(audio_url, duration_seconds).
+    Audio that is already in the content-addressed store is streamed from disk.
+
+    Pauses and the ambient bed are applied as in generate_audio, but pauses
+    are not stretched to a target length: that needs the total speech length
+    before the first byte is sent.
+    """
+    key = audio_content_key(text, voice_gender, mix=mix_signature(text, ambient))
+    filepath = audio_path_for_key(key)
+
+    duration_seconds = await io_executor.run(_wav_duration, filepath)
+    if duration_seconds is not None:
+        audio_cache_stats["hits"] += 1
+        f = await io_executor.run(open, filepath, "rb")
+        try:
+            while True:
+                data = await io_executor.run(f.read, AUDIO_READ_BLOCK)
+                if not data:
+                    break
+                yield data
+        finally:
+            f.close()
+        if on_complete:
+            await on_complete(audio_url_for_key(key), duration_seconds)
+        return
+
     if not client:
         raise Exception("TTS Service not configured: Missing API Key")
 
+    plans, pauses = plan_timeline(text, voice_gender)
+    chunks = [chunk for plan in plans for chunk in plan]
+    if not chunks:
+        raise Exception("Audio script is empty")
+    mixer = _mixer(ambient)
+    # Index of the last chunk of each span, where its pause goes
+    span_ends = {}
+    end = -1
+    for span, plan in enumerate(plans):
+        end += len(plan)
+        span_ends[end] = span
+
+    audio_cache_stats["misses"] += 1
+    # Written under a temporary name and renamed at the end, so a partial
+    # file is never mistaken for a cache hit
+    tmp_path = _temp_path(filepath)
+    f = await io_executor.run(open, tmp_path, "wb")
+    completed = False
+    num_samples = 0
+
     try:
-        model_name = "gemini-2.5-flash-preview-tts"
-
-        response = client.models.generate_content(
-            model=model_name,
-            contents=types.Content(
-                parts=[types.Part(text=text)]
-            ),
-            config=types.GenerateContentConfig(
-                response_modalities=["AUDIO"]
-            )
-        )
+        header = wav_header()
+        await io_executor.run(f.write, header)
+        yield header
 
-        audio_data = None
-        if response.candidates and response.candidates[0].content.parts:
-            for part in response.candidates[0].content.parts:
-                if part.inline_data:
-                    audio_data = part.inline_data.data
-                    break
+        stitcher = PCMStitcher()
+        index = 0
+        async for segment in synthesize_chunks_in_order(chunks, voice_gender):
+            parts = [mixer.voice(stitcher.push(segment))]
+            if index in span_ends:
+                # Crossfades stay within a span; the pause follows its last sample
+                parts.append(mixer.voice(stitcher.finish()))
+                parts.append(mixer.silence(pauses[span_ends[index]]))
+                stitcher = PCMStitcher()
+            if index == len(chunks) - 1:
+                parts.append(mixer.finish())
+            index += 1
+
+            for pcm in parts:
+                if len(pcm):
+                    data = pcm.tobytes()
+                    await io_executor.run(f.write, data)
+                    num_samples += len(pcm)
+                    yield data
 
-        if not audio_data:
-            raise Exception("No audio data returned from Gemini")
+        await io_executor.run(_finalize_wav, f, num_samples)
+        completed = True
+    except Exception as e:
+        print(f"Error in stream_audio: {e}")
+        raise e
+    finally:
+        f.close()
+        if completed:
+            os.replace(tmp_path, filepath)
+        else:
+            tmp_path.unlink(missing_ok=True)
+
+    if on_complete:
+        await on_complete(audio_url_for_key(key), num_samples / SAMPLE_RATE)
+
+async def _synthesize_to_file(text: str, voice_gender: str, filepath: Path, on_progress=None, ambient: str = None, target_seconds: float = None) -> float:
+    if not client:
+        raise Exception("TTS Service not configured: Missing API Key")
+
+    pcm = await synthesize_script(text, voice_gender, on_progress, ambient, target_seconds)
+
+    # Write WAV file properly (off the event loop, it can be tens of MB)
+    tmp_path = _temp_path(filepath)
+    try:
+        await io_executor.run(_write_wav, tmp_path, pcm.tobytes())
+        os.replace(tmp_path, filepath)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+    # Calculate duration safely
+    return len(pcm) / SAMPLE_RATE
+
+async def _ensure_master(text: str, voice_gender: str, on_progress=None, ambient: str = None, target_seconds: float = None) -> tuple[str, float]:
+    """Content key and duration of the WAV master, synthesizing it if needed."""
+    key = audio_content_key(text, voice_gender, mix=mix_signature(text, ambient, target_seconds))
+    filepath = audio_path_for_key(key)
 
-        filename = f"{uuid.uuid4()}.wav"
-        filepath = AUDIO_DIR / filename
+    duration_seconds = await io_executor.run(_wav_duration, filepath)
+    if duration_seconds is not None:
+        audio_cache_stats["hits"] += 1
+        return key, duration_seconds
 
-        import wave
+    task = _inflight.get(key)
+    if task is None:
+        audio_cache_stats["misses"] += 1
+        task = asyncio.create_task(_synthesize_to_file(text, voice_gender, filepath, on_progress, ambient, target_seconds))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    else:
+        audio_cache_stats["coalesced"] += 1
 
-        # Write WAV file properly
-        with wave.open(str(filepath), "wb") as wav_file:
-            wav_file.setnchannels(1)
-            wav_file.setsampwidth(2)
-            wav_file.setframerate(24000)
-            wav_file.writeframes(audio_data)
+    # Shielded so one caller going away doesn't cancel the others' synthesis
+    return key, await asyncio.shield(task)
 
-        # Calculate duration safely
-        duration_seconds = len(audio_data) / (24000 * 2)
+async def encode_audio(key: str, audio_format: str) -> str:
+    """Encode the WAV master for `key` into `audio_format` (once) and return its URL."""
+    encoder = ENCODERS[audio_format]
+    if audio_format == "wav":
+        return audio_url_for_key(key)
 
-        return f"/static/audio/{filename}", duration_seconds
+    encoded_path = audio_path_for_key(key, encoder.extension)
+    if await io_executor.run(encoded_path.exists):
+        return audio_url_for_key(key, encoder.extension)
+
+    inflight_key = (key, audio_format)
+    task = _inflight.get(inflight_key)
+    if task is None:
+        task = asyncio.create_task(encode_executor.run(
+            encode_file, audio_format, str(audio_path_for_key(key)), str(encoded_path)
+        ))
+        _inflight[inflight_key] = task
+        task.add_done_callback(lambda _: _inflight.pop(inflight_key, None))
+
+        seconds = await asyncio.shield(task)
+        encode_stats.setdefault(audio_format, {"files": 0, "seconds": 0.0})
+        encode_stats[audio_format]["files"] += 1
+        encode_stats[audio_format]["seconds"] += round(seconds, 3)
+    else:
+        await asyncio.shield(task)
+
+    return audio_url_for_key(key, encoder.extension)
+
+async def audio_metadata(audio_url: str):
+    """
+    Duration, waveform envelope, size and checksum for a generated file (see
+    services.waveform), or None if it can't be analysed. Never raises, so a
+    failure here doesn't fail the generation that produced the audio.
+    """
+    delivered_path = AUDIO_DIR / Path(audio_url).name
+    key = audio_key_from_url(audio_url)
+    master_path = audio_path_for_key(key) if key else delivered_path
+    try:
+        return await io_executor.run(analyze_audio, master_path, delivered_path)
+    except Exception as e:
+        print(f"Error analysing audio {audio_url}: {e}")
+        return None
+
+async def generate_audio(text: str, voice_gender: str = "Female", on_progress=None, audio_format: str = "wav", ambient: str = None, target_seconds: float = None) -> tuple[str, float]:
+    """
+    Synthesize `text` into the content-addressed store and return
+    (audio_url, duration_seconds). Identical script + voice + model + format
+    reuses the existing file, and concurrent identical calls share one synthesis
+    (on_progress is only reported to the caller that started it).
+
+    The WAV master is always kept; other formats are encoded from it in a
+    worker process and stored next to it under the same content key.
+
+    [PAUSE] markers in `text` become silence, lengthened towards
+    `target_seconds` when given, and `ambient` names a bed mixed underneath
+    (see services.audio_mix). These are part of the content key too.
+    """
+    try:
+        key, duration_seconds = await _ensure_master(text, voice_gender, on_progress, ambient, target_seconds)
+        audio_url = await encode_audio(key, audio_format)
+        return audio_url, duration_seconds
 
     except Exception as e:
         print(f"Error in generate_audio: {e}")
@@ -0,0 +1,151 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+import models
+
+load_dotenv()
+
+def user_exists_query(uid: str):
+    return select(models.User.uid).where(models.User.uid == uid)
+
+
+class UserActivity:
+    """
+    Keeps authentication off the write path.
+
+    Users known to exist in `users` are remembered (bounded LRU), so the row
+    is inserted once per user rather than looked up on every request. Logins
+    are recorded in memory at most once per `interval_seconds` per user and
+    written to `users.last_login` in one batch every `flush_seconds` by a
+    background task, so read-only requests issue no writes at all.
+    """
+
+    def __init__(self, max_users: int = 10000, interval_seconds: float = 300, flush_seconds: float = 60):
+        self.max_users = max_users
+        self.interval_seconds = interval_seconds
+        self.flush_seconds = flush_seconds
+        self._known = OrderedDict()  # uid -> when its last login was recorded
+        self._pending = {}           # uid -> last_login not yet written
+        self._lock = threading.Lock()
+        self._task = None
+        self.inserts = 0
+        self.lookups = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.failed_flushes = 0
+
+    def _remember(self, uid: str, recorded_at: float):
+        self._known[uid] = recorded_at
+        self._known.move_to_end(uid)
+        while len(self._known) > self.max_users:
+            self._known.popitem(last=False)
+
+    def touch(self, uid: str) -> bool:
+        """Record a login for a known user; returns False if the user isn't known yet."""
+        now = time.time()
+        with self._lock:
+            recorded_at = self._known.get(uid)
+            if recorded_at is None:
+                return False
+            self._known.move_to_end(uid)
+            if now - recorded_at >= self.interval_seconds:
+                self._known[uid] = now
+                self._pending[uid] = datetime.now()
+            return True
+
+    async def ensure_user(self, db: AsyncSession, uid: str, email: str):
+        """Make sure `uid` has a users row and record the login. Only unknown users touch the database."""
+        if self.touch(uid):
+            return
+        self.lookups += 1
+        if await db.scalar(user_exists_query(uid)) is None:
+            insert_for = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+            # Another worker may insert the same user concurrently
+            await db.execute(
+                insert_for(models.User)
+                .values(uid=uid, email=email, last_login=datetime.now())
+                .on_conflict_do_nothing()
+            )
+            await db.commit()
+            self.inserts += 1
+            with self._lock:
+                self._remember(uid, time.time())
+            return
+        with self._lock:
+            self._remember(uid, float("-inf"))
+        self.touch(uid)
+
+    async def flush(self) -> int:
+        """Write pending last_login values in one batch; returns the rows written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    update(models.User),
+                    [{"uid": uid, "last_login": last_login} for uid, last_login in pending.items()],
+                )
+                await db.commit()
+        except Exception:
+            self.failed_flushes += 1
+            with self._lock:
+                # Retry with the next batch, unless a newer login was recorded meanwhile
+                for uid, last_login in pending.items():
+                    self._pending.setdefault(uid, last_login)
+            raise
+        self.flushes += 1
+        self.rows_written += len(pending)
+        return len(pending)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Error flushing last_login updates: {e}")
+
+    async def start(self):
+        self._task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error flushing last_login updates: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "known_users": len(self._known),
+            "max_users": self.max_users,
+            "pending_logins": len(self._pending),
+            "interval_seconds": self.interval_seconds,
+            "flush_seconds": self.flush_seconds,
+            "lookups": self.lookups,
+            "inserts": self.inserts,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+            "failed_flushes": self.failed_flushes,
+        }
+
+
+user_activity = UserActivity(
+    max_users=int(os.getenv("KNOWN_USERS_SIZE", "10000")),
+    interval_seconds=float(os.getenv("LAST_LOGIN_INTERVAL_SECONDS", "300")),
+    flush_seconds=float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "60")),
+)
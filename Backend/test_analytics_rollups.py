@@ -0,0 +1,109 @@
+"""
+Mood rollups must return to zero once a rated session is gone, even after
+generating its audio (which rewrites `duration`) moved it between requests.
+The streak in /api/analytics counts the whole history, not one page of it.
+
+    python -m pytest test_analytics_rollups.py     or     python test_analytics_rollups.py
+
+Runs the API against a throwaway SQLite file with the LLM, TTS and auth faked.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'rollups.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+import main
+import models
+from auth import get_current_user
+from database import SessionLocal
+from services import tts_service
+
+USER = {"uid": "rollup-test-user", "email": "rollups@example.com"}
+SCRIPT = {"title": "Quiet Night", "visual_script": "Breathe in. And out.", "audio_script": "Breathe in. And out."}
+
+async def fake_script(**kwargs):
+    return dict(SCRIPT)
+
+async def fake_synthesis(text):
+    # About 45 s of speech: a 10-minute request renders as a 1-minute session
+    return np.zeros(len(text) * 24000 * 45 // len(SCRIPT["audio_script"]), dtype=np.int16)
+
+def rollups():
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(models.MoodRollup.dimension, models.MoodRollup.bucket,
+                   models.MoodRollup.sessions, models.MoodRollup.improvement_total)
+            .where(models.MoodRollup.user_id == USER["uid"])
+        ).all()
+        return [tuple(row) for row in rows]
+    finally:
+        db.close()
+
+def test_rate_generate_audio_delete_leaves_no_rollups():
+    main.generate_meditation_script = fake_script
+    tts_service.synthesize_chunk = fake_synthesis
+    tts_service.client = object()
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        body = {"type": "Sleep", "duration": 10, "voice_gender": "Female", "mood_before": "Very anxious"}
+        session = client.post("/api/meditations/generate", json=body).json()
+        client.post(f"/api/meditations/{session['id']}/mood-after", json={"mood_after": "Calm"})
+        assert ("duration", "6-10", 1, 7) in rollups()
+
+        audio = client.post(f"/api/meditations/{session['id']}/audio", json={"fit_duration": False})
+        assert audio.status_code == 200
+        assert client.get(f"/api/meditations/{session['id']}").json()["duration"] == 1
+        assert ("duration", "6-10", 1, 7) in rollups()
+
+        assert client.delete(f"/api/meditations/{session['id']}").status_code == 200
+        assert all(sessions == 0 and total == 0 for _, _, sessions, total in rollups())
+        analytics = client.get("/api/analytics").json()
+        assert analytics["total"] is None and analytics["by_duration"] == []
+
+    main.app.dependency_overrides.clear()
+
+def add_sessions(user_id: str, days_ago: list):
+    now = datetime.now(timezone.utc)
+    db = SessionLocal()
+    try:
+        for days in days_ago:
+            db.add(models.MeditationSession(
+                user_id=user_id, title="Streak", type="Sleep", duration=5, script="x",
+                created_at=now - timedelta(days=days)
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+def test_streak_spans_more_than_one_history_page():
+    user = {"uid": "streak-test-user", "email": "streak@example.com"}
+    main.app.dependency_overrides[get_current_user] = lambda: user
+
+    with TestClient(main.app) as client:
+        assert client.get("/api/analytics").json()["streak"] == 0
+
+        # 60 days in a row ending yesterday, two sessions on some days, then a gap
+        add_sessions(user["uid"], list(range(1, 61)) + [1, 30] + [62, 63])
+        add_sessions("someone-else", [0])
+        analytics = client.get("/api/analytics").json()
+        assert len(client.get("/api/meditations").json()) < 60
+        assert analytics["streak"] == 60
+
+        add_sessions(user["uid"], [0])
+        assert client.get("/api/analytics").json()["streak"] == 61
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_rate_generate_audio_delete_leaves_no_rollups()
+    test_streak_spans_more_than_one_history_page()
+    print("ok")
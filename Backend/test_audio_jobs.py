@@ -0,0 +1,197 @@
+"""
+The durable audio queue: failed jobs are retried up to AUDIO_JOB_MAX_ATTEMPTS,
+jobs whose worker stopped heartbeating are requeued (each lost lease counts as
+an attempt), and deleting a session ends its jobs and removes audio generated
+for it meanwhile.
+
+    python -m pytest test_audio_jobs.py     or     python test_audio_jobs.py
+
+Runs the API against a throwaway SQLite file with the LLM, TTS and auth faked.
+"""
+import os
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'jobs.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+os.environ["AUDIO_JOB_POLL_SECONDS"] = "0.05"
+os.environ["AUDIO_JOB_MAX_ATTEMPTS"] = "3"
+
+import numpy as np
+from fastapi.testclient import TestClient
+from sqlalchemy import delete
+
+import main
+import models
+from auth import get_current_user
+from database import AsyncSessionLocal, SessionLocal
+from services import jobs, tts_service
+from services.jobs import audio_jobs
+
+USER = {"uid": "jobs-test-user", "email": "jobs@example.com"}
+
+async def fake_synthesis(text):
+    return np.zeros(2400, dtype=np.int16)
+
+def setup(audio_script: str):
+    async def fake_script(**kwargs):
+        return {"title": "Queued", "visual_script": audio_script, "audio_script": audio_script}
+    main.generate_meditation_script = fake_script
+    tts_service.synthesize_chunk = fake_synthesis
+    tts_service.client = object()
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+def create_session(client) -> int:
+    body = {"type": "Sleep", "duration": 5, "voice_gender": "Female"}
+    return client.post("/api/meditations/generate", json=body).json()["id"]
+
+def run_job(client, meditation_id: int) -> dict:
+    job = client.post(f"/api/meditations/{meditation_id}/audio/jobs", json={"format": "wav"})
+    assert job.status_code == 202, job.text
+    job_id = job.json()["id"]
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        job = client.get(f"/api/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+def attempts(job_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.get(models.AudioJob, job_id).attempts
+    finally:
+        db.close()
+
+def failing_apply(failures: int):
+    original = jobs.apply_generated_audio
+    remaining = {"n": failures}
+    async def apply(*args, **kwargs):
+        if remaining["n"]:
+            remaining["n"] -= 1
+            raise RuntimeError("database unavailable")
+        return await original(*args, **kwargs)
+    return original, apply
+
+def test_failed_job_is_retried_until_it_succeeds():
+    setup("Retry me. Then rest.")
+    original, jobs.apply_generated_audio = failing_apply(2)
+    try:
+        with TestClient(main.app) as client:
+            meditation_id = create_session(client)
+            job = run_job(client, meditation_id)
+            assert job["status"] == "done" and job["error"] is None and job["progress"] == 100
+            assert attempts(job["id"]) == 3
+            assert client.get(f"/api/meditations/{meditation_id}").json()["audio_url"] == job["audio_url"]
+            client.delete(f"/api/meditations/{meditation_id}")
+    finally:
+        jobs.apply_generated_audio = original
+        main.app.dependency_overrides.clear()
+
+def test_job_fails_after_max_attempts():
+    setup("Never quite works.")
+    original, jobs.apply_generated_audio = failing_apply(10)
+    try:
+        with TestClient(main.app) as client:
+            meditation_id = create_session(client)
+            job = run_job(client, meditation_id)
+            assert job["status"] == "failed" and job["error"] == "database unavailable"
+            assert job["finished_at"] is not None
+            assert attempts(job["id"]) == audio_jobs.max_attempts
+            # No session took the audio and no retry is coming for it
+            assert tts_service.audio_paths_for_key(tts_service.audio_content_key("Never quite works.", "Female")) == []
+            client.delete(f"/api/meditations/{meditation_id}")
+    finally:
+        jobs.apply_generated_audio = original
+        main.app.dependency_overrides.clear()
+
+def test_enqueue_returns_the_job_in_flight():
+    setup("Only once.")
+    workers, audio_jobs.workers = audio_jobs.workers, 0
+    try:
+        with TestClient(main.app) as client:
+            meditation_id = create_session(client)
+            url = f"/api/meditations/{meditation_id}/audio/jobs"
+            first = client.post(url, json={"format": "wav", "priority": 1000}).json()
+            assert client.post(url, json={"format": "wav"}).json()["id"] == first["id"]
+            other = client.post(url, json={"format": "wav", "ambient": "pink-noise"}).json()
+            assert other["id"] != first["id"]
+            db = SessionLocal()
+            try:
+                # Clients can't jump ahead of other users
+                assert db.get(models.AudioJob, first["id"]).priority == 0
+            finally:
+                db.close()
+
+            # Deleting the session ends its jobs, so none can run against a later session reusing its id
+            client.delete(f"/api/meditations/{meditation_id}")
+            for job_id in (first["id"], other["id"]):
+                job = client.get(f"/api/jobs/{job_id}").json()
+                assert job["status"] == "failed" and job["error"] == "Meditation was deleted"
+    finally:
+        audio_jobs.workers = workers
+        main.app.dependency_overrides.clear()
+
+def test_stale_jobs_are_requeued_until_out_of_attempts():
+    setup("Stale.")
+    # No workers: jobs stay exactly where the test puts them
+    workers, audio_jobs.workers = audio_jobs.workers, 0
+    try:
+        with TestClient(main.app) as client:
+            meditation_id = create_session(client)
+            db = SessionLocal()
+            try:
+                rows = {
+                    "retry": models.AudioJob(meditation_id=meditation_id, user_id=USER["uid"], status="running", attempts=1, heartbeat_at=0, progress=40),
+                    "exhausted": models.AudioJob(meditation_id=meditation_id, user_id=USER["uid"], status="running", attempts=audio_jobs.max_attempts, heartbeat_at=0, progress=40),
+                    "alive": models.AudioJob(meditation_id=meditation_id, user_id=USER["uid"], status="running", attempts=1, heartbeat_at=time.time(), progress=40),
+                }
+                db.add_all(rows.values())
+                db.commit()
+                ids = {name: job.id for name, job in rows.items()}
+            finally:
+                db.close()
+
+            async def requeue_stale():
+                async with AsyncSessionLocal() as session:
+                    await audio_jobs._requeue_stale(session)
+            client.portal.call(requeue_stale)
+
+            status = {name: client.get(f"/api/jobs/{job_id}").json() for name, job_id in ids.items()}
+            assert status["retry"]["status"] == "queued" and status["retry"]["finished_at"] is None
+            assert status["exhausted"]["status"] == "failed" and status["exhausted"]["finished_at"] is not None
+            assert "lease" in status["exhausted"]["error"]
+            assert status["alive"]["status"] == "running" and status["alive"]["error"] is None
+            client.delete(f"/api/meditations/{meditation_id}")
+    finally:
+        audio_jobs.workers = workers
+        main.app.dependency_overrides.clear()
+
+def test_audio_for_a_deleted_session_is_removed():
+    script = "Deleted while I was speaking."
+    setup(script)
+    with TestClient(main.app) as client:
+        meditation_id = create_session(client)
+
+        async def delete_then_synthesize(text):
+            async with AsyncSessionLocal() as db:
+                await db.execute(delete(models.MeditationSession).where(models.MeditationSession.id == meditation_id))
+                await db.commit()
+            return await fake_synthesis(text)
+        tts_service.synthesize_chunk = delete_then_synthesize
+
+        job = run_job(client, meditation_id)
+        assert job["status"] == "failed" and job["error"] == "Meditation was deleted"
+        assert tts_service.audio_paths_for_key(tts_service.audio_content_key(script, "Female")) == []
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_failed_job_is_retried_until_it_succeeds()
+    test_job_fails_after_max_attempts()
+    test_enqueue_returns_the_job_in_flight()
+    test_stale_jobs_are_requeued_until_out_of_attempts()
+    test_audio_for_a_deleted_session_is_removed()
+    print("ok")
@@ -0,0 +1,90 @@
+"""
+[PAUSE] markers and duration fitting: how a script is split into spoken spans
+and silences, how pauses stretch towards a target, and that scripts without
+markers keep being packed into as few TTS chunks as before.
+
+    python -m pytest test_audio_mix.py     or     python test_audio_mix.py
+
+Pure functions; no database or external services.
+"""
+import os
+
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+import numpy as np
+
+from services.audio_mix import PAUSE_SECONDS, TimelineMixer, fit_pauses, mix_signature, parse_pauses
+from services import tts_service
+
+def test_parse_pauses_markers():
+    text = "Breathe in. [PAUSE] Hold it. [pause 10s] Let go. [PAUSE: 1500ms] Rest [PAUSE 2 seconds] here."
+    assert parse_pauses(text) == (
+        ["Breathe in.", "Hold it.", "Let go.", "Rest", "here."],
+        [PAUSE_SECONDS, 10.0, 1.5, 2.0, 0.0],
+    )
+    assert parse_pauses("One. [PAUSE]", default_seconds=7) == (["One."], [7.0])
+
+def test_parse_pauses_adds_up_consecutive_markers_and_drops_a_leading_one():
+    assert parse_pauses("[PAUSE 3s] One. [PAUSE 1s] [PAUSE 2s]\n[PAUSE 500ms] Two.") == (["One.", "Two."], [3.5, 0.0])
+    assert parse_pauses("[PAUSE] [PAUSE 5s]") == ([], [])
+
+def test_parse_pauses_leaves_unknown_brackets_alone():
+    assert parse_pauses("Say [pause for effect] then go on.") == (["Say [pause for effect] then go on."], [0.0])
+
+def test_parse_pauses_without_markers():
+    text = "First paragraph.\n\nSecond paragraph.\n  \nThird."
+    # One span, so split_script can pack paragraphs into few chunks
+    assert parse_pauses(text) == ([text], [0.0])
+    assert parse_pauses("   ") == ([], [])
+    assert parse_pauses(None) == ([], [])
+    # Fitting a duration needs gaps to stretch
+    assert parse_pauses(text, split_paragraphs=True) == (["First paragraph.", "Second paragraph.", "Third."], [0.0, 0.0, 0.0])
+
+def test_plan_timeline_only_splits_paragraphs_when_fitting():
+    paragraphs = ["Short paragraph number %d, calm and slow." % i for i in range(6)]
+    text = "\n\n".join(paragraphs)
+    plans, pauses = tts_service.plan_timeline(text)
+    assert len(plans) == 1 and pauses == [0.0]
+    assert len(plans[0]) == len(tts_service.split_script(text))
+    plans, pauses = tts_service.plan_timeline(text, fit_duration=True)
+    assert len(plans) == len(paragraphs)
+
+def test_fit_pauses():
+    assert fit_pauses(30, [2.0, 4.0, 0.0]) == [2.0, 4.0, 0.0]
+    # Already long enough: speech is never cut
+    assert fit_pauses(100, [2.0, 4.0, 0.0], target_seconds=60) == [2.0, 4.0, 0.0]
+
+    fitted = fit_pauses(30, [2.0, 4.0, 0.0], target_seconds=60)
+    assert abs(30 + sum(fitted) - 60) < 1e-9
+    # Shared in proportion to (pause + 1s): the longer marked pause grows more
+    assert fitted[1] - 4.0 > fitted[0] - 2.0 > 0
+    assert fitted[2] == 0.0
+
+    # Capped gaps leave the rest after the last span
+    capped = fit_pauses(10, [1.0, 1.0, 0.0], target_seconds=100, max_pause_seconds=5)
+    assert capped[:2] == [5.0, 5.0] and abs(10 + sum(capped) - 100) < 1e-9
+    assert fit_pauses(10, [0.0], target_seconds=25) == [15.0]
+
+def test_mix_signature_is_empty_when_assembly_is_a_no_op():
+    assert mix_signature("Plain script.") == ""
+    assert mix_signature("Plain script. [PAUSE]") != ""
+    assert mix_signature("Plain script.", ambient="pink-noise") != mix_signature("Plain script.", ambient="brown-noise")
+    assert mix_signature("Plain script.", target_seconds=600) != mix_signature("Plain script.", target_seconds=300)
+
+def test_timeline_mixer_lays_out_voice_and_silence():
+    rate = 1000
+    voices = [np.full(100, 1000, dtype=np.int16), np.full(50, -1000, dtype=np.int16)]
+    out = TimelineMixer(rate).render(voices, [0.25, 0.0])
+    assert len(out) == 100 + 250 + 50
+    assert (out[:100] == 1000).all() and (out[100:350] == 0).all() and (out[350:] == -1000).all()
+
+if __name__ == "__main__":
+    test_parse_pauses_markers()
+    test_parse_pauses_adds_up_consecutive_markers_and_drops_a_leading_one()
+    test_parse_pauses_leaves_unknown_brackets_alone()
+    test_parse_pauses_without_markers()
+    test_plan_timeline_only_splits_paragraphs_when_fitting()
+    test_fit_pauses()
+    test_mix_signature_is_empty_when_assembly_is_a_no_op()
+    test_timeline_mixer_lays_out_voice_and_silence()
+    print("ok")
@@ -0,0 +1,124 @@
+"""
+GET/HEAD /static/audio/{file}: byte ranges (206), unsatisfiable ranges (416),
+conditional requests (304, If-Range) and cache headers.
+
+    python -m pytest test_audio_serving.py     or     python test_audio_serving.py
+
+Serves files from a throwaway directory; no database or external services.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'serving.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+from fastapi.testclient import TestClient
+
+import main
+from services.audio_serving import CONTENT_ADDRESSED_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, parse_range
+
+BODY = bytes(range(256)) * 4  # 1 KiB, every offset distinguishable
+LEGACY = "0b5e7a1c-2d3f-4e5a-8b9c-0d1e2f3a4b5c.wav"
+CONTENT_ADDRESSED = "ab" * 32 + ".wav"
+
+def client_for(files: dict) -> TestClient:
+    audio_dir = Path(_tmp.name) / "audio"
+    audio_dir.mkdir(exist_ok=True)
+    for name, body in files.items():
+        (audio_dir / name).write_bytes(body)
+    main.AUDIO_DIR = audio_dir
+    return TestClient(main.app)
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=0-9", 100) == (0, 9)
+    assert parse_range("bytes=90-", 100) == (90, 99)
+    assert parse_range("bytes=90-500", 100) == (90, 99)
+    assert parse_range("bytes=-10", 100) == (90, 99)
+    assert parse_range("bytes=-500", 100) == (0, 99)
+    # Ignored: served as a plain 200
+    for header in ("items=0-9", "bytes=0-9,20-29", "bytes=9-0", "bytes=a-b", "bytes=-", "bytes=5"):
+        assert parse_range(header, 100) is None, header
+    for header in ("bytes=100-", "bytes=-0"):
+        try:
+            parse_range(header, 100)
+            assert False, header
+        except ValueError:
+            pass
+    try:
+        parse_range("bytes=-5", 0)
+        assert False
+    except ValueError:
+        pass
+
+def test_full_and_partial_responses():
+    client = client_for({LEGACY: BODY, CONTENT_ADDRESSED: BODY})
+    url = f"/static/audio/{LEGACY}"
+
+    full = client.get(url)
+    assert full.status_code == 200 and full.content == BODY
+    assert full.headers["accept-ranges"] == "bytes"
+    assert full.headers["content-type"].startswith("audio/wav")
+    assert full.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+
+    part = client.get(url, headers={"Range": "bytes=100-199"})
+    assert part.status_code == 206 and part.content == BODY[100:200]
+    assert part.headers["content-range"] == f"bytes 100-199/{len(BODY)}"
+    assert part.headers["content-length"] == "100"
+
+    tail = client.get(url, headers={"Range": "bytes=-24"})
+    assert tail.status_code == 206 and tail.content == BODY[-24:]
+
+    # Multi-range is answered with the whole file
+    assert client.get(url, headers={"Range": "bytes=0-1,5-6"}).content == BODY
+
+    head = client.head(url, headers={"Range": "bytes=0-9"})
+    assert head.status_code == 206 and head.content == b"" and head.headers["content-length"] == "10"
+
+    shared = client.get(f"/static/audio/{CONTENT_ADDRESSED}")
+    assert shared.status_code == 200 and shared.headers["cache-control"] == CONTENT_ADDRESSED_CACHE_CONTROL
+    assert shared.headers["etag"] != full.headers["etag"]
+
+def test_unsatisfiable_range():
+    client = client_for({LEGACY: BODY})
+    for header in (f"bytes={len(BODY)}-", "bytes=5000-6000", "bytes=-0"):
+        response = client.get(f"/static/audio/{LEGACY}", headers={"Range": header})
+        assert response.status_code == 416, header
+        assert response.headers["content-range"] == f"bytes */{len(BODY)}"
+        assert response.content == b""
+
+def test_conditional_requests():
+    client = client_for({LEGACY: BODY})
+    url = f"/static/audio/{LEGACY}"
+    etag = client.get(url).headers["etag"]
+
+    for header in (etag, f"W/{etag}", f'"other", {etag}', "*"):
+        response = client.get(url, headers={"If-None-Match": header})
+        assert response.status_code == 304, header
+        assert response.content == b"" and response.headers["etag"] == etag
+    assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+    # If-Range: a matching validator resumes, a stale one gets the whole file
+    assert client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag}).status_code == 206
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.content == BODY
+
+    # Rewriting a legacy file changes its validator
+    client = client_for({LEGACY: BODY[::-1]})
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 200
+
+def test_only_plain_audio_files_are_served():
+    client = client_for({LEGACY: BODY, f".{CONTENT_ADDRESSED}.tmp": BODY})
+    assert client.get(f"/static/audio/.{CONTENT_ADDRESSED}.tmp").status_code == 404
+    assert client.get("/static/audio/missing.wav").status_code == 404
+    assert client.get("/static/audio/..%2Fmeditations.db").status_code == 404
+
+if __name__ == "__main__":
+    test_parse_range()
+    test_full_and_partial_responses()
+    test_unsatisfiable_range()
+    test_conditional_requests()
+    test_only_plain_audio_files_are_served()
+    print("ok")
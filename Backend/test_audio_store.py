@@ -0,0 +1,86 @@
+"""
+Content-addressed audio: sessions with the same script, voice and mix share
+one file, synthesized once, and the file is removed only when the last
+session referencing it lets go (deleted, or regenerated with another voice).
+
+    python -m pytest test_audio_store.py     or     python test_audio_store.py
+
+Runs the API against a throwaway SQLite file with the LLM, TTS and auth faked.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'audio_store.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+import main
+import models
+from auth import get_current_user
+from database import SessionLocal
+from services import tts_service
+
+USER = {"uid": "audio-store-test-user", "email": "store@example.com"}
+SCRIPT = "Shared words, spoken once. Then rest."
+
+synthesized = []
+
+async def fake_script(**kwargs):
+    return {"title": "Shared", "visual_script": SCRIPT, "audio_script": SCRIPT}
+
+async def fake_synthesis(text):
+    synthesized.append(text)
+    return np.zeros(4800, dtype=np.int16)
+
+def ref_count(audio_url: str):
+    db = SessionLocal()
+    try:
+        audio_file = db.get(models.AudioFile, tts_service.audio_key_from_url(audio_url))
+        return audio_file.ref_count if audio_file else None
+    finally:
+        db.close()
+
+def files(audio_url: str) -> list:
+    return tts_service.audio_paths_for_key(tts_service.audio_key_from_url(audio_url))
+
+def test_identical_audio_is_shared_and_reference_counted():
+    main.generate_meditation_script = fake_script
+    tts_service.synthesize_chunk = fake_synthesis
+    tts_service.client = object()
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        body = {"type": "Sleep", "duration": 5, "voice_gender": "Female"}
+        first, second = (client.post("/api/meditations/generate", json=body).json()["id"] for _ in range(2))
+
+        url = client.post(f"/api/meditations/{first}/audio", json={"voice_gender": "Female", "format": "wav"}).json()["audio_url"]
+        calls = len(synthesized)
+        assert calls > 0 and ref_count(url) == 1 and files(url)
+
+        # Same script and voice: the stored file is reused, not synthesized again
+        assert client.post(f"/api/meditations/{second}/audio", json={"voice_gender": "Female", "format": "wav"}).json()["audio_url"] == url
+        assert len(synthesized) == calls and ref_count(url) == 2
+
+        # Regenerating what a session already has doesn't take another reference
+        client.post(f"/api/meditations/{second}/audio", json={"voice_gender": "Female", "format": "wav"})
+        assert ref_count(url) == 2
+
+        # Another voice is other audio; the old file stays while `first` uses it
+        male = client.post(f"/api/meditations/{second}/audio", json={"voice_gender": "Male", "format": "wav"}).json()["audio_url"]
+        assert male != url and ref_count(url) == 1 and ref_count(male) == 1
+
+        assert client.delete(f"/api/meditations/{first}").status_code == 200
+        assert ref_count(url) is None and files(url) == []
+        assert files(male)
+
+        assert client.delete(f"/api/meditations/{second}").status_code == 200
+        assert ref_count(male) is None and files(male) == []
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_identical_audio_is_shared_and_reference_counted()
+    print("ok")
@@ -0,0 +1,73 @@
+"""
+Health conditions are stored as normalized tags: the condition filter on
+history and search, and the per-tag counts, must agree with what sessions
+were created with and forget a session once it is deleted.
+
+    python -m pytest test_conditions.py     or     python test_conditions.py
+
+Runs the API against a throwaway SQLite file with the LLM and auth faked.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'conditions.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+from fastapi.testclient import TestClient
+
+import main
+from auth import get_current_user
+from services.conditions import condition_tags
+
+USER = {"uid": "conditions-test-user", "email": "conditions@example.com"}
+
+async def fake_script(**kwargs):
+    return {"title": "Tagged", "visual_script": "Rest.", "audio_script": "Rest."}
+
+def generate(client, conditions: list, user: dict = USER) -> int:
+    main.app.dependency_overrides[get_current_user] = lambda: user
+    body = {"type": "Sleep", "duration": 5, "voice_gender": "Female", "health_conditions": conditions}
+    session = client.post("/api/meditations/generate", json=body).json()
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+    return session["id"]
+
+def ids(response) -> set:
+    # Search results wrap each session with its match_info
+    return {item["session"]["id"] if "session" in item else item["id"] for item in response.json()}
+
+def test_condition_tags():
+    assert condition_tags(["Insomnia", "  chronic   PAIN ", "insomnia", "", "Stress"]) == ["insomnia", "chronic pain", "stress"]
+    assert condition_tags(None) == []
+
+def test_filter_and_counts_follow_the_tags():
+    main.generate_meditation_script = fake_script
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        both = generate(client, ["Insomnia", "Chronic Pain"])
+        insomnia = generate(client, ["insomnia ", "INSOMNIA"])
+        untagged = generate(client, [])
+        generate(client, ["Insomnia"], user={"uid": "someone-else", "email": "e@example.com"})
+
+        assert ids(client.get("/api/meditations", params={"condition": "Insomnia"})) == {both, insomnia}
+        assert ids(client.get("/api/meditations", params={"condition": "chronic  pain"})) == {both}
+        assert ids(client.get("/api/meditations/search", params={"condition": "INSOMNIA"})) == {both, insomnia}
+        assert ids(client.get("/api/meditations", params={"condition": "anxiety"})) == set()
+        assert untagged in ids(client.get("/api/meditations"))
+
+        assert client.get("/api/conditions").json() == [
+            {"tag": "insomnia", "sessions": 2},
+            {"tag": "chronic pain", "sessions": 1},
+        ]
+
+        assert client.delete(f"/api/meditations/{both}").status_code == 200
+        assert client.get("/api/conditions").json() == [{"tag": "insomnia", "sessions": 1}]
+        assert ids(client.get("/api/meditations", params={"condition": "insomnia"})) == {insomnia}
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_condition_tags()
+    test_filter_and_counts_follow_the_tags()
+    print("ok")
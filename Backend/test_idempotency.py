@@ -0,0 +1,111 @@
+"""
+Identical generation requests in flight share one LLM call, and a request
+repeated with the same Idempotency-Key gets the stored response back instead
+of a second session. Reusing a key for other parameters is refused; failures
+are not stored.
+
+    python -m pytest test_idempotency.py     or     python test_idempotency.py
+
+Runs the API against a throwaway SQLite file with the LLM and auth faked.
+"""
+import asyncio
+import os
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'idempotency.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from auth import get_current_user
+
+USER = {"uid": "idempotency-test-user", "email": "idem@example.com"}
+BODY = {"type": "Sleep", "duration": 5, "voice_gender": "Female", "health_conditions": ["Insomnia", "stress"]}
+
+calls = []
+
+async def fake_script(**kwargs):
+    calls.append(kwargs)
+    await asyncio.sleep(0.2)  # long enough for concurrent requests to overlap
+    if kwargs.get("preferences") == "fail once" and sum(c.get("preferences") == "fail once" for c in calls) == 1:
+        raise RuntimeError("model overloaded")
+    return {"title": "Night", "visual_script": "Rest.", "audio_script": "Rest."}
+
+def setup():
+    calls.clear()
+    main.generate_meditation_script = fake_script
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+def sessions(client) -> list:
+    return [session["id"] for session in client.get("/api/meditations").json()]
+
+def test_idempotency_key_replays_the_stored_response():
+    setup()
+    with TestClient(main.app) as client:
+        before = set(sessions(client))
+        first = client.post("/api/meditations/generate", json=BODY, headers={"Idempotency-Key": "k1"})
+        again = client.post("/api/meditations/generate", json=BODY, headers={"Idempotency-Key": "k1"})
+        assert first.status_code == again.status_code == 200
+        assert again.json() == first.json()
+        assert len(calls) == 1 and set(sessions(client)) - before == {first.json()["id"]}
+
+        # Same key, other parameters
+        conflict = client.post("/api/meditations/generate", json=dict(BODY, duration=10), headers={"Idempotency-Key": "k1"})
+        assert conflict.status_code == 422
+        assert client.post("/api/meditations/generate", json=BODY, headers={"Idempotency-Key": "x" * 256}).status_code == 400
+
+        # Without a key (or with another one) every request generates
+        client.post("/api/meditations/generate", json=BODY)
+        client.post("/api/meditations/generate", json=BODY, headers={"Idempotency-Key": "k2"})
+        assert len(calls) == 3 and len(set(sessions(client)) - before) == 3
+
+        # Other users can use the same key
+        main.app.dependency_overrides[get_current_user] = lambda: {"uid": "someone-else", "email": "e@example.com"}
+        other = client.post("/api/meditations/generate", json=BODY, headers={"Idempotency-Key": "k1"})
+        assert other.status_code == 200 and other.json()["id"] != first.json()["id"]
+
+    main.app.dependency_overrides.clear()
+
+def test_failures_are_not_stored():
+    setup()
+    body = dict(BODY, preferences="fail once")
+    with TestClient(main.app) as client:
+        failed = client.post("/api/meditations/generate", json=body, headers={"Idempotency-Key": "retry-me"})
+        assert failed.status_code == 500
+        retried = client.post("/api/meditations/generate", json=body, headers={"Idempotency-Key": "retry-me"})
+        assert retried.status_code == 200 and len(calls) == 2
+
+    main.app.dependency_overrides.clear()
+
+def test_concurrent_identical_requests_share_one_generation():
+    setup()
+    with TestClient(main.app) as client:
+        before = set(sessions(client))
+
+        async def post_concurrently(bodies):
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+                return await asyncio.gather(*[async_client.post("/api/meditations/generate", json=b) for b in bodies])
+
+        # Health conditions are compared as normalized tags
+        same = [BODY, BODY, dict(BODY, health_conditions=["Stress ", "insomnia"])]
+        responses = client.portal.call(post_concurrently, same)
+        assert all(response.status_code == 200 for response in responses)
+        assert len({response.json()["id"] for response in responses}) == 1
+        assert len(calls) == 1
+
+        responses = client.portal.call(post_concurrently, [BODY, dict(BODY, duration=10)])
+        assert len({response.json()["id"] for response in responses}) == 2
+        assert len(calls) == 3
+        assert len(set(sessions(client)) - before) == 3
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_idempotency_key_replays_the_stored_response()
+    test_failures_are_not_stored()
+    test_concurrent_identical_requests_share_one_generation()
+    print("ok")
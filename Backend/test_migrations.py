@@ -0,0 +1,107 @@
+"""
+Versioned migrations: a fresh database and one created before migrations were
+versioned both end up at the current schema, with existing rows backfilled
+into the derived tables; re-running is a no-op, concurrent runs apply each
+step once, and no hot query scans a whole table afterwards.
+
+    python -m pytest test_migrations.py     or     python test_migrations.py
+
+Uses throwaway SQLite files; no external services.
+"""
+import os
+import tempfile
+import threading
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'unused.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+from sqlalchemy import create_engine, inspect, text
+
+from migrations import MIGRATIONS, migrate, query_plans
+
+LATEST = max(version for version, _, _ in MIGRATIONS)
+
+# meditation_sessions as update_db_schema.py left it, before versioning
+LEGACY_SCHEMA = [
+    """
+    CREATE TABLE users (
+        id VARCHAR PRIMARY KEY, email VARCHAR, created_at DATETIME DEFAULT CURRENT_TIMESTAMP, last_login DATETIME
+    )
+    """,
+    """
+    CREATE TABLE meditation_sessions (
+        id INTEGER PRIMARY KEY, user_id VARCHAR, type VARCHAR, duration INTEGER, preferences TEXT, tone VARCHAR,
+        script TEXT, audio_script TEXT, health_conditions TEXT, mood_before VARCHAR, mood_after VARCHAR,
+        improvement_score INTEGER, created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    INSERT INTO meditation_sessions (user_id, type, duration, tone, script, health_conditions, mood_before, mood_after, improvement_score, created_at)
+    VALUES ('legacy-user', 'Sleep', 10, 'Calm', 'Drift toward the quiet ocean.', 'Insomnia, Chronic Pain', 'Very anxious', 'Calm', 7, '2026-02-11 21:00:00'),
+           ('legacy-user', 'Focus', 5, NULL, 'Notice the breath.', 'insomnia', NULL, NULL, NULL, '2026-02-12 08:00:00')
+    """,
+]
+
+def new_engine(name: str):
+    return create_engine(f"sqlite:///{os.path.join(_tmp.name, name)}")
+
+def versions(engine) -> list:
+    with engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT version FROM schema_migrations ORDER BY version"))]
+
+def test_fresh_database():
+    engine = new_engine("fresh.db")
+    assert migrate(engine) == sorted(version for version, _, _ in MIGRATIONS)
+    assert versions(engine) == list(range(1, LATEST + 1))
+    assert migrate(engine) == []
+    assert "requested_duration" in {column["name"] for column in inspect(engine).get_columns("meditation_sessions")}
+
+def test_legacy_database_is_upgraded_and_backfilled():
+    engine = new_engine("legacy.db")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.execute(text(statement))
+
+    assert migrate(engine) == list(range(1, LATEST + 1))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT requested_duration FROM meditation_sessions ORDER BY id")).scalars().all() == [10, 5]
+        assert conn.execute(text("SELECT tag, COUNT(*) FROM session_conditions GROUP BY tag ORDER BY tag")).all() == [
+            ("chronic pain", 1), ("insomnia", 2),
+        ]
+        rollups = set(conn.execute(text("SELECT dimension, bucket, sessions, improvement_total FROM mood_rollups")).all())
+        assert {("all", "all", 1, 7), ("duration", "6-10", 1, 7), ("week", "2026-02-09", 1, 7)} <= rollups
+        # The search index was built from the rows already there
+        hits = conn.execute(text("SELECT rowid FROM meditation_search WHERE meditation_search MATCH 'ocean'")).scalars().all()
+        assert hits == [1]
+
+def test_concurrent_migrations_apply_each_step_once():
+    applied, errors = [], []
+
+    def run():
+        try:
+            applied.append(migrate(new_engine("concurrent.db"), analyze=False))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert sorted(len(versions_applied) for versions_applied in applied) == [0, 0, LATEST]
+    assert versions(new_engine("concurrent.db")) == list(range(1, LATEST + 1))
+
+def test_hot_queries_use_indexes():
+    engine = new_engine("plans.db")
+    migrate(engine)
+    scans = {name: full for name, _, full in query_plans(engine) if full}
+    assert scans == {}, scans
+
+if __name__ == "__main__":
+    test_fresh_database()
+    test_legacy_database_is_upgraded_and_backfilled()
+    test_concurrent_migrations_apply_each_step_once()
+    test_hot_queries_use_indexes()
+    print("ok")
@@ -0,0 +1,100 @@
+"""
+History pages must walk the whole history newest first, each session exactly
+once, even when sessions share a created_at or the cursor's row is deleted
+between two requests.
+
+    python -m pytest test_pagination.py     or     python test_pagination.py
+
+Runs the API against a throwaway SQLite file with auth faked.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'pagination.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+from fastapi.testclient import TestClient
+
+import main
+import models
+from auth import get_current_user
+from database import SessionLocal
+from services.pagination import encode_cursor
+
+USER = {"uid": "pagination-test-user", "email": "pages@example.com"}
+
+def add_session(user_id: str, title: str, created_at: datetime = None) -> int:
+    db = SessionLocal()
+    try:
+        # Without created_at the server default applies, so these share a second
+        session = models.MeditationSession(user_id=user_id, title=title, type="Sleep", duration=5, script="x", created_at=created_at)
+        db.add(session)
+        db.commit()
+        return session.id
+    finally:
+        db.close()
+
+def walk(client, url: str, limit: int, on_page=None) -> list:
+    ids, cursor = [], None
+    while True:
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get(url, params=params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= limit
+        # Search results wrap each session with its match_info
+        ids += [item["session"]["id"] if "session" in item else item["id"] for item in page]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return ids
+        assert len(page) == limit
+        if on_page:
+            on_page(page)
+
+def test_pages_cover_history_once_in_order():
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        now = datetime.now(timezone.utc)
+        older = [add_session(USER["uid"], f"old {days}", now - timedelta(days=days)) for days in (3, 2, 1)]
+        tied = [add_session(USER["uid"], f"tied {n}") for n in range(5)]
+        add_session("someone-else", "not mine")
+
+        # Newest first; sessions created in the same second come highest id first
+        expected = tied[::-1] + older[::-1]
+        for limit in (1, 2, 3, 8, 50):
+            assert walk(client, "/api/meditations", limit) == expected
+        assert walk(client, "/api/meditations/search", 3) == expected
+
+        # The first page's last row disappears before the second page is read
+        deleted = []
+        def delete_cursor_row(page):
+            if not deleted:
+                deleted.append(page[-1]["id"])
+                assert client.delete(f"/api/meditations/{page[-1]['id']}").status_code == 200
+        ids = walk(client, "/api/meditations", 3, on_page=delete_cursor_row)
+        assert ids == expected
+
+        remaining = [i for i in expected if i not in deleted]
+        assert walk(client, "/api/meditations", 3) == remaining
+
+    main.app.dependency_overrides.clear()
+
+def test_invalid_cursors_are_rejected():
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        for cursor in ("not-a-cursor", encode_cursor({"c": "yesterday", "i": 1}), encode_cursor({"i": 1}), encode_cursor([1, 2])):
+            assert client.get("/api/meditations", params={"cursor": cursor}).status_code == 400
+            assert client.get("/api/meditations/search", params={"cursor": cursor}).status_code == 400
+
+    main.app.dependency_overrides.clear()
+
+if __name__ == "__main__":
+    test_pages_cover_history_once_in_order()
+    test_invalid_cursors_are_rejected()
+    print("ok")
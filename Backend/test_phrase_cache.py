@@ -0,0 +1,86 @@
+"""
+The phrase cache: which sentences recur, reuse of stored clips by a new
+process (restart, other workers), LRU eviction, and that a half-written clip
+is never indexed.
+
+    python -m pytest test_phrase_cache.py     or     python test_phrase_cache.py
+
+Uses throwaway cache directories; no database or external services.
+"""
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from services.phrase_cache import PhraseCache
+
+VOICE, MODEL = "Female", "tts-test"
+
+def clip(n: int) -> np.ndarray:
+    return np.arange(n, dtype=np.int16)
+
+def test_sentences_recur_across_scripts_or_within_one():
+    cache = PhraseCache(tempfile.mkdtemp(), max_bytes=1 << 20)
+    assert cache.note(["Breathe in.", "Welcome."], "script-a", VOICE, MODEL) == set()
+    # Re-synthesizing the same script doesn't count twice
+    assert cache.note(["Breathe in.", "Welcome."], "script-a", VOICE, MODEL) == set()
+    assert cache.note(["Breathe in.", "Goodbye."], "script-b", VOICE, MODEL) == {"Breathe in."}
+    assert cache.recurring("Breathe  in.", VOICE, MODEL)  # whitespace is folded
+    assert cache.note(["Again.", "Again."], "script-c", VOICE, MODEL) == {"Again."}
+    assert not cache.recurring("Goodbye.", VOICE, MODEL)
+
+def test_stored_clips_are_reused_by_a_new_process():
+    cache_dir = tempfile.mkdtemp()
+    first = PhraseCache(cache_dir, max_bytes=1 << 20)
+    first.put("Breathe in.", VOICE, MODEL, clip(100))
+
+    # What a restart, or another worker sharing the directory, sees
+    second = PhraseCache(cache_dir, max_bytes=1 << 20)
+    assert second.stats()["entries"] == 1
+    assert second.note(["Breathe in.", "New here."], "script-z", VOICE, MODEL) == {"Breathe in."}
+    assert second.recurring("Breathe in.", VOICE, MODEL)
+    assert not second.recurring("Breathe in.", "Male", MODEL)
+    assert (np.asarray(second.get("Breathe in.", VOICE, MODEL)) == clip(100)).all()
+
+    # A clip another process stores after this one started is found as well
+    first.put("Stored later.", VOICE, MODEL, clip(10))
+    assert second.recurring("Stored later.", VOICE, MODEL)
+    assert second.get("Stored later.", VOICE, MODEL) is not None
+    assert second.stats()["entries"] == 2 and second.stats()["hits"] == 2
+
+def test_least_recently_used_clips_are_evicted():
+    cache_dir = tempfile.mkdtemp()
+    probe = PhraseCache(tempfile.mkdtemp(), max_bytes=1 << 20)
+    probe.put("x", VOICE, MODEL, clip(1000))
+    size = probe.total_bytes
+
+    cache = PhraseCache(cache_dir, max_bytes=size * 2)
+    cache.put("one", VOICE, MODEL, clip(1000))
+    cache.put("two", VOICE, MODEL, clip(1000))
+    assert cache.get("one", VOICE, MODEL) is not None  # "two" is now the oldest
+    cache.put("three", VOICE, MODEL, clip(1000))
+    assert cache.stats()["evictions"] == 1 and cache.total_bytes <= size * 2
+    assert cache.get("two", VOICE, MODEL) is None
+    assert cache.get("one", VOICE, MODEL) is not None and cache.get("three", VOICE, MODEL) is not None
+    assert len(list(Path(cache_dir).glob("*.npy"))) == 2
+
+def test_partial_writes_are_not_indexed():
+    cache_dir = Path(tempfile.mkdtemp())
+    cache = PhraseCache(cache_dir, max_bytes=1 << 20)
+    cache.put("Breathe in.", VOICE, MODEL, clip(100))
+    assert [p.name for p in cache_dir.iterdir() if p.name.startswith(".")] == []
+
+    # Left behind by a put() that crashed, in both the current and the old naming
+    key = PhraseCache.key("Breathe out.", VOICE, MODEL)
+    (cache_dir / f".{key}.123.456.tmp").write_bytes(b"\x93NUMPY partial")
+    (cache_dir / f".{key}.123.456.tmp.npy").write_bytes(b"\x93NUMPY partial")
+    restarted = PhraseCache(cache_dir, max_bytes=1 << 20)
+    assert restarted.stats()["entries"] == 1
+    assert restarted.get("Breathe out.", VOICE, MODEL) is None
+
+if __name__ == "__main__":
+    test_sentences_recur_across_scripts_or_within_one()
+    test_stored_clips_are_reused_by_a_new_process()
+    test_least_recently_used_clips_are_evicted()
+    test_partial_writes_are_not_indexed()
+    print("ok")
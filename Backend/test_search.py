@@ -0,0 +1,106 @@
+"""
+Full-text search pages must continue from their (rank, id) cursor: best match
+first, every hit exactly once, ties in rank broken by id.
+
+    python -m pytest test_search.py     or     python test_search.py
+
+Runs the API against a throwaway SQLite file (FTS5 index) with auth faked.
+"""
+import os
+import tempfile
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'search.db')}"
+os.environ["TTS_PHRASE_CACHE"] = "0"
+
+from fastapi.testclient import TestClient
+
+import main
+import models
+from auth import get_current_user
+from database import SessionLocal
+from services.pagination import encode_cursor
+
+USER = {"uid": "search-test-user", "email": "search@example.com"}
+
+SCRIPTS = [
+    "Listen to the ocean. The ocean breathes with you. Ocean waves, ocean light.",
+    "The ocean is calm tonight.",
+    "The ocean is calm tonight.",
+    "The ocean is calm tonight.",
+    "Walk along the ocean shore and feel the sand under your feet as you slow down.",
+    "A quiet forest path under tall pines.",
+    "Ocean, ocean. Let the ocean carry you.",
+]
+
+def add_sessions(user_id: str, scripts: list, type: str = "Sleep") -> list:
+    db = SessionLocal()
+    try:
+        sessions = [models.MeditationSession(user_id=user_id, title="Search", type=type, duration=5, script=script) for script in scripts]
+        db.add_all(sessions)
+        db.commit()
+        return [session.id for session in sessions]
+    finally:
+        db.close()
+
+def walk(client, params: dict, limit: int) -> list:
+    results, cursor = [], None
+    while True:
+        page_params = dict(params, limit=limit)
+        if cursor:
+            page_params["cursor"] = cursor
+        response = client.get("/api/meditations/search", params=page_params)
+        assert response.status_code == 200, response.text
+        page = response.json()
+        assert len(page) <= limit
+        results += page
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return results
+        assert len(page) == limit
+
+def test_search_pages_follow_rank_then_id():
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        ids = add_sessions(USER["uid"], SCRIPTS)
+        add_sessions(USER["uid"], ["An ocean of stars."], type="Focus")
+        add_sessions("someone-else", ["Ocean ocean ocean."])
+
+        everything = walk(client, {"query": "ocean"}, 50)
+        order = [result["session"]["id"] for result in everything]
+        assert len(order) == 7 and set(ids) - set(order) == {ids[5]}
+        # Denser matches first; the three identical scripts tie and come by id
+        assert order[0] in (ids[0], ids[6])
+        tied = [order.index(i) for i in ids[1:4]]
+        assert tied == sorted(tied) and tied[-1] - tied[0] == 2
+        assert all(HIGHLIGHT in result["match_info"]["snippet"] for result in everything)
+
+        for limit in (1, 2, 3):
+            assert [result["session"]["id"] for result in walk(client, {"query": "ocean"}, limit)] == order
+
+        sleep_only = [result["session"]["id"] for result in walk(client, {"query": "ocean", "type": "Sleep"}, 2)]
+        assert sleep_only == [i for i in order if i in ids]
+
+        # Prefix match on the last term, as typed
+        assert len(walk(client, {"query": "oce"}, 3)) == 7
+
+    main.app.dependency_overrides.clear()
+
+def test_search_rejects_foreign_cursors():
+    main.app.dependency_overrides[get_current_user] = lambda: USER
+
+    with TestClient(main.app) as client:
+        # A history cursor (or garbage) is not a search position
+        for cursor in (encode_cursor({"c": "2026-01-01T00:00:00", "i": 1}), encode_cursor({"r": "best", "i": 1}), "%%%"):
+            response = client.get("/api/meditations/search", params={"query": "ocean", "cursor": cursor})
+            assert response.status_code == 400
+
+    main.app.dependency_overrides.clear()
+
+HIGHLIGHT = "<mark>"
+
+if __name__ == "__main__":
+    test_search_pages_follow_rank_then_id()
+    test_search_rejects_foreign_cursors()
+    print("ok")
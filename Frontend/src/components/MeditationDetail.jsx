@@ -4,10 +4,13 @@ import TextToSpeechPlayer from './TextToSpeechPlayer';
 import { useAuth } from '../context/AuthContext';
 import MoodFeedbackModal from './MoodFeedbackModal';
 
+const JOB_POLL_MS = 2000;
+
 const MeditationDetail = ({ session, onSessionUpdate }) => {
     const { currentUser } = useAuth();
     const [isGenerating, setIsGenerating] = useState(false);
     const [generationError, setGenerationError] = useState('');
+    const [generationProgress, setGenerationProgress] = useState(0);
     const [showMoodModal, setShowMoodModal] = useState(false);
 
     // Safety checks
@@ -33,31 +36,48 @@ const MeditationDetail = ({ session, onSessionUpdate }) => {
     const handleGenerateAudio = async () => {
         setIsGenerating(true);
         setGenerationError('');
+        setGenerationProgress(0);
         try {
             const token = await currentUser.getIdToken();
-            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/api/meditations/${session.id}/audio`, {
+            const headers = {
+                'Authorization': `Bearer ${token}`,
+                'Content-Type': 'application/json'
+            };
+
+            // Queue the job, then poll it: generation outlives a single request
+            const response = await fetch(`${import.meta.env.VITE_API_BASE_URL}/api/meditations/${session.id}/audio/jobs`, {
                 method: 'POST',
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    'Content-Type': 'application/json'
-                },
+                headers,
                 body: JSON.stringify({
                     voice_gender: session.voice_gender || 'Female'
                 })
             });
 
             if (!response.ok) {
-                throw new Error('Failed to generate audio');
+                throw new Error('Failed to queue audio generation');
             }
 
-            const data = await response.json();
+            let job = await response.json();
+            while (job.status === 'queued' || job.status === 'running') {
+                await new Promise(resolve => setTimeout(resolve, JOB_POLL_MS));
+                const jobResponse = await fetch(`${import.meta.env.VITE_API_BASE_URL}/api/jobs/${job.id}`, { headers });
+                if (!jobResponse.ok) {
+                    throw new Error('Failed to check audio generation');
+                }
+                job = await jobResponse.json();
+                setGenerationProgress(job.progress || 0);
+            }
+
+            if (job.status !== 'done') {
+                throw new Error(job.error || 'Failed to generate audio');
+            }
 
             // Update session locally
             const updatedSession = {
                 ...session,
-                audio_url: data.audio_url,
-                voice_used: session.voice_gender || 'Female',
-                audio_generated_at: new Date().toISOString()
+                audio_url: job.audio_url,
+                voice_used: job.voice_gender || session.voice_gender || 'Female',
+                audio_generated_at: job.finished_at || new Date().toISOString()
             };
 
             if (onSessionUpdate) {
@@ -193,7 +213,7 @@ const MeditationDetail = ({ session, onSessionUpdate }) => {
                         ) : isGenerating ? (
                             <div className="w-full py-6 flex flex-col items-center justify-center gap-2 text-violet-600 bg-violet-50 dark:bg-violet-900/10 rounded-2xl border border-violet-100 dark:border-violet-800">
                                 <Loader2 className="h-8 w-8 animate-spin" />
-                                <p className="text-sm font-medium">Generating Audio (this may take a moment)...</p>
+                                <p className="text-sm font-medium">Generating Audio (this may take a moment)... {generationProgress > 0 && `${generationProgress}%`}</p>
                             </div>
                         ) : (
                             <div className="animate-fade-in">
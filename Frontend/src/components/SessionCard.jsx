@@ -33,8 +33,8 @@ const SessionCard = ({ session, onDelete, compact = false }) => {
         console.warn("Invalid date in session:", session);
     }
 
-    // Truncate script for preview (approx 100 chars)
-    const scriptText = session.script || "No script content available.";
+    // Truncate script for preview (approx 100 chars); list endpoints only send `preview`
+    const scriptText = session.preview || session.script || "No script content available.";
     const preview = scriptText.length > 120
         ? scriptText.substring(0, 120) + "..."
         : scriptText;
@@ -12,9 +12,11 @@ const Dashboard = () => {
     const [loading, setLoading] = useState(true);
     const [error, setError] = useState(null);
     const [streak, setStreak] = useState(0);
+    // Sessions that ended calmer than they started, across the whole history
+    const [calmedCount, setCalmedCount] = useState(null);
 
     useEffect(() => {
-        const fetchSessionsAndCalculateStreak = async () => {
+        const fetchSessionsAndAnalytics = async () => {
             if (!currentUser) return;
 
             try {
@@ -47,11 +49,16 @@ const Dashboard = () => {
 
                 setSessions(validSessions);
 
-                // Calculate Streak
-                if (validSessions.length > 0) {
-                    calculateStreak(validSessions);
-                } else {
-                    setStreak(0);
+                // The list is only the latest page; totals and the streak come from /api/analytics
+                const analyticsResponse = await fetch(`${import.meta.env.VITE_API_BASE_URL}/api/analytics`, {
+                    headers: {
+                        'Authorization': `Bearer ${token}`
+                    }
+                });
+                if (analyticsResponse.ok) {
+                    const analytics = await analyticsResponse.json();
+                    setCalmedCount(analytics.total ? analytics.total.improved : 0);
+                    setStreak(analytics.streak || 0);
                 }
 
             } catch (err) {
@@ -62,75 +69,9 @@ const Dashboard = () => {
             }
         };
 
-        fetchSessionsAndCalculateStreak();
+        fetchSessionsAndAnalytics();
     }, [currentUser]);
 
-    const calculateStreak = (sessionsData) => {
-        // Extract unique dates (YYYY-MM-DD)
-        const uniqueDates = new Set();
-        sessionsData.forEach(session => {
-            if (session.created_at) {
-                const date = new Date(session.created_at).toISOString().split('T')[0];
-                uniqueDates.add(date);
-            }
-        });
-
-        const sortedDates = Array.from(uniqueDates).sort().reverse();
-
-        if (sortedDates.length === 0) {
-            setStreak(0);
-            return;
-        }
-
-        const today = new Date().toISOString().split('T')[0];
-        const yesterday = new Date(Date.now() - 86400000).toISOString().split('T')[0];
-
-        let currentStreak = 0;
-        let checkDate = new Date(); // Start checking from today
-
-        // If the most recent session wasn't today or yesterday, streak is broken (0)
-        // Unless we want to be lenient and say streak continues even if you missed today but did yesterday?
-        // Usually, if you haven't done it today typically streak is still "active" from yesterday until midnight.
-        // Let's check if the latest date is today or yesterday.
-        const lastSessionDate = sortedDates[0];
-
-        if (lastSessionDate !== today && lastSessionDate !== yesterday) {
-            setStreak(0);
-            return;
-        }
-
-        // Logic: Iterate back from today/yesterday
-        // We need to check for consecutive days.
-
-        // Let's normalize logic:
-        // 1. Check if today exists in sortedDates. If yes, start streak count from today.
-        // 2. If no, check if yesterday exists. If yes, start streak count from yesterday.
-        // 3. If neither, streak is 0.
-
-        let pointer = new Date();
-        let pointerStr = pointer.toISOString().split('T')[0];
-
-        if (!uniqueDates.has(today)) {
-            // Check yesterday
-            pointer.setDate(pointer.getDate() - 1);
-            pointerStr = pointer.toISOString().split('T')[0];
-
-            if (!uniqueDates.has(pointerStr)) {
-                setStreak(0);
-                return;
-            }
-        }
-
-        // Count backwards
-        while (uniqueDates.has(pointerStr)) {
-            currentStreak++;
-            pointer.setDate(pointer.getDate() - 1);
-            pointerStr = pointer.toISOString().split('T')[0];
-        }
-
-        setStreak(currentStreak);
-    };
-
     return (
         <div className="min-h-screen bg-gradient-to-br from-indigo-50 via-purple-50 to-pink-50 dark:from-slate-900 dark:via-slate-800 dark:to-slate-900 flex flex-col transition-colors duration-300 relative overflow-hidden">
             {/* Decorative Blobs */}
@@ -176,7 +117,7 @@ const Dashboard = () => {
                                 <div>
                                     <p className="text-sm font-medium text-gray-500 dark:text-gray-400 uppercase tracking-wider text-[10px]">Emotions Calmed</p>
                                     <p className="text-xl font-bold text-gray-900 dark:text-white">
-                                        {sessions.filter(s => s.improvement_score > 0).length} Sessions
+                                        {calmedCount ?? sessions.filter(s => s.improvement_score > 0).length} Sessions
                                     </p>
                                 </div>
                             </div>
@@ -13,6 +13,9 @@ const History = () => {
     const [error, setError] = useState(null);
     const [searchQuery, setSearchQuery] = useState('');
     const [filterType, setFilterType] = useState('');
+    // Cursor for the next page (X-Next-Cursor header), null on the last page
+    const [nextCursor, setNextCursor] = useState(null);
+    const [loadingMore, setLoadingMore] = useState(false);
 
     // Debounce search query
     const [debouncedQuery, setDebouncedQuery] = useState('');
@@ -27,11 +30,15 @@ const History = () => {
         return () => clearTimeout(timer);
     }, [searchQuery]);
 
-    const fetchSessions = useCallback(async () => {
+    const fetchSessions = useCallback(async (cursor = null) => {
         if (!currentUser) return;
 
         try {
-            setLoading(true);
+            if (cursor) {
+                setLoadingMore(true);
+            } else {
+                setLoading(true);
+            }
             const token = await currentUser.getIdToken();
             console.log("Fetching history with token:", token ? "Present" : "Missing");
 
@@ -39,6 +46,7 @@ const History = () => {
             const params = new URLSearchParams();
             if (debouncedQuery) params.append('query', debouncedQuery);
             if (filterType) params.append('type', filterType);
+            if (cursor) params.append('cursor', cursor);
 
             // Use search endpoint if filters exist, otherwise default (though search endpoint handles no-params too, 
             // the original list endpoint was /api/meditations. 
@@ -95,13 +103,15 @@ const History = () => {
             const validSessions = extractedSessions.filter(item => item && typeof item === 'object');
 
             console.log("Filtered Valid Sessions:", validSessions.length);
-            setSessions(validSessions);
+            setSessions(prev => cursor ? [...prev, ...validSessions] : validSessions);
+            setNextCursor(response.headers.get('X-Next-Cursor'));
             setError(null);
         } catch (err) {
             console.error("Error fetching sessions:", err);
             setError("Unable to load history. Please try again later.");
         } finally {
             setLoading(false);
+            setLoadingMore(false);
         }
     }, [currentUser, debouncedQuery, filterType]);
 
@@ -178,6 +188,18 @@ const History = () => {
                     error={error}
                     onDeleteSession={handleDeleteSession}
                 />
+
+                {nextCursor && !loading && !error && (
+                    <div className="flex justify-center mt-8">
+                        <button
+                            onClick={() => fetchSessions(nextCursor)}
+                            disabled={loadingMore}
+                            className="px-6 py-3 bg-white/80 dark:bg-gray-800/80 hover:bg-white dark:hover:bg-gray-700 shadow-sm hover:shadow-md rounded-2xl transition-all text-violet-600 dark:text-violet-400 font-medium border border-gray-100 dark:border-gray-700 disabled:opacity-50"
+                        >
+                            {loadingMore ? 'Loading...' : 'Load more'}
+                        </button>
+                    </div>
+                )}
             </div>
         </div>
     );